@@ -99,10 +99,21 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
+    'DEFAULT_PAGINATION_CLASS': 'projects.pagination.HybridPagination',
     'PAGE_SIZE': 20,
 }
 
+# Пагинация: время жизни кэша для ?count=cached и порог точного подсчёта для ?count=estimate
+PAGINATION_COUNT_CACHE_TIMEOUT = int(os.getenv('PAGINATION_COUNT_CACHE_TIMEOUT', '60'))
+PAGINATION_ESTIMATE_EXACT_BELOW = int(os.getenv('PAGINATION_ESTIMATE_EXACT_BELOW', '1000'))
+
+# Лента изменений /projects/changes/
+SYNC_MAX_ROWS = int(os.getenv('SYNC_MAX_ROWS', '1000'))
+# Перекрытие окна: строки, закоммиченные чуть позже своего updated_at, не теряются
+SYNC_CLOCK_SKEW_SECONDS = int(os.getenv('SYNC_CLOCK_SKEW_SECONDS', '5'))
+# Отметки об удалении старше этого срока удаляются командой purge_tombstones
+SYNC_TOMBSTONE_RETENTION_DAYS = int(os.getenv('SYNC_TOMBSTONE_RETENTION_DAYS', '30'))
+
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(hours=1),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=7),
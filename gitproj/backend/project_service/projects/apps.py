@@ -4,3 +4,6 @@ class ProjectsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'projects'
     verbose_name = 'Проекты'
+    
+    def ready(self):
+        from . import signals  # noqa: F401
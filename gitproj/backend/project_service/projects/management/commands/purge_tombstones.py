@@ -0,0 +1,22 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from projects.models import Tombstone
+
+
+class Command(BaseCommand):
+    help = 'Удаляет отметки об удалении старше SYNC_TOMBSTONE_RETENTION_DAYS'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, default=settings.SYNC_TOMBSTONE_RETENTION_DAYS,
+            help='Срок хранения в днях'
+        )
+
+    def handle(self, *args, **options):
+        border = timezone.now() - timedelta(days=options['days'])
+        deleted, _ = Tombstone.objects.filter(deleted_at__lt=border).delete()
+        self.stdout.write(self.style.SUCCESS(f'Удалено отметок: {deleted}'))
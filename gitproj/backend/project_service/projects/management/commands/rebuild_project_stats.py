@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from projects.stats import REBUILD_BATCH_SIZE, rebuild_project_stats
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает сводную статистику проектов (ProjectStats) по таблице задач'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'project_ids', nargs='*', type=int,
+            help='ID проектов; по умолчанию пересчитываются все'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=REBUILD_BATCH_SIZE,
+            help='Сколько проектов пересчитывать одним запросом'
+        )
+
+    def handle(self, *args, **options):
+        project_ids = options['project_ids'] or None
+        rebuilt = rebuild_project_stats(project_ids, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Пересчитано проектов: {rebuilt}'))
@@ -0,0 +1,65 @@
+# Generated by Django 5.0.1 on 2026-10-18 18:55
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+SEARCH_TABLES = ('projects_project', 'projects_task')
+
+# Заголовок весит больше описания (A > B) и при ранжировании
+SEARCH_VECTOR_SQL = """
+    setweight(to_tsvector('russian', coalesce({row}title, '')), 'A') ||
+    setweight(to_tsvector('russian', coalesce({row}description, '')), 'B')
+"""
+
+
+def create_search_triggers(apps, schema_editor):
+    """GIN-индекс и триггер, который держит search_vector актуальным при записи"""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for table in SEARCH_TABLES:
+        schema_editor.execute(f"""
+            CREATE FUNCTION {table}_search_update() RETURNS trigger AS $$
+            BEGIN
+                NEW.search_vector := {SEARCH_VECTOR_SQL.format(row='NEW.')};
+                RETURN NEW;
+            END
+            $$ LANGUAGE plpgsql
+        """)
+        schema_editor.execute(f"""
+            CREATE TRIGGER {table}_search_trigger
+            BEFORE INSERT OR UPDATE OF title, description ON {table}
+            FOR EACH ROW EXECUTE FUNCTION {table}_search_update()
+        """)
+        schema_editor.execute(f"UPDATE {table} SET search_vector = {SEARCH_VECTOR_SQL.format(row='')}")
+        schema_editor.execute(f"CREATE INDEX {table}_search_idx ON {table} USING gin (search_vector)")
+
+
+def drop_search_triggers(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for table in SEARCH_TABLES:
+        schema_editor.execute(f"DROP INDEX IF EXISTS {table}_search_idx")
+        schema_editor.execute(f"DROP TRIGGER IF EXISTS {table}_search_trigger ON {table}")
+        schema_editor.execute(f"DROP FUNCTION IF EXISTS {table}_search_update()")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0005_sync_feed'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='project',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(create_search_triggers, drop_search_triggers),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.0.1 on 2026-10-18 18:59
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0006_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProjectStats',
+            fields=[
+                ('project', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='projects.project', verbose_name='Проект')),
+                ('tasks_total', models.IntegerField(default=0, verbose_name='Всего задач')),
+                ('tasks_done', models.IntegerField(default=0, verbose_name='Выполнено задач')),
+                ('by_status', models.JSONField(default=dict, verbose_name='Задачи по статусам')),
+                ('by_assignee', models.JSONField(default=dict, verbose_name='Задачи по исполнителям')),
+                ('open_deadlines', models.JSONField(default=dict, verbose_name='Дедлайны невыполненных задач')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Дата обновления')),
+            ],
+            options={
+                'verbose_name': 'Статистика проекта',
+                'verbose_name_plural': 'Статистика проектов',
+            },
+        ),
+    ]
@@ -1,5 +1,14 @@
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
 
+
+class SearchableManager(models.Manager):
+    """Не загружает search_vector: колонка нужна только запросам поиска"""
+    
+    def get_queryset(self):
+        return super().get_queryset().defer('search_vector')
+
+
 class Project(models.Model):
     """Проект"""
     
@@ -27,13 +36,27 @@ class Project(models.Model):
     # Репозиторий
     repository_url = models.URLField(blank=True, verbose_name='URL репозитория')
     
+    # Заполняется триггером PostgreSQL из title/description (миграция 0006_search)
+    search_vector = SearchVectorField(null=True, editable=False)
+    
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')
     updated_at = models.DateTimeField(auto_now=True, verbose_name='Дата обновления')
     
+    objects = SearchableManager()
+    
     class Meta:
         verbose_name = 'Проект'
         verbose_name_plural = 'Проекты'
         ordering = ['-created_at']
+        indexes = [
+            # Ключ курсорной пагинации: ORDER BY created_at DESC, id DESC
+            models.Index(fields=['-created_at', '-id'], name='project_created_id_idx'),
+            # Фильтры ProjectViewSet.get_queryset
+            models.Index(fields=['status', '-created_at'], name='project_status_created_idx'),
+            models.Index(fields=['owner_id', '-created_at'], name='project_owner_created_idx'),
+            # Лента изменений: updated_at > курсор
+            models.Index(fields=['updated_at'], name='project_updated_idx'),
+        ]
     
     def __str__(self):
         return self.title
@@ -52,11 +75,17 @@ class ProjectMember(models.Model):
     user_id = models.IntegerField(verbose_name='ID пользователя')
     role = models.CharField(max_length=20, choices=ROLE_CHOICES, default='member', verbose_name='Роль')
     joined_at = models.DateTimeField(auto_now_add=True, verbose_name='Дата присоединения')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Дата обновления')
     
     class Meta:
         verbose_name = 'Участник проекта'
         verbose_name_plural = 'Участники проектов'
         unique_together = ['project', 'user_id']
+        indexes = [
+            # my_projects ищет членства по user_id, а unique (project, user_id) для этого не подходит
+            models.Index(fields=['user_id', 'project'], name='member_user_project_idx'),
+            models.Index(fields=['project', 'updated_at'], name='member_project_updated_idx'),
+        ]
     
     def __str__(self):
         return f"User {self.user_id} in {self.project.title}"
@@ -79,7 +108,9 @@ class Task(models.Model):
         ('urgent', 'Срочный'),
     ]
     
-    project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='tasks', verbose_name='Проект')
+    # Отдельный индекс по project_id не нужен: его покрывает task_project_status_idx
+    project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='tasks',
+                                db_index=False, verbose_name='Проект')
     title = models.CharField(max_length=200, verbose_name='Название')
     description = models.TextField(blank=True, verbose_name='Описание')
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='todo', verbose_name='Статус')
@@ -88,13 +119,88 @@ class Task(models.Model):
     assignee_id = models.IntegerField(null=True, blank=True, verbose_name='ID исполнителя')
     deadline = models.DateField(null=True, blank=True, verbose_name='Дедлайн')
     
+    # Заполняется триггером PostgreSQL из title/description (миграция 0006_search)
+    search_vector = SearchVectorField(null=True, editable=False)
+    
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')
     updated_at = models.DateTimeField(auto_now=True, verbose_name='Дата обновления')
     
+    objects = SearchableManager()
+    
     class Meta:
         verbose_name = 'Задача'
         verbose_name_plural = 'Задачи'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='task_created_id_idx'),
+            # Фильтры TaskViewSet.get_queryset и my_tasks
+            models.Index(fields=['project', 'status', '-created_at'], name='task_project_status_idx'),
+            models.Index(fields=['assignee_id', 'status', '-created_at'], name='task_assignee_status_idx'),
+            models.Index(fields=['project', 'updated_at'], name='task_project_updated_idx'),
+        ]
     
     def __str__(self):
         return f"{self.title} ({self.project.title})"
+
+
+class ProjectStats(models.Model):
+    """Сводная статистика задач проекта, обновляется инкрементально (см. stats.py)"""
+    
+    project = models.OneToOneField(Project, on_delete=models.CASCADE, primary_key=True,
+                                   related_name='stats', verbose_name='Проект')
+    tasks_total = models.IntegerField(default=0, verbose_name='Всего задач')
+    tasks_done = models.IntegerField(default=0, verbose_name='Выполнено задач')
+    # {статус: количество}
+    by_status = models.JSONField(default=dict, verbose_name='Задачи по статусам')
+    # {id исполнителя или "none": {"total": n, "done": n}}
+    by_assignee = models.JSONField(default=dict, verbose_name='Задачи по исполнителям')
+    # {дата дедлайна: количество невыполненных задач}; просрочку считаем на дату запроса
+    open_deadlines = models.JSONField(default=dict, verbose_name='Дедлайны невыполненных задач')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Дата обновления')
+    
+    class Meta:
+        verbose_name = 'Статистика проекта'
+        verbose_name_plural = 'Статистика проектов'
+    
+    def __str__(self):
+        return f"Stats for project {self.project_id}"
+    
+    @property
+    def done_percent(self):
+        if not self.tasks_total:
+            return 0.0
+        return round(self.tasks_done * 100 / self.tasks_total, 1)
+    
+    def overdue_count(self, today):
+        border = today.isoformat()
+        return sum(count for deadline, count in self.open_deadlines.items() if deadline < border)
+
+
+class Tombstone(models.Model):
+    """Отметка об удалённой строке для инкрементальной синхронизации клиентов"""
+    
+    MODEL_CHOICES = [
+        ('project', 'Проект'),
+        ('member', 'Участник проекта'),
+        ('task', 'Задача'),
+    ]
+    
+    model = models.CharField(max_length=20, choices=MODEL_CHOICES, verbose_name='Модель')
+    object_id = models.BigIntegerField(verbose_name='ID удалённой строки')
+    # Проекта к этому моменту может уже не быть, поэтому без внешнего ключа
+    project_id = models.BigIntegerField(verbose_name='ID проекта')
+    user_id = models.IntegerField(null=True, blank=True, verbose_name='ID пользователя (для участников)')
+    deleted_at = models.DateTimeField(auto_now_add=True, verbose_name='Дата удаления')
+    
+    class Meta:
+        verbose_name = 'Удалённая запись'
+        verbose_name_plural = 'Удалённые записи'
+        ordering = ['deleted_at']
+        indexes = [
+            models.Index(fields=['project_id', 'deleted_at'], name='tombstone_project_deleted_idx'),
+            models.Index(fields=['user_id', 'deleted_at'], name='tombstone_user_deleted_idx'),
+            models.Index(fields=['deleted_at'], name='tombstone_deleted_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.model} #{self.object_id} deleted at {self.deleted_at}"
@@ -0,0 +1,119 @@
+import re
+from functools import reduce
+from operator import and_
+
+from django.contrib.postgres.search import SearchHeadline, SearchQuery, SearchRank
+from django.db import connections
+from django.db.models import F, Q
+from django.utils.html import escape
+
+# Должна совпадать с конфигурацией в триггере миграции 0006_search
+SEARCH_CONFIG = 'russian'
+
+HIGHLIGHT_START = '<mark>'
+HIGHLIGHT_STOP = '</mark>'
+SNIPPET_LENGTH = 200
+
+
+class PostgresSearchBackend:
+    """Полнотекстовый поиск по search_vector с ранжированием ts_rank и подсветкой ts_headline"""
+
+    def search(self, queryset, query, limit):
+        search_query = SearchQuery(query, config=SEARCH_CONFIG, search_type='websearch')
+        hits = list(
+            queryset.filter(search_vector=search_query)
+            .annotate(rank=SearchRank(F('search_vector'), search_query))
+            .order_by('-rank', '-id')[:limit]
+        )
+
+        # ts_headline дорогой, поэтому считаем его только для уже отобранных строк
+        headline_options = {
+            'config': SEARCH_CONFIG,
+            'start_sel': HIGHLIGHT_START,
+            'stop_sel': HIGHLIGHT_STOP,
+        }
+        headlines = {
+            row['pk']: row
+            for row in queryset.model._default_manager.filter(pk__in=[hit.pk for hit in hits]).annotate(
+                title_highlight=SearchHeadline('title', search_query, **headline_options),
+                description_highlight=SearchHeadline(
+                    'description', search_query, max_words=35, min_words=15, **headline_options
+                ),
+            ).values('pk', 'title_highlight', 'description_highlight')
+        }
+        return [
+            (hit, hit.rank, {
+                'title': headlines[hit.pk]['title_highlight'],
+                'description': headlines[hit.pk]['description_highlight'],
+            })
+            for hit in hits
+        ]
+
+
+class SimpleSearchBackend:
+    """Запасной поиск для SQLite и других баз без tsvector.
+
+    Все слова запроса должны встретиться в title или description. LIKE в
+    SQLite не различает регистр только для ASCII, поэтому в базе отбираются
+    строки лишь по ASCII-словам, а совпадение всех слов без учёта регистра
+    (в том числе кириллицы) проверяется в Python. Кандидаты ограничены,
+    ранжирование и подсветка тоже считаются в Python.
+    """
+
+    CANDIDATES_PER_RESULT = 5
+    CHUNK_SIZE = 500
+
+    def search(self, queryset, query, limit):
+        terms = [term for term in re.split(r'\W+', query.casefold()) if term]
+        if not terms:
+            return []
+
+        conditions = [
+            Q(title__icontains=term) | Q(description__icontains=term) for term in terms if term.isascii()
+        ]
+        if conditions:
+            queryset = queryset.filter(reduce(and_, conditions))
+
+        candidates = []
+        for obj in queryset.order_by('-updated_at', '-id').iterator(chunk_size=self.CHUNK_SIZE):
+            title, description = obj.title.casefold(), obj.description.casefold()
+            if all(term in title or term in description for term in terms):
+                candidates.append((obj, title, description))
+                if len(candidates) >= limit * self.CANDIDATES_PER_RESULT:
+                    break
+
+        scored = []
+        for obj, title, description in candidates:
+            rank = sum(1.0 if term in title else 0.4 for term in terms)
+            scored.append((obj, rank))
+        scored.sort(key=lambda item: (-item[1], -item[0].pk))
+
+        pattern = re.compile('|'.join(re.escape(term) for term in terms), re.IGNORECASE)
+        return [
+            (obj, rank, {
+                'title': self.highlight(obj.title, pattern),
+                'description': self.highlight(self.snippet(obj.description, pattern), pattern),
+            })
+            for obj, rank in scored[:limit]
+        ]
+
+    def snippet(self, text, pattern):
+        match = pattern.search(text)
+        start = max((match.start() if match else 0) - SNIPPET_LENGTH // 4, 0)
+        return text[start:start + SNIPPET_LENGTH]
+
+    def highlight(self, text, pattern):
+        parts = []
+        position = 0
+        for match in pattern.finditer(text):
+            parts.append(escape(text[position:match.start()]))
+            parts.append(HIGHLIGHT_START + escape(match.group()) + HIGHLIGHT_STOP)
+            position = match.end()
+        parts.append(escape(text[position:]))
+        return ''.join(parts)
+
+
+def get_search_backend(using='default'):
+    if connections[using].vendor == 'postgresql':
+        return PostgresSearchBackend()
+    return SimpleSearchBackend()
@@ -1,5 +1,15 @@
+from django.utils import timezone
 from rest_framework import serializers
-from .models import Project, ProjectMember, Task
+from .models import Project, ProjectMember, ProjectStats, Task
+
+
+def requested_fields(request, param):
+    """Разбирает параметр запроса вида ?include=tasks,members в множество имён"""
+    if request is None:
+        return set()
+    raw = request.query_params.get(param, '')
+    return {name.strip() for name in raw.split(',') if name.strip()}
+
 
 class ProjectMemberSerializer(serializers.ModelSerializer):
     class Meta:
@@ -14,25 +24,211 @@ class TaskSerializer(serializers.ModelSerializer):
                   'assignee_id', 'deadline', 'created_at', 'updated_at']
         read_only_fields = ['id', 'created_at', 'updated_at']
 
+class BulkProjectField(serializers.PrimaryKeyRelatedField):
+    """Проект по id из словаря context['projects'], загруженного одним запросом на весь пакет"""
+    
+    def to_internal_value(self, data):
+        projects = self.context.get('projects')
+        if projects is None:
+            return super().to_internal_value(data)
+        try:
+            pk = int(data)
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        if pk not in projects:
+            self.fail('does_not_exist', pk_value=data)
+        return projects[pk]
+
+class TaskBulkItemSerializer(TaskSerializer):
+    """Одна задача в пакетной операции: проект берётся из предзагруженного словаря"""
+    
+    project = BulkProjectField(queryset=Project.objects.all())
+
+class TaskBulkSerializer(serializers.Serializer):
+    """Пакет операций над задачами: создание и частичное обновление"""
+    
+    MAX_ITEMS = 2000
+    
+    create = serializers.ListField(child=serializers.DictField(), required=False, default=list)
+    update = serializers.ListField(child=serializers.DictField(), required=False, default=list)
+    
+    def validate_update(self, value):
+        # id приводится так же, как в остальных сериализаторах: "5" и 5 - одна задача
+        id_field = serializers.IntegerField(min_value=1)
+        items = []
+        for item in value:
+            try:
+                items.append({**item, 'id': id_field.run_validation(item.get('id'))})
+            except serializers.ValidationError:
+                raise serializers.ValidationError('Each update item must contain an integer "id"')
+        ids = [item['id'] for item in items]
+        if len(ids) != len(set(ids)):
+            raise serializers.ValidationError('Duplicate task ids in update')
+        return items
+    
+    def get_project_ids(self):
+        """id проектов из всех элементов пакета; некорректные отклонит TaskBulkItemSerializer"""
+        id_field = serializers.IntegerField()
+        project_ids = set()
+        for item in self.validated_data['create'] + self.validated_data['update']:
+            if 'project' not in item:
+                continue
+            try:
+                project_ids.add(id_field.run_validation(item['project']))
+            except serializers.ValidationError:
+                pass
+        return project_ids
+    
+    def validate(self, attrs):
+        total = len(attrs['create']) + len(attrs['update'])
+        if total == 0:
+            raise serializers.ValidationError('Nothing to do')
+        if total > self.MAX_ITEMS:
+            raise serializers.ValidationError(f'At most {self.MAX_ITEMS} items per request')
+        return attrs
+
+class ProjectStatsSerializer(serializers.ModelSerializer):
+    """Прогресс проекта из сводной таблицы ProjectStats"""
+    
+    done_percent = serializers.FloatField(read_only=True)
+    overdue = serializers.SerializerMethodField()
+    by_status = serializers.SerializerMethodField()
+    by_assignee = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = ProjectStats
+        fields = ['tasks_total', 'tasks_done', 'done_percent', 'overdue',
+                  'by_status', 'by_assignee', 'updated_at']
+    
+    def get_overdue(self, obj):
+        return obj.overdue_count(timezone.localdate())
+    
+    def get_by_status(self, obj):
+        counts = {value: 0 for value, _ in Task.STATUS_CHOICES}
+        counts.update(obj.by_status)
+        return counts
+    
+    def get_by_assignee(self, obj):
+        rows = [
+            {
+                'assignee_id': None if key == 'none' else int(key),
+                'total': counts['total'],
+                'done': counts['done'],
+            }
+            for key, counts in obj.by_assignee.items()
+        ]
+        return sorted(rows, key=lambda row: (-row['total'], row['assignee_id'] or 0))
+
 class ProjectSerializer(serializers.ModelSerializer):
     members = ProjectMemberSerializer(many=True, read_only=True)
     tasks = TaskSerializer(many=True, read_only=True)
     members_count = serializers.SerializerMethodField()
     tasks_count = serializers.SerializerMethodField()
+    stats = serializers.SerializerMethodField()
     
     class Meta:
         model = Project
         fields = ['id', 'title', 'description', 'status', 'start_date', 'end_date', 
                   'deadline', 'owner_id', 'teacher_id', 'repository_url',
-                  'members', 'tasks', 'members_count', 'tasks_count',
+                  'members', 'tasks', 'members_count', 'tasks_count', 'stats',
                   'created_at', 'updated_at']
         read_only_fields = ['id', 'created_at', 'updated_at']
     
+    def get_stats(self, obj):
+        # Строки ещё нет у проекта без задач; get_queryset подгружает её через select_related
+        try:
+            stats = obj.stats
+        except ProjectStats.DoesNotExist:
+            stats = ProjectStats(project=obj)
+        return ProjectStatsSerializer(stats).data
+    
     def get_members_count(self, obj):
-        return obj.members.count()
+        # Берём аннотацию из get_queryset, иначе считаем по prefetch-кэшу
+        if hasattr(obj, 'members_count'):
+            return obj.members_count
+        return len(obj.members.all())
     
     def get_tasks_count(self, obj):
-        return obj.tasks.count()
+        if hasattr(obj, 'tasks_count'):
+            return obj.tasks_count
+        return len(obj.tasks.all())
+
+class ProjectListSerializer(ProjectSerializer):
+    """Краткое представление проекта для списков.
+    
+    Счётчики берутся из аннотаций запроса. Вложенные участники и задачи
+    отдаются только по ?include=members,tasks, а ?fields=id,title,...
+    ограничивает набор полей.
+    """
+    
+    EXPANDABLE_FIELDS = ('members', 'tasks')
+    
+    members_count = serializers.IntegerField(read_only=True)
+    tasks_count = serializers.IntegerField(read_only=True)
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        include = requested_fields(request, 'include')
+        only = requested_fields(request, 'fields')
+        
+        for name in self.EXPANDABLE_FIELDS:
+            if name not in include:
+                self.fields.pop(name, None)
+        
+        if only:
+            for name in set(self.fields) - only - include:
+                self.fields.pop(name)
+
+class ProjectFeedSerializer(serializers.ModelSerializer):
+    """Плоское представление проекта для ленты изменений"""
+    
+    class Meta:
+        model = Project
+        fields = ['id', 'title', 'description', 'status', 'start_date', 'end_date',
+                  'deadline', 'owner_id', 'teacher_id', 'repository_url',
+                  'created_at', 'updated_at']
+
+class ProjectMemberFeedSerializer(serializers.ModelSerializer):
+    """Участник проекта для ленты изменений: с id проекта и датой изменения"""
+    
+    class Meta:
+        model = ProjectMember
+        fields = ['id', 'project', 'user_id', 'role', 'joined_at', 'updated_at']
+
+class TemplateTeamSerializer(serializers.Serializer):
+    """Одна команда, для которой создаётся проект по шаблону"""
+    
+    title = serializers.CharField(max_length=200)
+    description = serializers.CharField(required=False, allow_blank=True)
+    owner_id = serializers.IntegerField()
+    teacher_id = serializers.IntegerField(required=False, allow_null=True)
+    repository_url = serializers.URLField(required=False, allow_blank=True)
+    members = serializers.ListField(child=serializers.IntegerField(), required=False, default=list)
+
+class ProjectInstantiateSerializer(serializers.Serializer):
+    """Параметры создания проектов по шаблону.
+    
+    Описание, даты и преподаватель берутся из шаблона, если команда не задала
+    свои. Задачи копируются со статусом todo.
+    """
+    
+    MAX_TEAMS = 200
+    
+    teams = TemplateTeamSerializer(many=True)
+    copy_members = serializers.BooleanField(
+        default=False, help_text='Добавить в каждый проект участников шаблона (кроме владельца)'
+    )
+    copy_assignees = serializers.BooleanField(
+        default=False, help_text='Сохранить исполнителей задач шаблона'
+    )
+    
+    def validate_teams(self, value):
+        if not value:
+            raise serializers.ValidationError('At least one team is required')
+        if len(value) > self.MAX_TEAMS:
+            raise serializers.ValidationError(f'At most {self.MAX_TEAMS} teams per request')
+        return value
 
 class ProjectCreateSerializer(serializers.ModelSerializer):
     class Meta:
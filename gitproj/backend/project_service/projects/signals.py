@@ -0,0 +1,77 @@
+from django.db.models import QuerySet
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from .models import Project, ProjectMember, Task, Tombstone
+from .stats import apply_task_deltas, task_key, task_key_of
+
+
+def is_project_cascade(origin):
+    """Удаление запущено удалением проекта (экземпляра или QuerySet)"""
+    if isinstance(origin, QuerySet):
+        return origin.model is Project
+    return isinstance(origin, Project)
+
+
+@receiver(pre_delete, sender=Project)
+def record_project_tombstones(sender, instance, **kwargs):
+    """Отметки для проекта и всего, что удалится вместе с ним по CASCADE.
+    
+    Пишутся одним bulk_create до удаления, пока задачи и участники ещё в базе.
+    """
+    tombstones = [Tombstone(model='project', object_id=instance.pk, project_id=instance.pk)]
+    tombstones += [
+        Tombstone(model='task', object_id=pk, project_id=instance.pk)
+        for pk in Task.objects.filter(project_id=instance.pk).values_list('pk', flat=True)
+    ]
+    tombstones += [
+        Tombstone(model='member', object_id=pk, project_id=instance.pk, user_id=user_id)
+        for pk, user_id in ProjectMember.objects.filter(project_id=instance.pk).values_list('pk', 'user_id')
+    ]
+    Tombstone.objects.bulk_create(tombstones)
+
+
+@receiver(post_delete, sender=Task)
+def record_task_tombstone(sender, instance, origin=None, **kwargs):
+    if is_project_cascade(origin):
+        return
+    Tombstone.objects.create(model='task', object_id=instance.pk, project_id=instance.project_id)
+
+
+@receiver(post_delete, sender=ProjectMember)
+def record_member_tombstone(sender, instance, origin=None, **kwargs):
+    if is_project_cascade(origin):
+        return
+    Tombstone.objects.create(
+        model='member', object_id=instance.pk,
+        project_id=instance.project_id, user_id=instance.user_id
+    )
+
+
+@receiver(pre_save, sender=Task)
+def remember_task_stats_key(sender, instance, raw=False, **kwargs):
+    """Запомнить ключ статистики задачи до сохранения, чтобы вычесть старые значения"""
+    instance._stats_key = None
+    if raw or instance._state.adding:
+        return
+    old = Task.objects.filter(pk=instance.pk).values_list(
+        'project_id', 'status', 'assignee_id', 'deadline'
+    ).first()
+    if old is not None:
+        instance._stats_key = task_key(*old)
+
+
+@receiver(post_save, sender=Task)
+def update_stats_on_task_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    old = getattr(instance, '_stats_key', None)
+    apply_task_deltas(removed=[old] if old else [], added=[task_key_of(instance)])
+
+
+@receiver(post_delete, sender=Task)
+def update_stats_on_task_delete(sender, instance, origin=None, **kwargs):
+    # При удалении проекта его статистика удаляется по CASCADE целиком
+    if is_project_cascade(origin):
+        return
+    apply_task_deltas(removed=[task_key_of(instance)])
@@ -0,0 +1,133 @@
+from collections import Counter, namedtuple
+
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from .models import Project, ProjectStats, Task
+
+DONE_STATUS = 'done'
+# Ключ в by_assignee для задач без исполнителя
+NO_ASSIGNEE = 'none'
+# Сколько проектов пересчитывается одним GROUP BY
+REBUILD_BATCH_SIZE = 500
+
+STATS_FIELDS = ['tasks_total', 'tasks_done', 'by_status', 'by_assignee', 'open_deadlines', 'updated_at']
+
+# Поля задачи, от которых зависит статистика
+TaskKey = namedtuple('TaskKey', ['project_id', 'status', 'assignee_id', 'deadline'])
+
+
+def task_key(project_id, status, assignee_id, deadline):
+    if hasattr(deadline, 'isoformat'):
+        deadline = deadline.isoformat()
+    return TaskKey(project_id, status, assignee_id, deadline)
+
+
+def task_key_of(task):
+    return task_key(task.project_id, task.status, task.assignee_id, task.deadline)
+
+
+def bump(counter, key, count):
+    """Изменить счётчик в словаре, нулевые ключи удаляются"""
+    value = counter.get(key, 0) + count
+    if value:
+        counter[key] = value
+    else:
+        counter.pop(key, None)
+
+
+def apply_counts(stats, key, count):
+    """Добавить (или вычесть при count < 0) count задач с ключом key"""
+    done = key.status == DONE_STATUS
+    stats.tasks_total += count
+    if done:
+        stats.tasks_done += count
+    bump(stats.by_status, key.status, count)
+
+    assignee = NO_ASSIGNEE if key.assignee_id is None else str(key.assignee_id)
+    counts = stats.by_assignee.setdefault(assignee, {'total': 0, 'done': 0})
+    counts['total'] += count
+    if done:
+        counts['done'] += count
+    if not counts['total']:
+        del stats.by_assignee[assignee]
+
+    if key.deadline and not done:
+        bump(stats.open_deadlines, key.deadline, count)
+
+
+def apply_task_deltas(removed=(), added=()):
+    """Обновить статистику по старым и новым ключам изменённых задач.
+
+    Строки ProjectStats блокируются select_for_update в порядке project_id,
+    поэтому параллельные изменения задач одного проекта не теряются. Если
+    строки ещё нет, она строится заново по таблице задач, где изменение уже
+    учтено. Строит её только один писатель: он держит блокировку строки
+    проекта, а остальные после её снятия находят готовую строку и применяют
+    к ней свою дельту - иначе более поздний пересчёт, не видящий чужих
+    незакоммиченных задач, затёр бы более ранний.
+    """
+    deltas = Counter()
+    for key in removed:
+        deltas[key] -= 1
+    for key in added:
+        deltas[key] += 1
+    deltas = {key: count for key, count in deltas.items() if count}
+    if not deltas:
+        return
+
+    project_ids = {key.project_id for key in deltas}
+    with transaction.atomic():
+        locked = ProjectStats.objects.select_for_update().filter(
+            project_id__in=project_ids
+        ).order_by('project_id')
+        stats = {row.project_id: row for row in locked}
+
+        missing = project_ids - set(stats)
+        if missing:
+            # FOR NO KEY UPDATE не конфликтует с FOR KEY SHARE, которую держат
+            # вставки задач в этот же проект, и не ведёт к взаимоблокировке
+            list(Project.objects.select_for_update(no_key=True).filter(
+                id__in=missing
+            ).order_by('id').values_list('id', flat=True))
+            built = ProjectStats.objects.select_for_update().filter(
+                project_id__in=missing
+            ).order_by('project_id')
+            stats.update((row.project_id, row) for row in built)
+            rebuild_project_stats(missing - set(stats))
+
+        for key, count in deltas.items():
+            if key.project_id in stats:
+                apply_counts(stats[key.project_id], key, count)
+        now = timezone.now()
+        for row in stats.values():
+            row.updated_at = now
+        ProjectStats.objects.bulk_update(stats.values(), STATS_FIELDS)
+
+
+def rebuild_project_stats(project_ids=None, batch_size=REBUILD_BATCH_SIZE):
+    """Пересчитать статистику с нуля, пачками по batch_size проектов.
+
+    На пачку уходит один GROUP BY по задачам и один INSERT ... ON CONFLICT.
+    Возвращает количество пересчитанных проектов.
+    """
+    projects = Project.objects.order_by('id')
+    if project_ids is not None:
+        projects = projects.filter(id__in=project_ids)
+    ids = list(projects.values_list('id', flat=True))
+
+    for start in range(0, len(ids), batch_size):
+        batch = ids[start:start + batch_size]
+        stats = {pk: ProjectStats(project_id=pk) for pk in batch}
+        rows = Task.objects.filter(project_id__in=batch).order_by().values(
+            'project_id', 'status', 'assignee_id', 'deadline'
+        ).annotate(count=Count('id'))
+        for row in rows:
+            key = task_key(row['project_id'], row['status'], row['assignee_id'], row['deadline'])
+            apply_counts(stats[row['project_id']], key, row['count'])
+        ProjectStats.objects.bulk_create(
+            stats.values(), update_conflicts=True,
+            unique_fields=['project'], update_fields=STATS_FIELDS
+        )
+    return len(ids)
@@ -0,0 +1,69 @@
+import base64
+import json
+
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+# Потоки ленты изменений и поле даты, по которому каждый из них листается
+SYNC_STREAMS = {
+    'projects': 'updated_at',
+    'members': 'updated_at',
+    'tasks': 'updated_at',
+    'tombstones': 'deleted_at',
+}
+
+
+class InvalidSyncCursor(ValueError):
+    pass
+
+
+def parse_timestamp(value):
+    moment = parse_datetime(value) if isinstance(value, str) else None
+    if moment is None:
+        raise InvalidSyncCursor(value)
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def encode_sync_cursor(started_at, after=None, full=False, positions=None):
+    """Непрозрачный курсор ленты.
+
+    Без positions - курсор следующей синхронизации: она начнётся с
+    started_at (с перекрытием на расхождение часов). С positions -
+    продолжение текущей: для каждого недочитанного потока последняя
+    отданная пара (дата, id), остальные потоки уже дочитаны.
+    """
+    data = {'t': started_at.isoformat()}
+    if positions is not None:
+        data.update(
+            a=after.isoformat() if after else None,
+            f=int(full),
+            p={name: [moment.isoformat(), pk] for name, (moment, pk) in positions.items()},
+        )
+    return base64.urlsafe_b64encode(json.dumps(data).encode()).decode()
+
+
+def decode_sync_cursor(encoded):
+    """(started_at, after, full, positions); positions равен None для курсора новой синхронизации"""
+    try:
+        data = json.loads(base64.urlsafe_b64decode(encoded.encode()).decode())
+        started_at = parse_timestamp(data['t'])
+        if 'p' not in data:
+            return started_at, None, False, None
+        after = parse_timestamp(data['a']) if data['a'] is not None else None
+        positions = {}
+        for name, (moment, pk) in data['p'].items():
+            if name not in SYNC_STREAMS:
+                raise InvalidSyncCursor(name)
+            positions[name] = (parse_timestamp(moment), int(pk))
+        return started_at, after, bool(data['f']), positions
+    except (TypeError, ValueError, KeyError, AttributeError, UnicodeDecodeError) as exc:
+        raise InvalidSyncCursor(encoded) from exc
+
+
+def after_position(queryset, field, position):
+    """Строки строго после (дата, id) в порядке (field, id)"""
+    moment, pk = position
+    return queryset.filter(Q(**{f'{field}__gt': moment}) | Q(**{field: moment, 'id__gt': pk}))
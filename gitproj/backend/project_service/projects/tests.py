@@ -1,3 +1,833 @@
-from django.test import TestCase
+import base64
+import csv
+import io
+import json
+import threading
+from datetime import datetime, time, timedelta
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.core.cache import cache
+from django.db import connection, connections, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from .models import Project, ProjectMember, ProjectStats, Task
+from .search import PostgresSearchBackend, SimpleSearchBackend
+from .stats import rebuild_project_stats
+from .sync import decode_sync_cursor
+
+
+class TokenUser:
+    """Пользователь из JWT, как его создаёт CustomJWTAuthentication"""
+
+    is_authenticated = True
+
+    def __init__(self, user_id):
+        self.id = user_id
+
+
+class QueryPlanTestCase(TestCase):
+    """Базовый класс для проверки планов запросов через EXPLAIN.
+
+    Запросы снимаются с реального вызова эндпоинта и прогоняются через EXPLAIN
+    с enable_seqscan = off: если подходящего индекса нет, PostgreSQL всё равно
+    выберет Seq Scan, а если есть - покажет его в плане.
+    """
+
+    user_id = 1
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(user=TokenUser(self.user_id))
+
+    def explain_endpoint(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, response.content)
+
+        plans = []
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+            for query in context.captured_queries:
+                if not query['sql'].startswith('SELECT'):
+                    continue
+                cursor.execute('EXPLAIN ' + query['sql'])
+                plans.append('\n'.join(row[0] for row in cursor.fetchall()))
+        self.assertTrue(plans, f'{url} не выполнил ни одного SELECT')
+        return '\n\n'.join(plans)
+
+    def assertUsesIndex(self, url, index_name=None):
+        plan = self.explain_endpoint(url)
+        self.assertNotIn('Seq Scan', plan, f'{url}:\n{plan}')
+        if index_name:
+            self.assertIn(index_name, plan, f'{url}:\n{plan}')
+
+
+class ProjectQueryPlanTests(QueryPlanTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        projects = Project.objects.bulk_create([
+            Project(
+                title=f'Project {i}', description='Описание',
+                status=['planning', 'in_progress', 'completed'][i % 3],
+                owner_id=i % 10 + 1,
+            )
+            for i in range(300)
+        ])
+        ProjectMember.objects.bulk_create([
+            ProjectMember(project=project, user_id=user_id)
+            for project in projects
+            for user_id in range(1, 6)
+        ])
+        Task.objects.bulk_create([
+            Task(
+                project=project, title=f'Task {i}',
+                status=['todo', 'in_progress', 'review', 'done'][i % 4],
+                assignee_id=i % 5 + 1,
+            )
+            for project in projects
+            for i in range(20)
+        ])
+        with connection.cursor() as cursor:
+            for model in (Project, ProjectMember, Task):
+                cursor.execute(f'ANALYZE {model._meta.db_table}')
+
+    def test_project_list_by_status(self):
+        self.assertUsesIndex('/api/projects/?status=completed', 'project_status_created_idx')
+
+    def test_project_list_by_owner(self):
+        self.assertUsesIndex('/api/projects/?owner_id=3', 'project_owner_created_idx')
+
+    def test_my_projects(self):
+        self.assertUsesIndex('/api/projects/my_projects/', 'member_user_project_idx')
+
+    def test_project_list_by_ids(self):
+        ids = list(Project.objects.order_by('id').values_list('id', flat=True)[:3])
+        url = f'/api/projects/?pagination=cursor&fields=id,title&ids={ids[0]},{ids[2]},x'
+        response = self.client.get(url)
+        self.assertEqual(sorted(row['id'] for row in response.data['results']), [ids[0], ids[2]])
+        self.assertEqual(set(response.data['results'][0]), {'id', 'title'})
+        self.assertUsesIndex(url, 'projects_project_pkey')
+
+    def test_task_list_by_project(self):
+        project = Project.objects.first()
+        self.assertUsesIndex(f'/api/tasks/?project_id={project.id}')
+
+    def test_task_list_by_project_and_status(self):
+        project = Project.objects.first()
+        self.assertUsesIndex(
+            f'/api/tasks/?project_id={project.id}&status=done', 'task_project_status_idx'
+        )
+
+    def test_task_list_by_assignee(self):
+        self.assertUsesIndex('/api/tasks/?assignee_id=2&status=todo', 'task_assignee_status_idx')
+
+    def test_my_tasks(self):
+        self.assertUsesIndex('/api/tasks/my_tasks/', 'task_assignee_status_idx')
+
+    def test_task_cursor_pagination(self):
+        self.assertUsesIndex('/api/tasks/?pagination=cursor', 'task_created_id_idx')
+
+
+class SearchTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.shop = Project.objects.create(
+            title='Интернет-магазин', description='Каталог товаров и корзина', owner_id=1
+        )
+        cls.blog = Project.objects.create(
+            title='Блог', description='Статьи про интернет-магазины', owner_id=1
+        )
+        cls.task = Task.objects.create(
+            project=cls.blog, title='Корзина', description='Корзина для магазина'
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(user=TokenUser(1))
+
+    def test_search_vector_updated_on_write(self):
+        self.task.title = 'Оплата заказа'
+        self.task.save()
+        results = self.client.get('/api/search/?q=оплата').data['results']
+        self.assertEqual([(hit['type'], hit['id']) for hit in results], [('task', self.task.id)])
+
+    def test_title_ranked_above_description(self):
+        results = self.client.get('/api/search/?q=магазин&type=projects').data['results']
+        self.assertEqual([hit['id'] for hit in results], [self.shop.id, self.blog.id])
+        self.assertIn('<mark>', results[0]['highlight']['title'])
+
+    def test_limit_is_bounded(self):
+        response = self.client.get('/api/search/?q=магазин&limit=1000')
+        self.assertEqual(response.status_code, 200)
+        self.assertLessEqual(len(response.data['results']), 50)
+        response = self.client.get('/api/search/?q=магазин&limit=1')
+        self.assertEqual(len(response.data['results']), 1)
+
+    def test_invalid_query(self):
+        response = self.client.get('/api/search/?q=a')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('detail', response.data)
+        self.assertEqual(self.client.get('/api/search/?q=abc&type=users').status_code, 400)
+        self.assertIn('detail', self.client.get('/api/search/?q=abc&project_id=x').data)
+
+    @skipUnless(connection.vendor == 'postgresql', 'tsvector есть только в PostgreSQL')
+    def test_backends_agree_on_matches(self):
+        for backend in (PostgresSearchBackend(), SimpleSearchBackend()):
+            hits = backend.search(Task.objects.all(), 'корзина', 10)
+            self.assertEqual([obj.id for obj, _, _ in hits], [self.task.id], backend)
+
+    def test_simple_backend_folds_cyrillic_case(self):
+        task = Task.objects.create(project=self.shop, title='ОПЛАТА Заказа', description='через API')
+        for query in ('оплата', 'Оплата заказа', 'api оплата'):
+            hits = SimpleSearchBackend().search(Task.objects.all(), query, 10)
+            self.assertEqual([obj.id for obj, _, _ in hits], [task.id], query)
+        hits = SimpleSearchBackend().search(Task.objects.all(), 'оплата', 10)
+        self.assertEqual(hits[0][2]['title'], '<mark>ОПЛАТА</mark> Заказа')
+        self.assertEqual(SimpleSearchBackend().search(Task.objects.all(), 'оплата корзина', 10), [])
+
+    def test_simple_backend_highlight_escapes_html(self):
+        task = Task.objects.create(project=self.shop, title='<b>корзина</b>', description='')
+        hits = SimpleSearchBackend().search(Task.objects.filter(pk=task.pk), 'корзина', 10)
+        self.assertEqual(hits[0][2]['title'], '&lt;b&gt;<mark>корзина</mark>&lt;/b&gt;')
+
+
+class ProjectStatsTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(user=TokenUser(1))
+        self.project = Project.objects.create(title='Проект', owner_id=1)
+        self.other = Project.objects.create(title='Другой', owner_id=1)
+        self.yesterday = timezone.localdate() - timedelta(days=1)
+
+    def snapshot(self, project):
+        stats = ProjectStats.objects.get(project=project)
+        return (stats.tasks_total, stats.tasks_done, stats.by_status,
+                stats.by_assignee, stats.open_deadlines)
+
+    def assertMatchesRebuild(self, *projects):
+        incremental = [self.snapshot(project) for project in projects]
+        rebuild_project_stats([project.id for project in projects])
+        self.assertEqual(incremental, [self.snapshot(project) for project in projects])
+
+    def test_incremental_updates_match_rebuild(self):
+        first = Task.objects.create(project=self.project, title='a', assignee_id=2, deadline=self.yesterday)
+        second = Task.objects.create(project=self.project, title='b', assignee_id=2, status='done')
+        third = Task.objects.create(project=self.project, title='c')
+        first.status = 'review'
+        first.save()
+        third.project = self.other
+        third.save()
+        second.delete()
+        self.assertMatchesRebuild(self.project, self.other)
+
+    def test_bulk_endpoint_updates_stats(self):
+        task = Task.objects.create(project=self.project, title='a', assignee_id=2)
+        response = self.client.post('/api/tasks/bulk/', {
+            'create': [{'project': self.project.id, 'title': 'b', 'assignee_id': 3}],
+            'update': [{'id': task.id, 'status': 'done'}],
+        }, format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(self.snapshot(self.project)[:2], (2, 1))
+        self.assertMatchesRebuild(self.project)
+
+    def test_project_cascade_removes_stats(self):
+        Task.objects.create(project=self.project, title='a')
+        project_id = self.project.id
+        self.project.delete()
+        self.assertFalse(ProjectStats.objects.filter(project_id=project_id).exists())
+
+    def test_stats_endpoint(self):
+        Task.objects.create(project=self.project, title='a', assignee_id=2, deadline=self.yesterday)
+        Task.objects.create(project=self.project, title='b', assignee_id=2, status='done',
+                            deadline=self.yesterday)
+        ProjectStats.objects.filter(project=self.project).delete()
+
+        data = self.client.get(f'/api/projects/{self.project.id}/stats/').data
+        self.assertEqual(data['done_percent'], 50.0)
+        self.assertEqual(data['overdue'], 1)
+        self.assertEqual(data['by_assignee'], [{'assignee_id': 2, 'total': 2, 'done': 1}])
+
+        project = self.client.get(f'/api/projects/{self.project.id}/').data
+        self.assertEqual(project['stats']['tasks_total'], 2)
+
+
+class ExportTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(user=TokenUser(1))
+        self.project = Project.objects.create(title='Проект', status='in_progress', owner_id=1)
+        Project.objects.create(title='Другой', status='completed', owner_id=2)
+        Task.objects.bulk_create([
+            Task(project=self.project, title=f'Задача {i}', status='done' if i % 2 else 'todo')
+            for i in range(10)
+        ])
+        rebuild_project_stats()
+
+    def export(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+
+    def test_projects_ndjson(self):
+        rows = [json.loads(line) for line in self.export('/api/projects/export/?status=in_progress').splitlines()]
+        self.assertEqual(len(rows), 1)
+        self.assertEqual((rows[0]['id'], rows[0]['tasks_total'], rows[0]['tasks_done']),
+                         (self.project.id, 10, 5))
+
+    def test_tasks_csv(self):
+        body = self.export(f'/api/tasks/export/?output=csv&project_id={self.project.id}&status=done')
+        rows = list(csv.DictReader(io.StringIO(body.lstrip('\ufeff'))))
+        self.assertEqual(len(rows), 5)
+        self.assertEqual({row['status'] for row in rows}, {'done'})
+
+
+class InstantiateTemplateTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(user=TokenUser(1))
+        self.template = Project.objects.create(title='Шаблон', description='Описание', owner_id=1, teacher_id=9)
+        ProjectMember.objects.bulk_create([
+            ProjectMember(project=self.template, user_id=1, role='owner'),
+            ProjectMember(project=self.template, user_id=9, role='viewer'),
+        ])
+
+    def instantiate(self, task_count, **data):
+        Task.objects.filter(project=self.template).delete()
+        Task.objects.bulk_create([
+            Task(project=self.template, title=f'Задача {i}', status='done', assignee_id=1)
+            for i in range(task_count)
+        ])
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.post(f'/api/projects/{self.template.id}/instantiate/', data, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        return response.data, len(context.captured_queries)
+
+    def test_copies_tasks_and_members(self):
+        teams = [{'title': 'Команда 1', 'owner_id': 10, 'members': [11, 10]},
+                 {'title': 'Команда 2', 'owner_id': 20, 'teacher_id': 8}]
+        data, _ = self.instantiate(3, teams=teams, copy_members=True)
+
+        first, second = (Project.objects.get(pk=project['id']) for project in data['projects'])
+        self.assertEqual((first.description, first.teacher_id, second.teacher_id), ('Описание', 9, 8))
+        self.assertEqual(
+            sorted(first.members.values_list('user_id', 'role')),
+            [(9, 'viewer'), (10, 'owner'), (11, 'member')]
+        )
+        tasks = Task.objects.filter(project=second)
+        self.assertEqual(tasks.count(), 3)
+        self.assertEqual(set(tasks.values_list('status', 'assignee_id')), {('todo', None)})
+        self.assertEqual(ProjectStats.objects.get(project=second).by_status, {'todo': 3})
+
+    def test_query_count_does_not_depend_on_size(self):
+        _, small = self.instantiate(2, teams=[{'title': 'A', 'owner_id': 10}])
+        teams = [{'title': f'Команда {i}', 'owner_id': 100 + i, 'members': [200 + i]} for i in range(20)]
+        _, large = self.instantiate(300, teams=teams)
+        self.assertEqual(small, large)
+
+    def test_requires_teams(self):
+        response = self.client.post(f'/api/projects/{self.template.id}/instantiate/', {'teams': []}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+class ProjectListTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(user=TokenUser(1))
+        self.project = Project.objects.create(title='Проект', description='', status='in_progress', owner_id=1)
+        self.other = Project.objects.create(title='Другой', description='', status='completed', owner_id=2)
+        ProjectMember.objects.bulk_create([
+            ProjectMember(project=self.project, user_id=user_id) for user_id in (1, 2, 3)
+        ] + [ProjectMember(project=self.other, user_id=1)])
+        Task.objects.bulk_create([Task(project=self.project, title=f'Задача {i}') for i in range(4)])
+
+    def rows(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, response.data)
+        data = response.data['results'] if isinstance(response.data, dict) else response.data
+        return {row['id']: row for row in data}
+
+    def test_summary_counts_are_not_multiplied(self):
+        rows = self.rows('/api/projects/')
+        self.assertEqual((rows[self.project.id]['members_count'], rows[self.project.id]['tasks_count']), (3, 4))
+        self.assertEqual((rows[self.other.id]['members_count'], rows[self.other.id]['tasks_count']), (1, 0))
+        self.assertNotIn('members', rows[self.project.id])
+        self.assertNotIn('tasks', rows[self.project.id])
+
+    def test_include_and_fields(self):
+        row = self.rows('/api/projects/?include=members')[self.project.id]
+        self.assertEqual(len(row['members']), 3)
+        self.assertNotIn('tasks', row)
+
+        row = self.rows('/api/projects/?fields=id,title')[self.project.id]
+        self.assertEqual(set(row), {'id', 'title'})
+
+        row = self.rows('/api/projects/?fields=id&include=tasks')[self.project.id]
+        self.assertEqual(set(row), {'id', 'tasks'})
+        self.assertEqual(len(row['tasks']), 4)
+
+    def test_query_count_does_not_depend_on_page_size(self):
+        def count_queries():
+            with CaptureQueriesContext(connection) as context:
+                self.client.get('/api/projects/?include=members,tasks')
+            return len(context.captured_queries)
+
+        small = count_queries()
+        for i in range(5):
+            project = Project.objects.create(title=f'Ещё {i}', description='', owner_id=1)
+            ProjectMember.objects.create(project=project, user_id=1)
+            Task.objects.create(project=project, title='Задача')
+        self.assertEqual(count_queries(), small)
+
+    def test_my_projects_ignores_list_filters(self):
+        rows = self.rows('/api/projects/my_projects/?status=completed&owner_id=2')
+        self.assertEqual(set(rows), {self.project.id, self.other.id})
+        self.assertEqual(rows[self.project.id]['tasks_count'], 4)
+        self.assertEqual(set(self.rows('/api/projects/?status=completed')), {self.other.id})
+
+
+class PaginationTests(TestCase):
+    """Курсорный режим и режимы подсчёта HybridPagination на списке /api/tasks/"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(user=TokenUser(1))
+        objects = [self.create_object(i) for i in range(11)]
+        # Две группы с одинаковым ключом сортировки: порядок внутри решает id
+        moment = timezone.now()
+        ids = [obj.id for obj in objects]
+        Task.objects.filter(id__in=ids[:6]).update(created_at=moment)
+        Task.objects.filter(id__in=ids[6:]).update(created_at=moment - timedelta(hours=1))
+        self.expected = ids[5::-1] + ids[:5:-1]
+
+    def create_object(self, i):
+        if not hasattr(self, 'project'):
+            self.project = Project.objects.create(title='Проект', description='', owner_id=1)
+        return Task.objects.create(project=self.project, title=f'Задача {i}')
+
+    def walk(self, url):
+        pages = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200, response.data)
+            pages.append(response.data)
+            url = response.data['next']
+        return pages
+
+    def page_ids(self, page):
+        return [row['id'] for row in page['results']]
+
+    def encode(self, data):
+        return base64.urlsafe_b64encode(json.dumps(data).encode()).decode()
+
+    def test_cursor_walk_has_no_duplicates_or_gaps(self):
+        pages = self.walk('/api/tasks/?pagination=cursor&page_size=4')
+        self.assertEqual([len(page['results']) for page in pages], [4, 4, 3])
+        self.assertEqual([pk for page in pages for pk in self.page_ids(page)], self.expected)
+        self.assertIsNone(pages[0]['previous'])
+
+    def test_previous_link_returns_preceding_page(self):
+        pages = self.walk('/api/tasks/?pagination=cursor&page_size=4')
+        for before, page in zip(pages, pages[1:]):
+            previous = self.client.get(page['previous']).data
+            self.assertEqual(self.page_ids(previous), self.page_ids(before))
+            self.assertIsNotNone(previous['next'])
+        self.assertIsNone(self.client.get(pages[1]['previous']).data['previous'])
+
+    def test_invalid_cursor(self):
+        for cursor in ('garbage', self.encode({'v': 'not a date', 'id': 1}),
+                       self.encode({'v': timezone.now().isoformat()}), self.encode([1])):
+            response = self.client.get(f'/api/tasks/?cursor={cursor}')
+            self.assertEqual(response.status_code, 404, cursor)
+
+    def test_cached_count(self):
+        data = self.client.get('/api/tasks/?count=cached&page_size=5').data
+        self.assertEqual((data['count'], data['count_mode']), (11, 'cached'))
+        self.create_object(11)
+        # Тот же запрос - то же количество из кэша, пока не истёк таймаут
+        self.assertEqual(self.client.get('/api/tasks/?count=cached&page_size=5').data['count'], 11)
+        self.assertEqual(self.client.get('/api/tasks/?page_size=5').data['count'], 12)
+        self.assertNotIn('count_mode', self.client.get('/api/tasks/?page_size=5').data)
+
+    def test_estimated_count(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'ANALYZE {Task._meta.db_table}')
+        pages = self.walk('/api/tasks/?count=estimate&page_size=5')
+        self.assertEqual([len(page['results']) for page in pages], [5, 5, 1])
+        # Маленькая выборка считается точно (ниже PAGINATION_ESTIMATE_EXACT_BELOW)
+        self.assertEqual((pages[0]['count'], pages[0]['count_mode']), (11, 'estimate'))
+        self.assertEqual([pk for page in pages for pk in self.page_ids(page)], self.expected)
+        with override_settings(PAGINATION_ESTIMATE_EXACT_BELOW=0):
+            data = self.client.get(pages[0]['next']).data
+        # Без точного подсчёта count - оценка планировщика по статистике таблицы
+        self.assertGreater(data['count'], 0)
+        self.assertEqual(len(data['results']), 5)
+        # Страница за пределами оценки - пустая, а не 404, как в точном режиме
+        self.assertEqual(self.client.get('/api/tasks/?count=estimate&page_size=5&page=9').data['results'], [])
+        self.assertEqual(self.client.get('/api/tasks/?page_size=5&page=9').status_code, 404)
+
+
+class BoardTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(user=TokenUser(1))
+        self.project = Project.objects.create(title='Проект', description='', owner_id=1)
+        Project.objects.create(title='Другой', description='', owner_id=1).tasks.create(title='Чужая')
+
+    def add_tasks(self, status, count, priority='medium'):
+        return Task.objects.bulk_create([
+            Task(project=self.project, title=f'{status} {i}', status=status, priority=priority)
+            for i in range(count)
+        ])
+
+    def board(self, query=''):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(f'/api/projects/{self.project.id}/board/{query}')
+        self.assertEqual(response.status_code, 200, response.data)
+        return response.data, len(context.captured_queries)
+
+    def test_groups_tasks_by_status(self):
+        self.add_tasks('todo', 3)
+        self.add_tasks('done', 2, priority='high')
+        data, _ = self.board()
+
+        columns = {column['status']: column for column in data['columns']}
+        self.assertEqual(list(columns), [value for value, _ in Task.STATUS_CHOICES])
+        self.assertEqual(data['total'], 5)
+        self.assertEqual(data['counts']['by_status'], {'todo': 3, 'in_progress': 0, 'review': 0, 'done': 2})
+        self.assertEqual(data['counts']['by_priority'], {'low': 0, 'medium': 3, 'high': 2, 'urgent': 0})
+        self.assertEqual({task['status'] for task in columns['done']['tasks']}, {'done'})
+        self.assertEqual((columns['todo']['count'], len(columns['todo']['tasks'])), (3, 3))
+        self.assertEqual(columns['review']['tasks'], [])
+        self.assertFalse(columns['todo']['has_more'])
+
+    def test_column_limit_and_offset(self):
+        todo = self.add_tasks('todo', 5)
+        self.add_tasks('review', 3)
+        data, _ = self.board('?limit=2&offset_todo=3')
+
+        columns = {column['status']: column for column in data['columns']}
+        # Новые задачи первыми: при одинаковой дате порядок задаёт id
+        newest_first = sorted(todo, key=lambda task: (task.created_at, task.id), reverse=True)
+        self.assertEqual([task['id'] for task in columns['todo']['tasks']], [task.id for task in newest_first[3:5]])
+        self.assertEqual((columns['todo']['offset'], columns['todo']['limit'], columns['todo']['has_more']), (3, 2, False))
+        self.assertEqual(len(columns['review']['tasks']), 2)
+        self.assertTrue(columns['review']['has_more'])
+
+        data, _ = self.board('?limit=1000&offset_todo=99&offset_review=-5')
+        columns = {column['status']: column for column in data['columns']}
+        self.assertEqual(columns['todo']['limit'], 100)
+        self.assertEqual((columns['todo']['tasks'], columns['todo']['count']), ([], 5))
+        self.assertEqual((columns['review']['offset'], len(columns['review']['tasks'])), (0, 3))
+
+    def test_query_count_does_not_depend_on_task_count(self):
+        for status, _ in Task.STATUS_CHOICES:
+            self.add_tasks(status, 1)
+        _, small = self.board()
+        for status, _ in Task.STATUS_CHOICES:
+            self.add_tasks(status, 60)
+        data, large = self.board()
+        self.assertEqual(small, large)
+        self.assertEqual(data['total'], 244)
+        self.assertEqual({len(column['tasks']) for column in data['columns']}, {20})
+
+
+class TaskBulkTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(user=TokenUser(1))
+        self.project = Project.objects.create(title='Проект', description='', owner_id=1)
+        self.task = Task.objects.create(project=self.project, title='Старая')
+
+    def bulk(self, data):
+        return self.client.post('/api/tasks/bulk/', data, format='json')
+
+    def test_string_ids_are_accepted(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.bulk({
+                'create': [{'project': str(self.project.id), 'title': 'Новая'}],
+                'update': [{'id': str(self.task.id), 'title': 'Переименована'}],
+            })
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(response.data['updated'][0]['id'], self.task.id)
+        self.assertEqual(response.data['created'][0]['project'], self.project.id)
+        self.task.refresh_from_db()
+        self.assertEqual(self.task.title, 'Переименована')
+        # Обновляемые задачи читаются с блокировкой строк
+        self.assertTrue(any('FOR UPDATE' in query['sql'] for query in context.captured_queries))
+
+    def test_batch_validation_errors(self):
+        self.assertEqual(self.bulk({}).status_code, 400)
+        response = self.bulk({'update': [{'title': 'Без id'}]})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('update', response.data)
+        response = self.bulk({'update': [{'id': self.task.id}, {'id': str(self.task.id)}]})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Duplicate', str(response.data['update']))
+
+    def test_errors_are_reported_per_item_and_nothing_is_written(self):
+        response = self.bulk({
+            'create': [
+                {'project': self.project.id, 'title': 'Хорошая'},
+                {'project': 999999, 'title': 'Нет проекта'},
+                {'project': self.project.id, 'title': 'Плохой статус', 'status': 'unknown'},
+            ],
+            'update': [
+                {'id': self.task.id, 'title': 'Переименована'},
+                {'id': 999999, 'title': 'Нет задачи'},
+            ],
+        })
+        self.assertEqual(response.status_code, 400)
+        create, update = response.data['create'], response.data['update']
+        self.assertEqual(create[0], {})
+        self.assertIn('project', create[1])
+        self.assertIn('status', create[2])
+        self.assertEqual(update[0], {})
+        self.assertIn('id', update[1])
+
+        self.assertEqual(Task.objects.filter(project=self.project).count(), 1)
+        self.task.refresh_from_db()
+        self.assertEqual(self.task.title, 'Старая')
+
+    def test_failed_write_rolls_back_whole_batch(self):
+        # Ошибка уже при записи (после проверки) откатывает и созданные задачи
+        with self.assertRaises(RuntimeError):
+            with mock.patch('projects.views.apply_task_deltas', side_effect=RuntimeError):
+                self.bulk({
+                    'create': [{'project': self.project.id, 'title': 'Новая'}],
+                    'update': [{'id': self.task.id, 'status': 'done'}],
+                })
+        self.assertEqual(list(Task.objects.values_list('title', 'status')), [('Старая', 'todo')])
+
+
+class ConditionalGetTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(user=TokenUser(1))
+        self.project = Project.objects.create(title='Проект', description='', owner_id=1)
+        self.member = ProjectMember.objects.create(project=self.project, user_id=1, role='owner')
+        self.task = Task.objects.create(project=self.project, title='Задача')
+        self.url = f'/api/projects/{self.project.id}/'
+
+    def etag(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response['ETag']
+
+    def test_repeated_get_returns_304(self):
+        response = self.client.get(self.url)
+        self.assertIn('Authorization', response['Vary'])
+        with CaptureQueriesContext(connection) as context:
+            repeated = self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(repeated.status_code, 304)
+        self.assertEqual(repeated['ETag'], response['ETag'])
+        # Только агрегаты валидатора, без загрузки и сериализации проекта
+        self.assertEqual(len(context.captured_queries), 3)
+
+        repeated = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(repeated.status_code, 304)
+
+        etag = self.etag(f'/api/tasks/{self.task.id}/')
+        self.assertEqual(self.client.get(f'/api/tasks/{self.task.id}/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_nested_writes_change_project_etag(self):
+        etags = [self.etag(self.url)]
+
+        self.task.status = 'done'
+        self.task.save()
+        etags.append(self.etag(self.url))
+
+        self.member.role = 'member'
+        self.member.save()
+        etags.append(self.etag(self.url))
+
+        # Удаление не двигает max(updated_at), но меняет количество строк
+        Task.objects.create(project=self.project, title='Ещё одна').delete()
+        self.task.delete()
+        etags.append(self.etag(self.url))
+
+        self.assertEqual(len(set(etags)), len(etags))
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etags[0]).status_code, 200)
+
+    def test_representation_params_change_etag(self):
+        url = '/api/projects/my_projects/'
+        etags = {self.etag(url), self.etag(f'{url}?fields=id,title'), self.etag(f'{url}?include=members')}
+        self.assertEqual(len(etags), 3)
+        plain = self.etag(url)
+        self.assertEqual(self.client.get(f'{url}?fields=id', HTTP_IF_NONE_MATCH=plain).status_code, 200)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=plain).status_code, 304)
+
+    def test_day_boundary_changes_validator(self):
+        day = timezone.localdate() + timedelta(days=1)
+        self.client.patch(f'/api/tasks/{self.task.id}/', {'deadline': day.isoformat()}, format='json')
+        evening = timezone.make_aware(datetime.combine(day, time(23, 30)))
+
+        with mock.patch('django.utils.timezone.now', return_value=evening):
+            response = self.client.get(self.url)
+            self.assertEqual(response.data['stats']['overdue'], 0)
+            self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+        # Ни одна строка не менялась, но после полуночи задача просрочена
+        with mock.patch('django.utils.timezone.now', return_value=evening + timedelta(hours=1)):
+            self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 200)
+            fresh = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+            self.assertEqual(fresh.status_code, 200)
+            self.assertEqual(fresh.data['stats']['overdue'], 1)
+
+
+@override_settings(SYNC_MAX_ROWS=3)
+class ChangesFeedTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(user=TokenUser(1))
+        self.project = Project.objects.create(title='Проект', description='', owner_id=1)
+        self.owner = ProjectMember.objects.create(project=self.project, user_id=1, role='owner')
+        self.member = ProjectMember.objects.create(project=self.project, user_id=2)
+        # Как после bulk-эндпоинта или instantiate: у всех задач один updated_at
+        self.tasks = Task.objects.bulk_create([Task(project=self.project, title=f'Задача {i}') for i in range(7)])
+        Task.objects.update(updated_at=timezone.now())
+
+    def changes(self, query=''):
+        response = self.client.get(f'/api/projects/changes/{query}')
+        self.assertEqual(response.status_code, 200, response.data)
+        return response.data
+
+    def sync(self, cursor=None, query=''):
+        """Пройти все порции; возвращает порции и курсор следующей синхронизации"""
+        params = f'?cursor={cursor}{query}' if cursor else (f'?{query.lstrip("&")}' if query else '')
+        pages = [self.changes(params)]
+        while pages[-1]['has_more']:
+            pages.append(self.changes(f'?cursor={pages[-1]["cursor"]}{query}'))
+        return pages, pages[-1]['cursor']
+
+    def collect(self, pages, name):
+        return [row['id'] for page in pages for row in page[name]]
+
+    def test_cursor_walk_delivers_every_row_once(self):
+        pages, _ = self.sync()
+        self.assertTrue(pages[0]['full'])
+        self.assertEqual([page['has_more'] for page in pages], [True, True, False])
+        self.assertEqual(sorted(self.collect(pages, 'tasks')), [task.id for task in self.tasks])
+        self.assertEqual(len(self.collect(pages, 'tasks')), 7)
+        self.assertEqual(self.collect(pages, 'projects'), [self.project.id])
+        self.assertEqual(sorted(self.collect(pages, 'members')), [self.owner.id, self.member.id])
+
+        since = (timezone.now() - timedelta(minutes=1)).isoformat()
+        pages, _ = self.sync(query=f'&updated_since={since}'.replace('+', '%2B'))
+        self.assertFalse(pages[0]['full'])
+        self.assertEqual(sorted(self.collect(pages, 'tasks')), [task.id for task in self.tasks])
+
+    def test_next_sync_returns_only_new_changes(self):
+        _, cursor = self.sync()
+        Task.objects.update(updated_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(self.changes(f'?cursor={cursor}')['tasks'], [])
+
+        # Строка, закоммиченная позже своего updated_at, попадает в перекрытие
+        started_at = decode_sync_cursor(cursor)[0]
+        Task.objects.filter(pk=self.tasks[0].pk).update(updated_at=started_at - timedelta(seconds=2))
+        data = self.changes(f'?cursor={cursor}')
+        self.assertEqual([row['id'] for row in data['tasks']], [self.tasks[0].id])
+        self.assertFalse(data['has_more'])
+
+    def test_member_and_task_tombstones(self):
+        _, cursor = self.sync()
+        task_ids = sorted(task.id for task in self.tasks[:2])
+        member_id = self.member.id
+        for task in self.tasks[:2]:
+            task.delete()
+        self.member.delete()
+        pages, _ = self.sync(cursor)
+        deleted = [page['deleted'] for page in pages]
+        self.assertEqual(sorted(pk for item in deleted for pk in item['tasks']), task_ids)
+        self.assertEqual([pk for item in deleted for pk in item['members']], [member_id])
+        self.assertEqual(deleted[0]['projects'], [])
+
+    def test_tombstones_are_paged_with_the_same_limit(self):
+        _, cursor = self.sync()
+        Task.objects.filter(project=self.project).delete()
+        pages, _ = self.sync(cursor)
+        self.assertEqual(len(pages), 3)
+        self.assertEqual(sorted(pk for page in pages for pk in page['deleted']['tasks']),
+                         [task.id for task in self.tasks])
+
+    def test_project_cascade_tombstones(self):
+        _, cursor = self.sync()
+        task_ids = sorted(task.id for task in self.tasks)
+        project_id = self.project.id
+        self.project.delete()
+        pages, _ = self.sync(cursor)
+        self.assertEqual(pages[0]['deleted']['projects'], [project_id])
+        self.assertEqual(sorted(pk for page in pages for pk in page['deleted']['tasks']), task_ids)
+        self.assertEqual(sorted(pk for page in pages for pk in page['deleted']['members']),
+                         [self.owner.id, self.member.id])
+        self.assertEqual(self.collect(pages, 'projects'), [])
+
+    def test_revoked_membership(self):
+        other = Project.objects.create(title='Другой', description='', owner_id=2)
+        ProjectMember.objects.create(project=other, user_id=1)
+        _, cursor = self.sync()
+        self.owner.delete()
+        Task.objects.filter(pk=self.tasks[0].pk).update(title='После исключения', updated_at=timezone.now())
+
+        pages, _ = self.sync(cursor)
+        self.assertEqual(pages[0]['deleted']['projects'], [self.project.id])
+        self.assertEqual(self.collect(pages, 'tasks'), [])
+        # Только этот проект: project_id ограничивает и исключения
+        data = self.changes(f'?cursor={cursor}&project_id={other.id}')
+        self.assertEqual(data['deleted']['projects'], [])
+
+    def test_invalid_cursor(self):
+        self.assertEqual(self.client.get('/api/projects/changes/?cursor=garbage').status_code, 400)
+        self.assertEqual(self.client.get('/api/projects/changes/?updated_since=yesterday').status_code, 400)
+
+
+class ProjectStatsConcurrencyTests(TransactionTestCase):
+
+    def test_concurrent_first_writers_do_not_overwrite_each_other(self):
+        project = Project.objects.create(title='Проект', description='', owner_id=1)
+        ProjectStats.objects.filter(project=project).delete()
+        created, finish = threading.Event(), threading.Event()
+
+        def hold_first_task():
+            try:
+                with transaction.atomic():
+                    Task.objects.create(project=project, title='Первая')
+                    created.set()
+                    finish.wait(5)
+            finally:
+                connections.close_all()
+
+        def create_second_task():
+            try:
+                Task.objects.create(project=project, title='Вторая', status='done')
+            finally:
+                connections.close_all()
+
+        first = threading.Thread(target=hold_first_task)
+        first.start()
+        created.wait(5)
+        second = threading.Thread(target=create_second_task)
+        second.start()
+        # Второй писатель ждёт блокировку проекта, пока первый не закоммитит
+        second.join(0.5)
+        finish.set()
+        first.join()
+        second.join()
+
+        stats = ProjectStats.objects.get(project=project)
+        self.assertEqual((stats.tasks_total, stats.tasks_done), (2, 1))
+        self.assertEqual(stats.by_status, {'todo': 1, 'done': 1})
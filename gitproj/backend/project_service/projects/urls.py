@@ -1,11 +1,12 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import ProjectViewSet, TaskViewSet
+from .views import ProjectViewSet, TaskViewSet, SearchView
 
 router = DefaultRouter()
 router.register(r'projects', ProjectViewSet, basename='project')
 router.register(r'tasks', TaskViewSet, basename='task')
 
 urlpatterns = [
+    path('search/', SearchView.as_view(), name='search'),
     path('', include(router.urls)),
 ]
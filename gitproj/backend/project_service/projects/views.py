@@ -2,30 +2,120 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.views import APIView
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
+from datetime import timedelta
 
-from .models import Project, ProjectMember, Task
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .conditional import ConditionalGetMixin, parse_pk
+from .exports import export_format, export_parameters, export_response
+from .models import Project, ProjectMember, ProjectStats, Task, Tombstone
+from .search import get_search_backend
+from .stats import apply_task_deltas, rebuild_project_stats, task_key_of
+from .sync import SYNC_STREAMS, InvalidSyncCursor, after_position, decode_sync_cursor, encode_sync_cursor
 from .serializers import (
-    ProjectSerializer, ProjectCreateSerializer,
-    ProjectMemberSerializer, TaskSerializer
+    ProjectSerializer, ProjectCreateSerializer, ProjectListSerializer,
+    ProjectMemberSerializer, TaskSerializer, TaskBulkSerializer, TaskBulkItemSerializer,
+    ProjectFeedSerializer, ProjectMemberFeedSerializer, ProjectStatsSerializer,
+    ProjectInstantiateSerializer, requested_fields
 )
 
-class ProjectViewSet(viewsets.ModelViewSet):
+# Kanban-доска: сколько карточек отдавать в каждой колонке за раз
+BOARD_DEFAULT_LIMIT = 20
+BOARD_MAX_LIMIT = 100
+
+# Размер пачки для bulk_create/bulk_update
+BULK_BATCH_SIZE = 500
+
+# Поиск: сколько результатов отдавать максимум и минимальная длина запроса
+SEARCH_DEFAULT_LIMIT = 20
+SEARCH_MAX_LIMIT = 50
+SEARCH_MIN_QUERY_LENGTH = 2
+SEARCH_TYPES = ('projects', 'tasks')
+
+
+def int_query_param(request, name, default, minimum=0, maximum=None):
+    """Целочисленный параметр запроса с ограничением диапазона"""
+    try:
+        value = int(request.query_params.get(name, default))
+    except (TypeError, ValueError):
+        value = default
+    value = max(value, minimum)
+    if maximum is not None:
+        value = min(value, maximum)
+    return value
+
+
+def related_count(model):
+    """Количество связанных строк коррелированным подзапросом.
+    
+    В отличие от двух JOIN + GROUP BY не перемножает участников на задачи и
+    выполняется только для строк текущей страницы.
+    """
+    counts = model.objects.filter(project=OuterRef('pk')).order_by().values(
+        'project'
+    ).annotate(count=Count('pk')).values('count')
+    return Coalesce(Subquery(counts), 0)
+
+
+list_fields_parameters = [
+    openapi.Parameter('include', openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                      description="Вложенные данные через запятую: members,tasks"),
+    openapi.Parameter('fields', openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                      description="Ограничить набор полей, например id,title,status"),
+]
+
+class ProjectViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     """ViewSet для управления проектами"""
     
     queryset = Project.objects.all()
     permission_classes = [IsAuthenticated]
+    # stats.overdue считается от сегодняшней даты
+    conditional_on_date = True
+    
+    # Действия, которые отдают краткое представление проекта
+    summary_actions = ('list', 'my_projects')
+    # Действия, которые отдают проект вместе со всеми участниками и задачами
+    nested_actions = ('retrieve', 'update', 'partial_update')
     
     def get_serializer_class(self):
         if self.action == 'create':
             return ProjectCreateSerializer
+        if self.action in self.summary_actions:
+            return ProjectListSerializer
         return ProjectSerializer
     
     def get_queryset(self):
         """Фильтрация проектов - возвращаем ВСЕ проекты по умолчанию"""
-        queryset = Project.objects.all().prefetch_related('members', 'tasks')
+        return self.apply_filters(self.get_annotated_queryset())
+    
+    def get_annotated_queryset(self):
+        """Проекты со счётчиками и подгрузкой вложенных данных для текущего действия, без фильтров"""
+        # Счётчики считаются в том же запросе, а не .count() на каждую строку
+        queryset = Project.objects.annotate(
+            members_count=related_count(ProjectMember),
+            tasks_count=related_count(Task),
+        ).select_related('stats').order_by('-created_at')
+        
+        if self.action in self.summary_actions:
+            include = requested_fields(self.request, 'include')
+            expand = [name for name in ProjectListSerializer.EXPANDABLE_FIELDS if name in include]
+            if expand:
+                queryset = queryset.prefetch_related(*expand)
+        elif self.action in self.nested_actions:
+            queryset = queryset.prefetch_related('members', 'tasks')
         
+        return queryset
+    
+    def apply_filters(self, queryset):
+        """Фильтры из параметров запроса, общие для списка и выгрузки"""
         # Фильтр по статусу (опционально)
         status_filter = self.request.query_params.get('status')
         if status_filter:
@@ -36,18 +126,355 @@ class ProjectViewSet(viewsets.ModelViewSet):
         if owner_id:
             queryset = queryset.filter(owner_id=owner_id)
         
-        return queryset.distinct()
+        # Пакетная выборка по id (?ids=1,2,3) для запросов из других сервисов
+        ids = self.request.query_params.get('ids')
+        if ids is not None:
+            queryset = queryset.filter(id__in=[int(pk) for pk in ids.split(',') if pk.strip().isdigit()])
+        
+        return queryset
+    
+    def get_conditional_querysets(self):
+        """Валидатор проекта учитывает вложенные задачи и участников"""
+        if self.action == 'retrieve':
+            pk = parse_pk(self.kwargs.get('pk'))
+            if pk is None:
+                return None
+            projects = Project.objects.filter(pk=pk)
+            tasks = Task.objects.filter(project_id=pk)
+            members = ProjectMember.objects.filter(project_id=pk)
+        elif self.action == 'my_projects':
+            member_of = ProjectMember.objects.filter(user_id=self.request.user.id).values('project_id')
+            projects = Project.objects.filter(id__in=member_of)
+            tasks = Task.objects.filter(project_id__in=member_of)
+            members = ProjectMember.objects.filter(project_id__in=member_of)
+        else:
+            return None
+        return [(projects, 'updated_at'), (tasks, 'updated_at'), (members, 'updated_at')]
+    
+    @swagger_auto_schema(manual_parameters=list_fields_parameters + [
+        openapi.Parameter('ids', openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                          description="Только проекты с этими id через запятую")
+    ])
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
     
     @swagger_auto_schema(
-        operation_description="Получить мои проекты"
+        operation_description="Получить мои проекты (все, фильтры списка ?status=/?owner_id= не применяются)",
+        manual_parameters=list_fields_parameters
     )
     @action(detail=False, methods=['get'])
     def my_projects(self, request):
         """Получить проекты текущего пользователя"""
         user_id = request.user.id if hasattr(request.user, 'id') else None
-        projects = Project.objects.filter(members__user_id=user_id)
-        serializer = self.get_serializer(projects, many=True)
-        return Response(serializer.data)
+        member_of = ProjectMember.objects.filter(user_id=user_id).values('project_id')
+        # Только аннотации: как и раньше, my_projects отдаёт все проекты пользователя
+        projects = self.get_annotated_queryset().filter(id__in=member_of)
+        return self.conditional_response(
+            request, lambda: Response(self.get_serializer(projects, many=True).data)
+        )
+    
+    @swagger_auto_schema(
+        operation_description="Потоковая выгрузка проектов в NDJSON или CSV с фильтрами списка",
+        manual_parameters=export_parameters
+    )
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """Выгрузка всех проектов без пагинации"""
+        output = export_format(request)
+        if output is None:
+            return Response({"detail": "output must be ndjson or csv"}, status=status.HTTP_400_BAD_REQUEST)
+        
+        projects = self.apply_filters(Project.objects.order_by('id')).annotate(
+            tasks_total=F('stats__tasks_total'),
+            tasks_done=F('stats__tasks_done'),
+        )
+        fields = ['id', 'title', 'description', 'status', 'start_date', 'end_date',
+                  'deadline', 'owner_id', 'teacher_id', 'repository_url',
+                  'tasks_total', 'tasks_done', 'created_at', 'updated_at']
+        return export_response(projects, fields, output, 'projects')
+    
+    @swagger_auto_schema(
+        operation_description="Лента изменений проектов, участников и задач с отметками об удалении",
+        manual_parameters=[
+            openapi.Parameter('cursor', openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                              description="Курсор из предыдущего ответа; без него и updated_since - полный снимок"),
+            openapi.Parameter('updated_since', openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                              description="Начать с момента (ISO 8601) вместо курсора"),
+            openapi.Parameter('project_id', openapi.IN_QUERY, type=openapi.TYPE_INTEGER,
+                              description="Ограничить одним проектом"),
+        ]
+    )
+    @action(detail=False, methods=['get'])
+    def changes(self, request):
+        """Изменения в проектах пользователя после курсора.
+        
+        Возвращает изменённые проекты, участников и задачи, а также id удалённых
+        строк, включая каскадные удаления и проекты, из которых пользователя
+        исключили. Клиент сохраняет cursor и передаёт его в следующий раз; при
+        has_more нужно сразу запросить следующую порцию с этим же cursor.
+        
+        Каждый поток листается по (дата, id), поэтому порция не зацикливается,
+        даже если у тысяч строк одинаковый updated_at. Перекрытие на
+        расхождение часов применяется только к первому запросу синхронизации.
+        """
+        now = timezone.now()
+        user_id = request.user.id if hasattr(request.user, 'id') else None
+        limit = settings.SYNC_MAX_ROWS
+        
+        positions = None
+        since = None
+        cursor_raw = request.query_params.get('cursor')
+        since_raw = request.query_params.get('updated_since')
+        if cursor_raw:
+            try:
+                started_at, after, full, positions = decode_sync_cursor(cursor_raw)
+            except InvalidSyncCursor:
+                return Response({"detail": "Invalid cursor"}, status=status.HTTP_400_BAD_REQUEST)
+            if positions is None:
+                since = started_at
+        elif since_raw:
+            since = parse_datetime(since_raw)
+            if since is None:
+                return Response(
+                    {"detail": "Invalid updated_since"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            if timezone.is_naive(since):
+                since = timezone.make_aware(since)
+        
+        if positions is None:
+            # Первый запрос синхронизации
+            started_at = now
+            # Слишком старый курсор: отметки об удалении уже могли быть вычищены
+            retention = timedelta(days=settings.SYNC_TOMBSTONE_RETENTION_DAYS)
+            full = since is None or since < now - retention
+            after = None if full else since - timedelta(seconds=settings.SYNC_CLOCK_SKEW_SECONDS)
+        
+        project_ids = set(
+            ProjectMember.objects.filter(user_id=user_id).values_list('project_id', flat=True)
+        )
+        only_project = parse_pk(request.query_params.get('project_id'))
+        if only_project is not None:
+            project_ids &= {only_project}
+        
+        querysets = {
+            'projects': Project.objects.filter(id__in=project_ids),
+            'members': ProjectMember.objects.filter(project_id__in=project_ids),
+            'tasks': Task.objects.filter(project_id__in=project_ids),
+            'tombstones': None,
+        }
+        feed_serializers = {
+            'projects': ProjectFeedSerializer,
+            'members': ProjectMemberFeedSerializer,
+            'tasks': TaskSerializer,
+        }
+        deleted = {'projects': set(), 'members': [], 'tasks': []}
+        
+        if not full:
+            # Проекты, из которых пользователя исключили (в том числе удалённые целиком)
+            revoked = set(Tombstone.objects.filter(
+                model='member', user_id=user_id, deleted_at__gt=after
+            ).values_list('project_id', flat=True)) - project_ids
+            if only_project is not None:
+                revoked &= {only_project}
+            if positions is None:
+                deleted['projects'] |= revoked
+            querysets['tombstones'] = Tombstone.objects.filter(
+                Q(project_id__in=project_ids) | Q(project_id__in=revoked)
+            )
+        
+        rows = {}
+        pending = {}
+        for name, field in SYNC_STREAMS.items():
+            queryset = querysets[name]
+            if queryset is None or (positions is not None and name not in positions):
+                # Поток не нужен (полный снимок без отметок) или уже дочитан
+                rows[name] = []
+                continue
+            if positions is not None:
+                queryset = after_position(queryset, field, positions[name])
+            elif after is not None:
+                queryset = queryset.filter(**{f'{field}__gt': after})
+            page = list(queryset.order_by(field, 'id')[:limit + 1])
+            if len(page) > limit:
+                page = page[:limit]
+                pending[name] = (getattr(page[-1], field), page[-1].id)
+            rows[name] = page
+        
+        for tombstone in rows.pop('tombstones'):
+            if tombstone.model == 'project':
+                deleted['projects'].add(tombstone.object_id)
+            else:
+                deleted[f'{tombstone.model}s'].append(tombstone.object_id)
+        deleted['projects'] = sorted(deleted['projects'])
+        
+        # Следующая синхронизация начнётся с начала этой: дочитанные потоки
+        # прочитаны в started_at, а не в момент последней порции
+        if pending:
+            cursor = encode_sync_cursor(started_at, after, full, pending)
+        else:
+            cursor = encode_sync_cursor(started_at)
+        
+        return Response({
+            'cursor': cursor,
+            'full': full,
+            'has_more': bool(pending),
+            **{name: feed_serializers[name](page, many=True).data for name, page in rows.items()},
+            'deleted': deleted,
+        })
+    
+    @swagger_auto_schema(
+        operation_description="Kanban-доска проекта: задачи, сгруппированные по статусам",
+        manual_parameters=[
+            openapi.Parameter('limit', openapi.IN_QUERY, type=openapi.TYPE_INTEGER,
+                              description=f"Карточек в колонке (по умолчанию {BOARD_DEFAULT_LIMIT}, максимум {BOARD_MAX_LIMIT})"),
+        ] + [
+            openapi.Parameter(f'offset_{value}', openapi.IN_QUERY, type=openapi.TYPE_INTEGER,
+                              description=f"Смещение в колонке «{label}»")
+            for value, label in Task.STATUS_CHOICES
+        ]
+    )
+    @action(detail=True, methods=['get'])
+    def board(self, request, pk=None):
+        """Kanban-доска проекта за один запрос.
+        
+        Счётчики по статусам и приоритетам считаются одним GROUP BY, а каждая
+        колонка ограничена limit и листается своим offset_<status>, поэтому
+        размер ответа не зависит от числа задач в проекте.
+        """
+        project = self.get_object()
+        limit = int_query_param(request, 'limit', BOARD_DEFAULT_LIMIT, 1, BOARD_MAX_LIMIT)
+        tasks = Task.objects.filter(project=project)
+        
+        by_status = {value: 0 for value, _ in Task.STATUS_CHOICES}
+        by_priority = {value: 0 for value, _ in Task.PRIORITY_CHOICES}
+        grouped = tasks.order_by().values('status', 'priority').annotate(total=Count('id'))
+        for row in grouped:
+            by_status[row['status']] = by_status.get(row['status'], 0) + row['total']
+            by_priority[row['priority']] = by_priority.get(row['priority'], 0) + row['total']
+        
+        columns = []
+        for value, label in Task.STATUS_CHOICES:
+            offset = int_query_param(request, f'offset_{value}', 0)
+            total = by_status[value]
+            items = []
+            if offset < total:
+                items = tasks.filter(status=value).order_by('-created_at', '-id')[offset:offset + limit]
+            serializer = TaskSerializer(items, many=True)
+            columns.append({
+                'status': value,
+                'label': label,
+                'count': total,
+                'offset': offset,
+                'limit': limit,
+                'has_more': offset + len(serializer.data) < total,
+                'tasks': serializer.data,
+            })
+        
+        return Response({
+            'project': project.id,
+            'total': sum(by_status.values()),
+            'counts': {
+                'by_status': by_status,
+                'by_priority': by_priority,
+            },
+            'columns': columns,
+        })
+    
+    @swagger_auto_schema(
+        operation_description="Прогресс проекта: доля выполненных, просроченные, задачи по исполнителям",
+        responses={200: ProjectStatsSerializer}
+    )
+    @action(detail=True, methods=['get'])
+    def stats(self, request, pk=None):
+        """Статистика проекта из сводной таблицы, без прохода по задачам"""
+        project = self.get_object()
+        try:
+            stats = project.stats
+        except ProjectStats.DoesNotExist:
+            rebuild_project_stats([project.id])
+            stats = ProjectStats.objects.get(project=project)
+        return Response({'project': project.id, **ProjectStatsSerializer(stats).data})
+    
+    @swagger_auto_schema(
+        operation_description="Создать проекты для нескольких команд по шаблону этого проекта",
+        request_body=ProjectInstantiateSerializer
+    )
+    @action(detail=True, methods=['post'])
+    def instantiate(self, request, pk=None):
+        """Копирует проект, его задачи и участников в новый проект для каждой команды.
+        
+        Всё пишется одной транзакцией через bulk_create, поэтому число запросов
+        не зависит ни от количества команд, ни от количества задач в шаблоне.
+        """
+        template = self.get_object()
+        serializer = ProjectInstantiateSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        teams = serializer.validated_data['teams']
+        copy_assignees = serializer.validated_data['copy_assignees']
+        
+        template_tasks = list(
+            Task.objects.filter(project=template).order_by('id').values(
+                'title', 'description', 'priority', 'assignee_id', 'deadline'
+            )
+        )
+        template_members = []
+        if serializer.validated_data['copy_members']:
+            template_members = list(
+                template.members.exclude(role='owner').values_list('user_id', 'role')
+            )
+        
+        with transaction.atomic():
+            projects = Project.objects.bulk_create([
+                Project(
+                    title=team['title'],
+                    description=team.get('description', template.description),
+                    start_date=template.start_date,
+                    end_date=template.end_date,
+                    deadline=template.deadline,
+                    owner_id=team['owner_id'],
+                    teacher_id=team.get('teacher_id', template.teacher_id),
+                    repository_url=team.get('repository_url', ''),
+                )
+                for team in teams
+            ])
+            
+            tasks = [
+                Task(
+                    project=project,
+                    title=task['title'],
+                    description=task['description'],
+                    priority=task['priority'],
+                    deadline=task['deadline'],
+                    assignee_id=task['assignee_id'] if copy_assignees else None,
+                )
+                for project in projects
+                for task in template_tasks
+            ]
+            # Без batch_size: на PostgreSQL это один INSERT на все задачи всех команд
+            Task.objects.bulk_create(tasks)
+            
+            members = []
+            for project, team in zip(projects, teams):
+                # Владелец, как и в ProjectCreateSerializer, становится участником с ролью owner
+                roles = {team['owner_id']: 'owner'}
+                for user_id, role in template_members:
+                    roles.setdefault(user_id, role)
+                for user_id in team['members']:
+                    roles.setdefault(user_id, 'member')
+                members += [
+                    ProjectMember(project=project, user_id=user_id, role=role)
+                    for user_id, role in roles.items()
+                ]
+            ProjectMember.objects.bulk_create(members)
+            
+            rebuild_project_stats([project.id for project in projects])
+        
+        return Response({
+            'template': template.id,
+            'tasks_per_project': len(template_tasks),
+            'projects': ProjectFeedSerializer(projects, many=True).data,
+        }, status=status.HTTP_201_CREATED)
     
     @swagger_auto_schema(
         operation_description="Добавить участника в проект",
@@ -88,7 +515,7 @@ class ProjectViewSet(viewsets.ModelViewSet):
             )
 
 
-class TaskViewSet(viewsets.ModelViewSet):
+class TaskViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     """ViewSet для управления задачами"""
     
     queryset = Task.objects.all()
@@ -104,10 +531,8 @@ class TaskViewSet(viewsets.ModelViewSet):
         if project_id:
             try:
                 queryset = queryset.filter(project_id=int(project_id))
-                print(f'📋 Filtering tasks by project_id={project_id}')
-                print(f'📋 Found {queryset.count()} tasks')
             except (ValueError, TypeError):
-                print(f'❌ Invalid project_id: {project_id}')
+                pass
         
         # Фильтр по исполнителю
         assignee_id = self.request.query_params.get('assignee_id')
@@ -124,6 +549,16 @@ class TaskViewSet(viewsets.ModelViewSet):
         
         return queryset
     
+    def get_conditional_querysets(self):
+        if self.action == 'retrieve':
+            pk = parse_pk(self.kwargs.get('pk'))
+            if pk is None:
+                return None
+            return [(Task.objects.filter(pk=pk), 'updated_at')]
+        if self.action == 'my_tasks':
+            return [(Task.objects.filter(assignee_id=self.request.user.id), 'updated_at')]
+        return None
+    
     @swagger_auto_schema(
         operation_description="Получить мои задачи"
     )
@@ -132,5 +567,185 @@ class TaskViewSet(viewsets.ModelViewSet):
         """Получить задачи текущего пользователя"""
         user_id = request.user.id if hasattr(request.user, 'id') else None
         tasks = Task.objects.filter(assignee_id=user_id)
-        serializer = self.get_serializer(tasks, many=True)
-        return Response(serializer.data)
+        return self.conditional_response(
+            request, lambda: Response(self.get_serializer(tasks, many=True).data)
+        )
+    
+    @swagger_auto_schema(
+        operation_description="Потоковая выгрузка задач в NDJSON или CSV с фильтрами списка",
+        manual_parameters=export_parameters
+    )
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """Выгрузка всех задач без пагинации"""
+        output = export_format(request)
+        if output is None:
+            return Response({"detail": "output must be ndjson or csv"}, status=status.HTTP_400_BAD_REQUEST)
+        
+        fields = ['id', 'project_id', 'title', 'description', 'status', 'priority',
+                  'assignee_id', 'deadline', 'created_at', 'updated_at']
+        return export_response(self.get_queryset().order_by('id'), fields, output, 'tasks')
+    
+    @swagger_auto_schema(
+        operation_description="Пакетное создание и обновление задач в одной транзакции",
+        request_body=TaskBulkSerializer
+    )
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        """Пакетные операции над задачами.
+        
+        Весь пакет проверяется целиком: при любой ошибке ничего не пишется, а в
+        ответе ошибки стоят на позициях соответствующих элементов. Запись идёт
+        через bulk_create/bulk_update одной транзакцией; обновляемые задачи
+        блокируются до её конца, чтобы параллельная правка не затёрлась.
+        """
+        batch = TaskBulkSerializer(data=request.data)
+        batch.is_valid(raise_exception=True)
+        with transaction.atomic():
+            return self.apply_bulk(request, batch)
+    
+    def apply_bulk(self, request, batch):
+        create_items = batch.validated_data['create']
+        update_items = batch.validated_data['update']
+        
+        # Блокируем в порядке id, чтобы встречные пакеты не взаимоблокировались
+        locked = Task.objects.select_for_update().filter(
+            id__in=[item['id'] for item in update_items]
+        ).order_by('id')
+        tasks = {task.id: task for task in locked}
+        context = {'request': request, 'projects': Project.objects.in_bulk(batch.get_project_ids())}
+        
+        create_errors, update_errors = [], []
+        to_create, to_update = [], []
+        
+        for item in create_items:
+            serializer = TaskBulkItemSerializer(data=item, context=context)
+            if serializer.is_valid():
+                to_create.append(Task(**serializer.validated_data))
+                create_errors.append({})
+            else:
+                create_errors.append(serializer.errors)
+        
+        updated_fields = set()
+        # bulk_create/bulk_update не шлют сигналы, статистику обновляем сами
+        old_keys = []
+        for item in update_items:
+            task = tasks.get(item['id'])
+            if task is None:
+                update_errors.append({'id': [f'Task {item["id"]} not found']})
+                continue
+            data = {key: value for key, value in item.items() if key != 'id'}
+            serializer = TaskBulkItemSerializer(task, data=data, partial=True, context=context)
+            if serializer.is_valid():
+                old_keys.append(task_key_of(task))
+                for attr, value in serializer.validated_data.items():
+                    setattr(task, attr, value)
+                updated_fields.update(serializer.validated_data)
+                to_update.append(task)
+                update_errors.append({})
+            else:
+                update_errors.append(serializer.errors)
+        
+        if any(create_errors) or any(update_errors):
+            return Response(
+                {'create': create_errors, 'update': update_errors},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        created = Task.objects.bulk_create(to_create, batch_size=BULK_BATCH_SIZE)
+        if to_update:
+            # bulk_update не трогает auto_now, поэтому выставляем updated_at сами
+            now = timezone.now()
+            for task in to_update:
+                task.updated_at = now
+            Task.objects.bulk_update(
+                to_update, sorted(updated_fields | {'updated_at'}), batch_size=BULK_BATCH_SIZE
+            )
+        apply_task_deltas(
+            removed=old_keys,
+            added=[task_key_of(task) for task in created + to_update]
+        )
+        
+        return Response({
+            'created': TaskSerializer(created, many=True).data,
+            'updated': TaskSerializer(to_update, many=True).data,
+        })
+
+
+class SearchView(APIView):
+    """Полнотекстовый поиск по проектам и задачам"""
+    
+    permission_classes = [IsAuthenticated]
+    
+    @swagger_auto_schema(
+        operation_description="Поиск по названию и описанию проектов и задач",
+        manual_parameters=[
+            openapi.Parameter('q', openapi.IN_QUERY, type=openapi.TYPE_STRING, required=True,
+                              description="Поисковый запрос: слова, \"фраза\", -исключение, or"),
+            openapi.Parameter('type', openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                              description="Где искать через запятую: projects,tasks"),
+            openapi.Parameter('project_id', openapi.IN_QUERY, type=openapi.TYPE_INTEGER,
+                              description="Искать задачи только в этом проекте"),
+            openapi.Parameter('limit', openapi.IN_QUERY, type=openapi.TYPE_INTEGER,
+                              description=f"Количество результатов (до {SEARCH_MAX_LIMIT})"),
+        ]
+    )
+    def get(self, request):
+        """Результаты отсортированы по релевантности и ограничены limit.
+        
+        Каждая выборка сама ограничена limit, так что объём работы не растёт
+        вместе с количеством проектов и задач.
+        """
+        query = request.query_params.get('q', '').strip()
+        if len(query) < SEARCH_MIN_QUERY_LENGTH:
+            return Response(
+                {'detail': f'q must be at least {SEARCH_MIN_QUERY_LENGTH} characters'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        types = requested_fields(request, 'type') or set(SEARCH_TYPES)
+        if not types <= set(SEARCH_TYPES):
+            return Response(
+                {'detail': f'type must be one of: {", ".join(SEARCH_TYPES)}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        limit = int_query_param(
+            request, 'limit', SEARCH_DEFAULT_LIMIT, minimum=1, maximum=SEARCH_MAX_LIMIT
+        )
+        
+        backend = get_search_backend()
+        results = []
+        
+        project_id = request.query_params.get('project_id')
+        if project_id is not None and parse_pk(project_id) is None:
+            return Response({'detail': 'Invalid project_id'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        if 'projects' in types and project_id is None:
+            for project, rank, highlight in backend.search(Project.objects.all(), query, limit):
+                results.append({
+                    'type': 'project',
+                    'id': project.id,
+                    'project_id': project.id,
+                    'title': project.title,
+                    'status': project.status,
+                    'rank': rank,
+                    'highlight': highlight,
+                })
+        
+        if 'tasks' in types:
+            tasks = Task.objects.all()
+            if project_id is not None:
+                tasks = tasks.filter(project_id=parse_pk(project_id))
+            for task, rank, highlight in backend.search(tasks, query, limit):
+                results.append({
+                    'type': 'task',
+                    'id': task.id,
+                    'project_id': task.project_id,
+                    'title': task.title,
+                    'status': task.status,
+                    'rank': rank,
+                    'highlight': highlight,
+                })
+        
+        results.sort(key=lambda hit: hit['rank'], reverse=True)
+        return Response({'query': query, 'results': results[:limit]})
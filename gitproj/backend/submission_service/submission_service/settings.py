@@ -2,6 +2,7 @@ import os
 from pathlib import Path
 from datetime import timedelta
 from dotenv import load_dotenv
+from corsheaders.defaults import default_headers
 
 load_dotenv()
 
@@ -91,6 +92,9 @@ CORS_ALLOWED_ORIGINS = [
     "http://localhost:3000",
 ]
 CORS_ALLOW_CREDENTIALS = True
+# Заголовки возобновляемой загрузки и докачки файлов
+CORS_ALLOW_HEADERS = (*default_headers, 'upload-offset', 'range', 'if-range')
+CORS_EXPOSE_HEADERS = ['Upload-Offset', 'Content-Range', 'Accept-Ranges', 'Content-Disposition', 'ETag']
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
@@ -99,10 +103,29 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
+    'DEFAULT_PAGINATION_CLASS': 'submissions.pagination.HybridPagination',
     'PAGE_SIZE': 20,
 }
 
+# Пагинация: время жизни кэша для ?count=cached и порог точного подсчёта для ?count=estimate
+PAGINATION_COUNT_CACHE_TIMEOUT = int(os.getenv('PAGINATION_COUNT_CACHE_TIMEOUT', '60'))
+PAGINATION_ESTIMATE_EXACT_BELOW = int(os.getenv('PAGINATION_ESTIMATE_EXACT_BELOW', '1000'))
+
+# Очередь проверки: срок брони и сколько работ можно взять за раз
+SUBMISSION_CLAIM_LEASE_SECONDS = int(os.getenv('SUBMISSION_CLAIM_LEASE_SECONDS', '900'))
+SUBMISSION_CLAIM_MAX = int(os.getenv('SUBMISSION_CLAIM_MAX', '50'))
+
+# Статистика оценок: кэш сбрасывается при изменении оценок, срок - страховка
+GRADEBOOK_CACHE_TIMEOUT = int(os.getenv('GRADEBOOK_CACHE_TIMEOUT', '3600'))
+
+# Загрузка файлов: хранилище по SHA-256, лимиты размера и срок жизни незавершённых загрузок
+UPLOAD_ROOT = Path(os.getenv('UPLOAD_ROOT', BASE_DIR / 'media' / 'uploads'))
+UPLOAD_MAX_SIZE = int(os.getenv('UPLOAD_MAX_SIZE', str(1024 ** 3)))
+UPLOAD_CHUNK_MAX_SIZE = int(os.getenv('UPLOAD_CHUNK_MAX_SIZE', str(8 * 1024 ** 2)))
+UPLOAD_EXPIRE_SECONDS = int(os.getenv('UPLOAD_EXPIRE_SECONDS', '86400'))
+# Префикс internal-location в nginx; если задан, файл отдаёт nginx через X-Accel-Redirect
+UPLOAD_ACCEL_REDIRECT_PREFIX = os.getenv('UPLOAD_ACCEL_REDIRECT_PREFIX', '')
+
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(hours=1),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=7),
@@ -114,3 +137,14 @@ SIMPLE_JWT = {
 AUTH_SERVICE_URL = os.getenv('AUTH_SERVICE_URL', 'http://localhost:8001')
 USER_SERVICE_URL = os.getenv('USER_SERVICE_URL', 'http://localhost:8002')
 PROJECT_SERVICE_URL = os.getenv('PROJECT_SERVICE_URL', 'http://localhost:8003')
+
+# Запросы к соседним сервисам: таймауты (секунды), пул соединений и размыкатель цепи
+SERVICE_CONNECT_TIMEOUT = float(os.getenv('SERVICE_CONNECT_TIMEOUT', '1'))
+SERVICE_READ_TIMEOUT = float(os.getenv('SERVICE_READ_TIMEOUT', '3'))
+SERVICE_POOL_SIZE = int(os.getenv('SERVICE_POOL_SIZE', '10'))
+SERVICE_BREAKER_FAILURES = int(os.getenv('SERVICE_BREAKER_FAILURES', '5'))
+SERVICE_BREAKER_RESET_SECONDS = float(os.getenv('SERVICE_BREAKER_RESET_SECONDS', '30'))
+
+# Кэш проектов из project_service: найденные и отсутствующие id
+PROJECT_CACHE_TIMEOUT = int(os.getenv('PROJECT_CACHE_TIMEOUT', '300'))
+PROJECT_CACHE_NEGATIVE_TIMEOUT = int(os.getenv('PROJECT_CACHE_NEGATIVE_TIMEOUT', '30'))
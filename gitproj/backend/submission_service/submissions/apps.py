@@ -4,3 +4,6 @@ class SubmissionsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'submissions'
     verbose_name = 'Сдачи работ'
+    
+    def ready(self):
+        from . import signals  # noqa: F401
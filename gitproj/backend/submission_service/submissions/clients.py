@@ -0,0 +1,183 @@
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from django.conf import settings
+from django.core.cache import cache
+
+
+class ServiceUnavailable(Exception):
+    """Сервис не ответил вовремя, вернул 5xx или цепь разомкнута"""
+
+
+class CircuitBreaker:
+    """Размыкатель цепи для вызовов соседнего сервиса.
+
+    После failure_threshold неудач подряд цепь размыкается, и запросы
+    сразу завершаются ServiceUnavailable, не дожидаясь таймаутов. Через
+    reset_timeout секунд пропускается один пробный запрос: успех замыкает
+    цепь, неудача снова размыкает её.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+    def __init__(self, failure_threshold, reset_timeout, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+        self.lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return self.CLOSED
+        if self.clock() - self.opened_at >= self.reset_timeout:
+            return self.HALF_OPEN
+        return self.OPEN
+
+    def allow(self):
+        """Можно ли сейчас выполнить запрос"""
+        with self.lock:
+            state = self.state
+            if state == self.CLOSED:
+                return True
+            if state == self.HALF_OPEN and not self.probing:
+                self.probing = True
+                return True
+            return False
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.probing = False
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.probing or self.failures >= self.failure_threshold:
+                self.opened_at = self.clock()
+            self.probing = False
+
+
+class ServiceClient:
+    """HTTP-клиент соседнего сервиса.
+
+    Один requests.Session на процесс держит пул keep-alive соединений, так
+    что запросы не платят за TCP-рукопожатие. У каждого запроса есть таймаут
+    на соединение и на ответ, а неудачи считает CircuitBreaker.
+    """
+
+    def __init__(self, base_url, timeout, pool_size, breaker):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.breaker = breaker
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def get(self, path, params=None, authorization=None):
+        """GET с разбором JSON. 4xx возвращаются как есть: сервис при этом жив"""
+        if not self.breaker.allow():
+            raise ServiceUnavailable(f'{self.base_url}: circuit is open')
+        headers = {'Authorization': authorization} if authorization else {}
+        try:
+            response = self.session.get(
+                f'{self.base_url}{path}', params=params, headers=headers, timeout=self.timeout
+            )
+            if response.status_code >= 500:
+                raise ServiceUnavailable(f'{self.base_url}{path}: HTTP {response.status_code}')
+            data = response.json()
+        except (requests.RequestException, ValueError, ServiceUnavailable) as exc:
+            self.breaker.record_failure()
+            if isinstance(exc, ServiceUnavailable):
+                raise
+            raise ServiceUnavailable(f'{self.base_url}{path}: {exc}') from exc
+        self.breaker.record_success()
+        return response.status_code, data
+
+
+class ProjectServiceClient(ServiceClient):
+    """Поиск проектов в project_service по id с кэшем и пакетными запросами.
+
+    Найденные проекты кэшируются на PROJECT_CACHE_TIMEOUT, отсутствующие -
+    на более короткий PROJECT_CACHE_NEGATIVE_TIMEOUT, чтобы несуществующий
+    id не вызывал запрос на каждую проверку. Промахи кэша запрашиваются
+    пачками по BATCH_SIZE через GET /api/projects/?ids=...
+    """
+
+    # Сколько id в одном запросе; совпадает с максимальным размером страницы project_service
+    BATCH_SIZE = 100
+    FIELDS = ('id', 'title', 'status', 'owner_id', 'teacher_id')
+    # Значение в кэше для проекта, которого нет
+    MISSING = False
+
+    def __init__(self, base_url=None):
+        super().__init__(
+            base_url or settings.PROJECT_SERVICE_URL,
+            timeout=(settings.SERVICE_CONNECT_TIMEOUT, settings.SERVICE_READ_TIMEOUT),
+            pool_size=settings.SERVICE_POOL_SIZE,
+            breaker=CircuitBreaker(settings.SERVICE_BREAKER_FAILURES, settings.SERVICE_BREAKER_RESET_SECONDS),
+        )
+
+    @staticmethod
+    def cache_key(pk):
+        return f'project-service:project:{pk}'
+
+    def get_projects(self, ids, authorization=None):
+        """Словарь {id: проект} для найденных id; отсутствующих id в нём нет"""
+        ids = sorted({int(pk) for pk in ids})
+        cached = cache.get_many([self.cache_key(pk) for pk in ids])
+        projects, missing = {}, []
+        for pk in ids:
+            value = cached.get(self.cache_key(pk))
+            if value is None:
+                missing.append(pk)
+            elif value is not self.MISSING:
+                projects[pk] = value
+
+        for start in range(0, len(missing), self.BATCH_SIZE):
+            batch = missing[start:start + self.BATCH_SIZE]
+            status_code, data = self.get('/api/projects/', params={
+                'ids': ','.join(map(str, batch)),
+                'fields': ','.join(self.FIELDS),
+                # Курсорный режим не считает COUNT(*)
+                'pagination': 'cursor',
+                'page_size': self.BATCH_SIZE,
+            }, authorization=authorization)
+            if status_code != 200:
+                raise ServiceUnavailable(f'{self.base_url}/api/projects/: HTTP {status_code}')
+
+            found = {row['id']: row for row in data['results']}
+            projects.update(found)
+            cache.set_many(
+                {self.cache_key(pk): row for pk, row in found.items()},
+                settings.PROJECT_CACHE_TIMEOUT
+            )
+            cache.set_many(
+                {self.cache_key(pk): self.MISSING for pk in batch if pk not in found},
+                settings.PROJECT_CACHE_NEGATIVE_TIMEOUT
+            )
+        return projects
+
+    def get_project(self, pk, authorization=None):
+        """Проект или None, если его нет"""
+        return self.get_projects([pk], authorization).get(int(pk))
+
+
+_project_client = None
+_project_client_lock = threading.Lock()
+
+
+def get_project_client():
+    """Общий на процесс клиент, чтобы пул соединений и размыкатель переживали запросы"""
+    global _project_client
+    with _project_client_lock:
+        if _project_client is None or _project_client.base_url != settings.PROJECT_SERVICE_URL.rstrip('/'):
+            _project_client = ProjectServiceClient()
+        return _project_client
@@ -0,0 +1,150 @@
+import time
+
+from django.conf import settings
+from django.contrib.postgres.fields import ArrayField
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import (
+    Aggregate, Avg, Count, ExpressionWrapper, F, FloatField, IntegerField, Max, Min
+)
+from django.db.models.functions import Cast, Floor, Least
+
+from .models import Submission
+
+PERCENTILES = (10, 25, 50, 75, 90)
+HISTOGRAM_BINS = 10
+
+# Поля сдачи, от которых зависит статистика: их изменение сбрасывает кэш
+GRADEBOOK_FIELDS = ('project_id', 'teacher_id', 'grade', 'max_grade', 'status')
+
+
+class PercentileCont(Aggregate):
+    """PERCENTILE_CONT(ARRAY[...]) WITHIN GROUP (ORDER BY expr) в PostgreSQL"""
+
+    function = 'PERCENTILE_CONT'
+    template = '%(function)s(ARRAY[%(fractions)s]) WITHIN GROUP (ORDER BY %(expressions)s)'
+
+    def __init__(self, expression, percentiles, **extra):
+        fractions = ', '.join(str(float(p) / 100) for p in percentiles)
+        super().__init__(
+            expression, fractions=fractions, output_field=ArrayField(FloatField()), **extra
+        )
+
+
+def gradebook_state(submission):
+    return tuple(getattr(submission, field) for field in GRADEBOOK_FIELDS)
+
+
+def compute_gradebook(queryset):
+    """Статистика оценок по queryset сдач тремя агрегатными запросами.
+
+    Оценки приводятся к процентам grade / max_grade; непроверенные сдачи
+    учитываются только в счётчиках по статусам.
+    """
+    queryset = queryset.order_by()
+    by_status = {value: 0 for value, _ in Submission.STATUS_CHOICES}
+    for row in queryset.values('status').annotate(count=Count('id')):
+        by_status[row['status']] = row['count']
+
+    graded = queryset.filter(grade__isnull=False, max_grade__gt=0).annotate(
+        percent=ExpressionWrapper(
+            Cast('grade', FloatField()) * 100 / F('max_grade'), output_field=FloatField()
+        )
+    )
+    summary = graded.aggregate(
+        count=Count('id'),
+        mean=Avg('percent'),
+        min=Min('percent'),
+        max=Max('percent'),
+        percentiles=PercentileCont('percent', PERCENTILES),
+    )
+
+    width = 100 / HISTOGRAM_BINS
+    buckets = {
+        row['bucket']: row['count']
+        for row in graded.annotate(
+            bucket=Least(Cast(Floor(F('percent') / width), IntegerField()), HISTOGRAM_BINS - 1)
+        ).values('bucket').annotate(count=Count('id'))
+    }
+
+    def rounded(value):
+        return None if value is None else round(value, 2)
+
+    percentiles = summary['percentiles'] or [None] * len(PERCENTILES)
+    return {
+        'total': sum(by_status.values()),
+        'by_status': by_status,
+        'graded': summary['count'],
+        'mean': rounded(summary['mean']),
+        'min': rounded(summary['min']),
+        'max': rounded(summary['max']),
+        'median': rounded(percentiles[PERCENTILES.index(50)]),
+        'percentiles': {f'p{p}': rounded(value) for p, value in zip(PERCENTILES, percentiles)},
+        'histogram': [
+            {
+                'from': round(i * width, 2),
+                'to': round((i + 1) * width, 2),
+                'count': buckets.get(i, 0),
+            }
+            for i in range(HISTOGRAM_BINS)
+        ],
+    }
+
+
+def generation_key(scope, pk):
+    return f'gradebook:generation:{scope}:{pk}'
+
+
+def get_gradebook(scope, pk, queryset):
+    """Статистика из кэша или посчитанная заново.
+
+    Ключ включает поколение, которое invalidate_gradebooks увеличивает при
+    каждом изменении. Значение, посчитанное параллельно с записью, попадает
+    под старое поколение и уже никогда не будет прочитано.
+    """
+    generation = cache.get_or_set(generation_key(scope, pk), time.time_ns, None)
+    key = f'gradebook:{scope}:{pk}:{generation}'
+    data = cache.get(key)
+    if data is None:
+        data = compute_gradebook(queryset)
+        cache.set(key, data, settings.GRADEBOOK_CACHE_TIMEOUT)
+    return data
+
+
+def bump_generation(scope, pk):
+    key = generation_key(scope, pk)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Поколения нет (ещё не читали или вытеснено) - начинаем с уникального значения
+        cache.set(key, time.time_ns(), None)
+
+
+def invalidate_gradebooks(pairs):
+    """Сбросить статистику проектов и преподавателей из пар (project_id, teacher_id).
+
+    Сброс выполняется после коммита, чтобы пересчёт не увидел старые данные.
+    """
+    scopes = set()
+    for project_id, teacher_id in pairs:
+        scopes.add(('project', project_id))
+        if teacher_id is not None:
+            scopes.add(('teacher', teacher_id))
+    if not scopes:
+        return
+
+    def bump():
+        for scope, pk in scopes:
+            bump_generation(scope, pk)
+    transaction.on_commit(bump)
+
+
+def invalidate_changed(before, after):
+    """Сбросить статистику, если изменились поля из GRADEBOOK_FIELDS.
+
+    before/after - результаты gradebook_state; None для созданной или удалённой сдачи.
+    """
+    if before == after:
+        return
+    states = [state for state in (before, after) if state is not None]
+    invalidate_gradebooks((state[0], state[1]) for state in states)
@@ -0,0 +1,25 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from submissions.storage import get_storage
+from submissions.uploads import purge_stale
+
+
+class Command(BaseCommand):
+    help = 'Удаляет брошенные загрузки и содержимое файлов, на которое не ссылается ни один Attachment'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--seconds', type=int, default=settings.UPLOAD_EXPIRE_SECONDS,
+            help='Сколько секунд незавершённая загрузка может простаивать'
+        )
+
+    def handle(self, *args, **options):
+        border = timezone.now() - timedelta(seconds=options['seconds'])
+        uploads, parts, blobs = purge_stale(border, get_storage())
+        self.stdout.write(self.style.SUCCESS(
+            f'Удалено загрузок: {uploads}, частей без загрузок: {parts}, файлов хранилища: {blobs}'
+        ))
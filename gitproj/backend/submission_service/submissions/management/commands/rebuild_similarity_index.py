@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from submissions.models import Submission
+from submissions.similarity import DEFAULT_THRESHOLD, find_clusters, rebuild_index
+
+
+class Command(BaseCommand):
+    help = 'Строит MinHash-подписи сдач и печатает кластеры почти дубликатов по проектам'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'project_ids', nargs='*', type=int,
+            help='ID проектов; по умолчанию индексируются все сдачи'
+        )
+        parser.add_argument(
+            '--threshold', type=float, default=DEFAULT_THRESHOLD,
+            help='Минимальная похожесть для отчёта о кластерах'
+        )
+
+    def handle(self, *args, **options):
+        queryset = Submission.objects.all()
+        if options['project_ids']:
+            queryset = queryset.filter(project_id__in=options['project_ids'])
+        updated = rebuild_index(queryset)
+        self.stdout.write(self.style.SUCCESS(f'Обновлено подписей: {updated}'))
+
+        for project_id in options['project_ids']:
+            for cluster in find_clusters(project_id, options['threshold']):
+                ids = ', '.join(map(str, cluster['submission_ids']))
+                self.stdout.write(f'Проект {project_id}: [{ids}] похожесть до {cluster["max_similarity"]}')
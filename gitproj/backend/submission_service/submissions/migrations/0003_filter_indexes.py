@@ -0,0 +1,25 @@
+# Generated by Django 5.0.1 on 2026-10-18 18:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('submissions', '0002_keyset_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='submission',
+            index=models.Index(fields=['project_id', 'status', '-submitted_at'], name='submission_project_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='submission',
+            index=models.Index(fields=['student_id', 'status', '-submitted_at'], name='submission_student_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='submission',
+            index=models.Index(fields=['teacher_id', 'status', '-submitted_at'], name='submission_teacher_status_idx'),
+        ),
+    ]
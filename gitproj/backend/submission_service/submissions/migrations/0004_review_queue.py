@@ -0,0 +1,31 @@
+# Generated by Django 5.0.1 on 2026-10-18 19:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('submissions', '0003_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='submission',
+            name='claim_expires_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Бронь до'),
+        ),
+        migrations.AddField(
+            model_name='submission',
+            name='claimed_by',
+            field=models.IntegerField(blank=True, null=True, verbose_name='Взял на проверку (ID)'),
+        ),
+        migrations.AddIndex(
+            model_name='submission',
+            index=models.Index(condition=models.Q(('status', 'pending')), fields=['submitted_at', 'id'], name='submission_pending_queue_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='submission',
+            index=models.Index(condition=models.Q(('claimed_by__isnull', False), ('status', 'reviewing')), fields=['claim_expires_at'], name='submission_claim_expiry_idx'),
+        ),
+    ]
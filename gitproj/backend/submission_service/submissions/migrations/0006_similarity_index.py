@@ -0,0 +1,43 @@
+# Generated by Django 5.0.1 on 2026-10-18 19:17
+
+import django.contrib.postgres.fields
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('submissions', '0005_uploads'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SubmissionSignature',
+            fields=[
+                ('submission', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='signature', serialize=False, to='submissions.submission', verbose_name='Сдача')),
+                ('project_id', models.IntegerField(verbose_name='ID проекта')),
+                ('text_hash', models.CharField(max_length=64, verbose_name='Хэш текста')),
+                ('minhash', django.contrib.postgres.fields.ArrayField(base_field=models.BigIntegerField(), size=None, verbose_name='MinHash')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Дата обновления')),
+            ],
+            options={
+                'verbose_name': 'Подпись сдачи',
+                'verbose_name_plural': 'Подписи сдач',
+            },
+        ),
+        migrations.CreateModel(
+            name='SimilarityBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('project_id', models.IntegerField(verbose_name='ID проекта')),
+                ('key', models.BigIntegerField(verbose_name='Ключ корзины')),
+                ('submission', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='similarity_buckets', to='submissions.submission', verbose_name='Сдача')),
+            ],
+            options={
+                'verbose_name': 'Корзина LSH',
+                'verbose_name_plural': 'Корзины LSH',
+                'indexes': [models.Index(fields=['key', 'project_id'], name='similarity_key_idx'), models.Index(fields=['project_id', 'key'], name='similarity_project_key_idx')],
+            },
+        ),
+    ]
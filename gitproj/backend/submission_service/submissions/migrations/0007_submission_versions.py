@@ -0,0 +1,38 @@
+# Generated by Django 5.0.1 on 2026-10-18 19:23
+
+import django.contrib.postgres.fields
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('submissions', '0006_similarity_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SubmissionVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('number', models.PositiveIntegerField(verbose_name='Номер версии')),
+                ('author_id', models.IntegerField(blank=True, null=True, verbose_name='ID автора')),
+                ('snapshot', models.JSONField(blank=True, null=True, verbose_name='Полный снимок')),
+                ('delta', models.JSONField(blank=True, null=True, verbose_name='Изменения')),
+                ('changed_fields', django.contrib.postgres.fields.ArrayField(base_field=models.CharField(max_length=50), default=list, size=None, verbose_name='Изменённые поля')),
+                ('size', models.PositiveIntegerField(verbose_name='Размер (байты)')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')),
+                ('submission', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='versions', to='submissions.submission', verbose_name='Сдача')),
+            ],
+            options={
+                'verbose_name': 'Версия сдачи',
+                'verbose_name_plural': 'Версии сдач',
+                'ordering': ['submission', 'number'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='submissionversion',
+            constraint=models.UniqueConstraint(fields=('submission', 'number'), name='submission_version_number_uniq'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.1 on 2026-10-18 19:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('submissions', '0007_submission_versions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='upload',
+            name='generation',
+            field=models.PositiveIntegerField(default=0, verbose_name='Попытка'),
+        ),
+    ]
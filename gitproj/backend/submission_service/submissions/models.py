@@ -1,3 +1,6 @@
+import uuid
+
+from django.contrib.postgres.fields import ArrayField
 from django.db import models
 
 class Submission(models.Model):
@@ -28,6 +31,10 @@ class Submission(models.Model):
     grade = models.IntegerField(null=True, blank=True, verbose_name='Оценка')
     max_grade = models.IntegerField(default=100, verbose_name='Максимальная оценка')
     
+    # Очередь проверки: кто взял работу и до какого момента (см. queue.py)
+    claimed_by = models.IntegerField(null=True, blank=True, verbose_name='Взял на проверку (ID)')
+    claim_expires_at = models.DateTimeField(null=True, blank=True, verbose_name='Бронь до')
+    
     submitted_at = models.DateTimeField(auto_now_add=True, verbose_name='Дата сдачи')
     reviewed_at = models.DateTimeField(null=True, blank=True, verbose_name='Дата проверки')
     updated_at = models.DateTimeField(auto_now=True, verbose_name='Дата обновления')
@@ -36,9 +43,110 @@ class Submission(models.Model):
         verbose_name = 'Сдача работы'
         verbose_name_plural = 'Сдачи работ'
         ordering = ['-submitted_at']
+        indexes = [
+            # Ключ курсорной пагинации: ORDER BY submitted_at DESC, id DESC
+            models.Index(fields=['-submitted_at', '-id'], name='submission_submitted_id_idx'),
+            # Фильтры SubmissionViewSet.get_queryset и my_submissions
+            models.Index(fields=['project_id', 'status', '-submitted_at'], name='submission_project_status_idx'),
+            models.Index(fields=['student_id', 'status', '-submitted_at'], name='submission_student_status_idx'),
+            models.Index(fields=['teacher_id', 'status', '-submitted_at'], name='submission_teacher_status_idx'),
+            # Очередь проверки: частичные индексы содержат только ожидающие работы и активные брони
+            models.Index(fields=['submitted_at', 'id'], condition=models.Q(status='pending'),
+                         name='submission_pending_queue_idx'),
+            models.Index(fields=['claim_expires_at'],
+                         condition=models.Q(status='reviewing', claimed_by__isnull=False),
+                         name='submission_claim_expiry_idx'),
+        ]
     
     def __str__(self):
         return f"{self.title} - {self.get_status_display()}"
+    
+    def is_claimed_by_other(self, user_id, now):
+        """Работу держит другой проверяющий, и его бронь ещё не истекла"""
+        return (
+            self.claimed_by is not None
+            and self.claimed_by != user_id
+            and self.claim_expires_at is not None
+            and self.claim_expires_at > now
+        )
+
+
+class SubmissionSignature(models.Model):
+    """MinHash-подпись текста сдачи для поиска почти дубликатов (см. similarity.py)"""
+    
+    submission = models.OneToOneField(Submission, on_delete=models.CASCADE, primary_key=True,
+                                      related_name='signature', verbose_name='Сдача')
+    project_id = models.IntegerField(verbose_name='ID проекта')
+    # Хэш нормализованного текста: подпись пересчитывается, только если он изменился
+    text_hash = models.CharField(max_length=64, verbose_name='Хэш текста')
+    minhash = ArrayField(models.BigIntegerField(), verbose_name='MinHash')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Дата обновления')
+    
+    class Meta:
+        verbose_name = 'Подпись сдачи'
+        verbose_name_plural = 'Подписи сдач'
+    
+    def __str__(self):
+        return f"Signature of {self.submission_id}"
+
+
+class SimilarityBucket(models.Model):
+    """Корзина LSH: сдачи с одинаковой полосой подписи попадают в одну корзину"""
+    
+    submission = models.ForeignKey(Submission, on_delete=models.CASCADE, related_name='similarity_buckets',
+                                   verbose_name='Сдача')
+    project_id = models.IntegerField(verbose_name='ID проекта')
+    key = models.BigIntegerField(verbose_name='Ключ корзины')
+    
+    class Meta:
+        verbose_name = 'Корзина LSH'
+        verbose_name_plural = 'Корзины LSH'
+        indexes = [
+            # Кандидаты для одной сдачи: key IN (...) по всем проектам или внутри проекта
+            models.Index(fields=['key', 'project_id'], name='similarity_key_idx'),
+            # Кластеры по проекту: GROUP BY key внутри project_id
+            models.Index(fields=['project_id', 'key'], name='similarity_project_key_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.key} -> {self.submission_id}"
+
+
+class SubmissionVersion(models.Model):
+    """Версия содержимого сдачи: текст, ссылки и набор файлов (см. versions.py).
+    
+    Обычно хранится только дельта относительно предыдущей версии; полный
+    снимок пишется для первой версии и тогда, когда цепочка дельт от
+    последнего снимка становится больше самого снимка.
+    """
+    
+    submission = models.ForeignKey(Submission, on_delete=models.CASCADE, related_name='versions',
+                                   verbose_name='Сдача')
+    number = models.PositiveIntegerField(verbose_name='Номер версии')
+    author_id = models.IntegerField(null=True, blank=True, verbose_name='ID автора')
+    
+    snapshot = models.JSONField(null=True, blank=True, verbose_name='Полный снимок')
+    delta = models.JSONField(null=True, blank=True, verbose_name='Изменения')
+    changed_fields = ArrayField(models.CharField(max_length=50), default=list, verbose_name='Изменённые поля')
+    # Размер snapshot или delta в JSON: по нему решается, когда писать новый снимок
+    size = models.PositiveIntegerField(verbose_name='Размер (байты)')
+    
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')
+    
+    class Meta:
+        verbose_name = 'Версия сдачи'
+        verbose_name_plural = 'Версии сдач'
+        ordering = ['submission', 'number']
+        constraints = [
+            models.UniqueConstraint(fields=['submission', 'number'], name='submission_version_number_uniq'),
+        ]
+    
+    def __str__(self):
+        return f"{self.submission_id} v{self.number}"
+    
+    @property
+    def is_snapshot(self):
+        return self.snapshot is not None
 
 
 class Review(models.Model):
@@ -57,11 +165,33 @@ class Review(models.Model):
         verbose_name = 'Отзыв'
         verbose_name_plural = 'Отзывы'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='review_created_id_idx'),
+        ]
     
     def __str__(self):
         return f"Review by {self.reviewer_id} on {self.submission.title}"
 
 
+class Blob(models.Model):
+    """Содержимое загруженного файла в хранилище, адресуемом по SHA-256.
+    
+    Одинаковые файлы (например, один отчёт от нескольких участников команды)
+    хранятся один раз, а прикреплённые файлы ссылаются на общий Blob.
+    """
+    
+    sha256 = models.CharField(max_length=64, primary_key=True, verbose_name='SHA-256')
+    size = models.BigIntegerField(verbose_name='Размер (байты)')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')
+    
+    class Meta:
+        verbose_name = 'Содержимое файла'
+        verbose_name_plural = 'Содержимое файлов'
+    
+    def __str__(self):
+        return self.sha256
+
+
 class Attachment(models.Model):
     """Прикрепленный файл"""
     
@@ -69,8 +199,11 @@ class Attachment(models.Model):
     
     name = models.CharField(max_length=200, verbose_name='Название')
     file_url = models.URLField(verbose_name='URL файла')
-    file_type = models.CharField(max_length=50, blank=True, verbose_name='Тип файла')
+    file_type = models.CharField(max_length=100, blank=True, verbose_name='Тип файла')
     file_size = models.IntegerField(null=True, blank=True, verbose_name='Размер файла (байты)')
+    # Заполняется для файлов, загруженных через /uploads/; внешние ссылки остаются без него
+    blob = models.ForeignKey(Blob, on_delete=models.PROTECT, null=True, blank=True,
+                             related_name='attachments', verbose_name='Содержимое')
     
     uploaded_at = models.DateTimeField(auto_now_add=True, verbose_name='Дата загрузки')
     
@@ -81,3 +214,36 @@ class Attachment(models.Model):
     
     def __str__(self):
         return self.name
+
+
+class Upload(models.Model):
+    """Сессия возобновляемой загрузки файла по частям (см. uploads.py)"""
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    submission = models.ForeignKey(Submission, on_delete=models.CASCADE, related_name='uploads', verbose_name='Сдача')
+    user_id = models.IntegerField(verbose_name='ID загружающего')
+    
+    name = models.CharField(max_length=200, verbose_name='Имя файла')
+    size = models.BigIntegerField(verbose_name='Размер (байты)')
+    offset = models.BigIntegerField(default=0, verbose_name='Получено байт')
+    # Растёт при сбросе загрузки: хэш прошлой попытки в памяти других процессов не подойдёт
+    generation = models.PositiveIntegerField(default=0, verbose_name='Попытка')
+    # Контрольная сумма от клиента; если указана, проверяется после загрузки
+    sha256 = models.CharField(max_length=64, blank=True, verbose_name='Ожидаемый SHA-256')
+    attachment = models.OneToOneField(Attachment, on_delete=models.SET_NULL, null=True, blank=True,
+                                      related_name='upload', verbose_name='Прикрепленный файл')
+    
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Дата обновления')
+    
+    class Meta:
+        verbose_name = 'Загрузка'
+        verbose_name_plural = 'Загрузки'
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f"{self.name} ({self.offset}/{self.size})"
+    
+    @property
+    def is_complete(self):
+        return self.attachment_id is not None
@@ -0,0 +1,272 @@
+import base64
+import hashlib
+import json
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import (
+    Paginator as DjangoPaginator, EmptyPage, InvalidPage, PageNotAnInteger
+)
+from django.db import connections
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+def cached_count(queryset):
+    """COUNT(*) с кэшированием по тексту SQL запроса"""
+    sql, params = queryset.query.sql_with_params()
+    digest = hashlib.md5(f'{sql}|{params}'.encode()).hexdigest()
+    key = f'pagination:count:{digest}'
+
+    count = cache.get(key)
+    if count is None:
+        count = queryset.count()
+        cache.set(key, count, settings.PAGINATION_COUNT_CACHE_TIMEOUT)
+    return count
+
+
+def estimated_count(queryset):
+    """Оценка количества строк по плану запроса PostgreSQL без COUNT(*)"""
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return cached_count(queryset)
+
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute('EXPLAIN (FORMAT JSON) ' + sql, params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    estimate = int(plan[0]['Plan']['Plan Rows'])
+
+    # На маленьких выборках точный подсчёт дешёвый, а оценка планировщика грубая
+    if estimate < settings.PAGINATION_ESTIMATE_EXACT_BELOW:
+        return queryset.count()
+    return estimate
+
+
+def with_unique_ordering(queryset):
+    """Добавить id в конец сортировки, если его там нет.
+    
+    Без него строки с одинаковой датой СУБД может вернуть в разном порядке
+    для разных OFFSET, и одна строка попадёт на две страницы, а другая ни на
+    одну. Направление берётся у первого поля, чтобы подходил индекс (дата, id).
+    """
+    if not queryset.ordered:
+        return queryset
+    ordering = list(queryset.query.order_by) or list(queryset.model._meta.ordering)
+    names = [field.lstrip('-') for field in ordering if isinstance(field, str)]
+    if len(names) != len(ordering) or 'id' in names or 'pk' in names:
+        return queryset
+    return queryset.order_by(*ordering, '-id' if ordering[0].startswith('-') else 'id')
+
+
+class CountModePaginator(DjangoPaginator):
+    """Paginator, который умеет брать общее количество из кэша или из оценки"""
+
+    COUNT_FUNCTIONS = {
+        'cached': cached_count,
+        'estimate': estimated_count,
+    }
+
+    def __init__(self, object_list, per_page, count_mode='exact', **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.count_mode = count_mode
+
+    @property
+    def is_exact(self):
+        return self.count_mode not in self.COUNT_FUNCTIONS
+
+    @cached_property
+    def count(self):
+        if self.is_exact:
+            return super().count
+        return self.COUNT_FUNCTIONS[self.count_mode](self.object_list)
+
+    def validate_number(self, number):
+        if self.is_exact:
+            return super().validate_number(number)
+        # Приблизительное количество не должно запрещать реально существующие страницы
+        try:
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger('That page number is not an integer')
+        if number < 1:
+            raise EmptyPage('That page number is less than 1')
+        return number
+
+    def page(self, number):
+        if self.is_exact:
+            return super().page(number)
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        return self._get_page(self.object_list[bottom:bottom + self.per_page], number, self)
+
+
+class KeysetPagination(BasePagination):
+    """Курсорная пагинация по (created_at, id) без OFFSET и COUNT(*).
+
+    Поле сортировки можно переопределить атрибутом keyset_field у ViewSet.
+    Сортировка всегда по убыванию, id разрешает одинаковые даты.
+    """
+
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering_field = 'created_at'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def __init__(self, page_size=None):
+        self.page_size = page_size or settings.REST_FRAMEWORK['PAGE_SIZE']
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            data = json.loads(base64.urlsafe_b64decode(encoded.encode()).decode())
+            value = parse_datetime(data['v'])
+            pk = int(data['id'])
+            reverse = bool(data.get('r'))
+        except (TypeError, ValueError, KeyError, UnicodeDecodeError):
+            raise NotFound(self.invalid_cursor_message)
+        if value is None:
+            raise NotFound(self.invalid_cursor_message)
+        return value, pk, reverse
+
+    def encode_cursor(self, obj, reverse=False):
+        data = {'v': getattr(obj, self.field).isoformat(), 'id': obj.pk}
+        if reverse:
+            data['r'] = 1
+        encoded = base64.urlsafe_b64encode(json.dumps(data).encode()).decode()
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.field = getattr(view, 'keyset_field', self.ordering_field)
+        self.base_url = remove_query_param(request.build_absolute_uri(), 'page')
+        page_size = self.get_page_size(request)
+        cursor = self.decode_cursor(request)
+        field = self.field
+
+        reverse = False
+        if cursor is None:
+            queryset = queryset.order_by(f'-{field}', '-id')
+        else:
+            value, pk, reverse = cursor
+            if reverse:
+                # (field, id) > (value, pk): первое условие задаёт диапазон по индексу
+                queryset = queryset.filter(**{f'{field}__gte': value}).exclude(
+                    **{field: value, 'id__lte': pk}
+                ).order_by(field, 'id')
+            else:
+                queryset = queryset.filter(**{f'{field}__lte': value}).exclude(
+                    **{field: value, 'id__gte': pk}
+                ).order_by(f'-{field}', '-id')
+
+        results = list(queryset[:page_size + 1])
+        has_more = len(results) > page_size
+        results = results[:page_size]
+        if reverse:
+            results.reverse()
+
+        if reverse:
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, cursor is not None
+
+        self.page = results
+        return results
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1])
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+
+class HybridPagination(PageNumberPagination):
+    """Постраничная пагинация с выбором режима подсчёта и курсорным режимом.
+
+    ?pagination=cursor или ?cursor=... включает KeysetPagination.
+    ?count=cached|estimate берёт общее количество из кэша или из плана запроса.
+    """
+
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    count_query_param = 'count'
+
+    def get_count_mode(self, request):
+        mode = request.query_params.get(self.count_query_param, 'exact')
+        if mode in CountModePaginator.COUNT_FUNCTIONS:
+            return mode
+        return 'exact'
+
+    def is_cursor_mode(self, request):
+        return (
+            request.query_params.get('pagination') == 'cursor'
+            or KeysetPagination.cursor_query_param in request.query_params
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = None
+        if self.is_cursor_mode(request):
+            self.keyset = KeysetPagination(self.page_size)
+            return self.keyset.paginate_queryset(queryset, request, view)
+
+        self.request = request
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+
+        queryset = with_unique_ordering(queryset)
+        paginator = CountModePaginator(queryset, page_size, count_mode=self.get_count_mode(request))
+        page_number = self.get_page_number(request, paginator)
+        try:
+            self.page = paginator.page(page_number)
+        except InvalidPage as exc:
+            raise NotFound(self.invalid_page_message.format(
+                page_number=page_number, message=str(exc)
+            ))
+        return list(self.page)
+
+    def get_next_link(self):
+        paginator = self.page.paginator
+        if paginator.is_exact:
+            return super().get_next_link()
+        if len(self.page.object_list) < paginator.per_page:
+            return None
+        # При приблизительном количестве полная страница означает, что может быть следующая
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.page_query_param, self.page.number + 1)
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+
+        response = super().get_paginated_response(data)
+        if not self.page.paginator.is_exact:
+            response.data['count_mode'] = self.page.paginator.count_mode
+        return response
@@ -0,0 +1,105 @@
+import csv
+import tempfile
+from itertools import groupby
+
+from django.http import FileResponse, StreamingHttpResponse
+from django.utils import timezone
+from openpyxl import Workbook
+
+from .exports import EXPORT_CHUNK_SIZE, Echo, csv_value
+
+PIVOT_CONTENT_TYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+# Значения по каждому проекту: отдельная колонка на каждое
+PIVOT_VALUES = ('grade', 'grade_percentage', 'status')
+
+
+def grade_percentage(grade, max_grade):
+    if grade is None or not max_grade:
+        return None
+    return round(grade / max_grade * 100, 2)
+
+
+def pivot_header(project_ids, labels):
+    """Заголовок: student_id и по колонке на каждое значение каждого проекта"""
+    header = ['student_id']
+    for project_id in project_ids:
+        label = labels.get(project_id) or f'#{project_id}'
+        header += [f'{label}: {value}' for value in PIVOT_VALUES]
+    return header
+
+
+def pivot_rows(queryset, project_ids):
+    """Строки сводной таблицы студент x проект за один упорядоченный проход.
+
+    DISTINCT ON (student_id, project_id) с сортировкой по submitted_at DESC
+    оставляет последнюю сдачу каждого студента по каждому проекту, а
+    серверный курсор отдаёт их пачками. Строки одного студента идут подряд,
+    поэтому в памяти держится только текущая строка - её размер зависит от
+    числа колонок, а не от числа сдач.
+    """
+    latest = queryset.order_by(
+        'student_id', 'project_id', '-submitted_at', '-id'
+    ).distinct('student_id', 'project_id').values_list(
+        'student_id', 'project_id', 'grade', 'max_grade', 'status'
+    ).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+    position = {project_id: index for index, project_id in enumerate(project_ids)}
+    width = len(PIVOT_VALUES)
+    for student_id, cells in groupby(latest, key=lambda row: row[0]):
+        row = [student_id] + [None] * (len(project_ids) * width)
+        for _, project_id, grade, max_grade, status in cells:
+            if project_id not in position:
+                # Проект появился уже после того, как был построен заголовок
+                continue
+            start = 1 + position[project_id] * width
+            row[start:start + width] = [grade, grade_percentage(grade, max_grade), status]
+        yield row
+
+
+def csv_pivot_lines(header, rows):
+    writer = csv.writer(Echo())
+    # BOM, чтобы Excel открыл кириллицу в UTF-8
+    yield '\ufeff' + writer.writerow(header)
+    for row in rows:
+        yield writer.writerow([csv_value(value) for value in row])
+
+
+def xlsx_pivot_file(header, rows):
+    """Книга XLSX во временном файле.
+
+    В режиме write_only строки сразу пишутся в XML листа на диске, и книга
+    не держится в памяти целиком.
+    """
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('Gradebook')
+    sheet.append(header)
+    for row in rows:
+        sheet.append(row)
+    output = tempfile.TemporaryFile()
+    workbook.save(output)
+    output.seek(0)
+    return output
+
+
+def pivot_response(queryset, project_ids, labels, output, filename):
+    """Потоковая сводная таблица оценок в CSV или XLSX"""
+    header = pivot_header(project_ids, labels)
+    rows = pivot_rows(queryset, project_ids)
+    stamp = timezone.localdate().isoformat()
+    name = f'{filename}-{stamp}.{output}'
+
+    if output == 'xlsx':
+        return FileResponse(
+            xlsx_pivot_file(header, rows), as_attachment=True, filename=name,
+            content_type=PIVOT_CONTENT_TYPES['xlsx']
+        )
+
+    response = StreamingHttpResponse(csv_pivot_lines(header, rows), content_type=PIVOT_CONTENT_TYPES['csv'])
+    response['Content-Disposition'] = f'attachment; filename="{name}"'
+    # Не даём nginx буферизовать ответ, чтобы первые строки уходили сразу
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -0,0 +1,66 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .gradebook import invalidate_gradebooks
+from .models import Submission
+
+
+def claim_submissions(user_id, count, project_id=None):
+    """Атомарно забрать до count работ из очереди для проверяющего user_id.
+
+    Строки выбираются SELECT ... FOR UPDATE SKIP LOCKED: параллельные
+    проверяющие не ждут друг друга и никогда не получают одну и ту же
+    работу, а уже взятые чужие строки просто пропускаются. Сначала
+    забираются работы с истёкшей бронью, затем ожидающие (старые первыми);
+    каждая выборка идёт по своему частичному индексу без сортировки.
+    Возвращает список id и момент окончания брони.
+    """
+    now = timezone.now()
+    expires_at = now + timedelta(seconds=settings.SUBMISSION_CLAIM_LEASE_SECONDS)
+
+    expired = Submission.objects.filter(
+        status='reviewing', claimed_by__isnull=False, claim_expires_at__lte=now
+    ).order_by('claim_expires_at')
+    pending = Submission.objects.filter(status='pending').order_by('submitted_at', 'id')
+
+    with transaction.atomic():
+        rows = []
+        for queue in (expired, pending):
+            if len(rows) >= count:
+                break
+            if project_id is not None:
+                queue = queue.filter(project_id=project_id)
+            rows += queue.select_for_update(skip_locked=True).values_list(
+                'id', 'project_id', 'teacher_id', 'status'
+            )[:count - len(rows)]
+        ids = [row[0] for row in rows]
+        if ids:
+            Submission.objects.filter(id__in=ids).update(
+                status='reviewing',
+                claimed_by=user_id,
+                claim_expires_at=expires_at,
+                updated_at=now,
+            )
+            # pending -> reviewing меняет счётчики по статусам в статистике оценок
+            invalidate_gradebooks(
+                (project, teacher) for _, project, teacher, status in rows if status == 'pending'
+            )
+    return ids, expires_at
+
+
+def release_submission(submission_id, user_id):
+    """Вернуть свою работу в очередь. False, если брони пользователя на ней нет"""
+    with transaction.atomic():
+        submission = Submission.objects.select_for_update().filter(
+            id=submission_id, status='reviewing', claimed_by=user_id
+        ).values_list('project_id', 'teacher_id').first()
+        if submission is None:
+            return False
+        Submission.objects.filter(id=submission_id).update(
+            status='pending', claimed_by=None, claim_expires_at=None, updated_at=timezone.now()
+        )
+        invalidate_gradebooks([submission])
+    return True
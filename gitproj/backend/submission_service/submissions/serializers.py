@@ -1,11 +1,22 @@
+from django.conf import settings
 from rest_framework import serializers
-from .models import Submission, Review, Attachment
+from .clients import ServiceUnavailable, get_project_client
+from .models import Submission, Review, Attachment, Upload, SubmissionVersion
+
+
+def requested_fields(request, param):
+    """Разбирает параметр запроса вида ?include=reviews,attachments в множество имён"""
+    if request is None:
+        return set()
+    raw = request.query_params.get(param, '')
+    return {name.strip() for name in raw.split(',') if name.strip()}
+
 
 class AttachmentSerializer(serializers.ModelSerializer):
     class Meta:
         model = Attachment
-        fields = ['id', 'name', 'file_url', 'file_type', 'file_size', 'uploaded_at']
-        read_only_fields = ['id', 'uploaded_at']
+        fields = ['id', 'name', 'file_url', 'file_type', 'file_size', 'blob', 'uploaded_at']
+        read_only_fields = ['id', 'blob', 'uploaded_at']
 
 class ReviewSerializer(serializers.ModelSerializer):
     class Meta:
@@ -35,6 +46,54 @@ class SubmissionSerializer(serializers.ModelSerializer):
             return round((obj.grade / obj.max_grade) * 100, 2)
         return None
 
+class SubmissionVersionSerializer(serializers.ModelSerializer):
+    """Версия сдачи без содержимого: для списка истории"""
+    
+    is_snapshot = serializers.ReadOnlyField()
+    
+    class Meta:
+        model = SubmissionVersion
+        fields = ['number', 'author_id', 'changed_fields', 'is_snapshot', 'size', 'created_at']
+        read_only_fields = fields
+
+class SubmissionListSerializer(SubmissionSerializer):
+    """Краткое представление сдачи для списков.
+    
+    Вместо вложенных отзывов и файлов - счётчики из аннотаций запроса.
+    Вложенные данные отдаются только по ?include=reviews,attachments,project
+    (project - из project_service), а ?fields=id,title,... ограничивает
+    набор полей.
+    """
+    
+    EXPANDABLE_FIELDS = ('reviews', 'attachments')
+    # Данные из других сервисов: view подставляет их в context пачкой на страницу
+    REMOTE_FIELDS = ('project',)
+    
+    reviews_count = serializers.IntegerField(read_only=True)
+    attachments_count = serializers.IntegerField(read_only=True)
+    project = serializers.SerializerMethodField()
+    
+    class Meta(SubmissionSerializer.Meta):
+        fields = SubmissionSerializer.Meta.fields + ['reviews_count', 'attachments_count', 'project']
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        include = requested_fields(request, 'include')
+        only = requested_fields(request, 'fields')
+        
+        for name in self.EXPANDABLE_FIELDS + self.REMOTE_FIELDS:
+            if name not in include:
+                self.fields.pop(name, None)
+        
+        if only:
+            for name in set(self.fields) - only - include:
+                self.fields.pop(name)
+    
+    def get_project(self, obj):
+        """Проект из project_service; None, если его нет или сервис недоступен"""
+        return self.context.get('projects', {}).get(obj.project_id)
+
 class SubmissionCreateSerializer(serializers.ModelSerializer):
     class Meta:
         model = Submission
@@ -43,8 +102,70 @@ class SubmissionCreateSerializer(serializers.ModelSerializer):
             'title', 'description',
             'repository_url', 'demo_url', 'documentation_url'
         ]
+    
+    def validate_project_id(self, value):
+        """Проект должен существовать в project_service.
+        
+        Если сервис недоступен, сдача принимается без проверки: отказ
+        соседнего сервиса не должен блокировать сдачу работ.
+        """
+        request = self.context.get('request')
+        authorization = request.headers.get('Authorization') if request else None
+        try:
+            project = get_project_client().get_project(value, authorization)
+        except ServiceUnavailable:
+            return value
+        if project is None:
+            raise serializers.ValidationError(f'Project {value} not found')
+        return value
 
 class GradeSubmissionSerializer(serializers.Serializer):
     grade = serializers.IntegerField(min_value=0)
     status = serializers.ChoiceField(choices=Submission.STATUS_CHOICES)
     comment = serializers.CharField(required=False, allow_blank=True)
+
+class GradeBatchItemSerializer(GradeSubmissionSerializer):
+    submission_id = serializers.IntegerField()
+
+class GradeBatchSerializer(serializers.Serializer):
+    """Пакет оценок: [{submission_id, grade, status, comment}, ...]"""
+    
+    MAX_ITEMS = 500
+    
+    grades = serializers.ListField(child=serializers.DictField(), allow_empty=False)
+    
+    def validate_grades(self, value):
+        if len(value) > self.MAX_ITEMS:
+            raise serializers.ValidationError(f'At most {self.MAX_ITEMS} items per request')
+        return value
+
+class ClaimSerializer(serializers.Serializer):
+    """Сколько работ взять из очереди и, при необходимости, из какого проекта"""
+    
+    count = serializers.IntegerField(min_value=1, default=1)
+    project_id = serializers.IntegerField(required=False)
+    
+    def validate_count(self, value):
+        if value > settings.SUBMISSION_CLAIM_MAX:
+            raise serializers.ValidationError(f'At most {settings.SUBMISSION_CLAIM_MAX} per claim')
+        return value
+
+
+class UploadSerializer(serializers.ModelSerializer):
+    """Сессия загрузки: создаётся с именем и размером файла, offset растёт по мере приёма частей"""
+    
+    sha256 = serializers.RegexField(r'^[0-9a-fA-F]{64}$', required=False, allow_blank=True)
+    attachment = AttachmentSerializer(read_only=True)
+    
+    class Meta:
+        model = Upload
+        fields = ['id', 'submission', 'name', 'size', 'offset', 'sha256', 'attachment', 'created_at', 'updated_at']
+        read_only_fields = ['id', 'offset', 'attachment', 'created_at', 'updated_at']
+    
+    def validate_size(self, value):
+        if not 0 < value <= settings.UPLOAD_MAX_SIZE:
+            raise serializers.ValidationError(f'Size must be between 1 and {settings.UPLOAD_MAX_SIZE} bytes')
+        return value
+    
+    def validate_sha256(self, value):
+        return value.lower()
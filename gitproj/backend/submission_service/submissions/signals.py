@@ -0,0 +1,19 @@
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from .models import Submission
+from .similarity import TEXT_FIELDS, index_submission
+
+
+@receiver(post_save, sender=Submission)
+def update_similarity_index(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Переиндексировать текст сдачи после создания или изменения.
+    
+    Сохранения, которые не трогают текст и проект (оценка, статус), ничего не
+    пересчитывают; index_submission к тому же сверяет хэш текста.
+    """
+    if raw:
+        return
+    if update_fields is not None and not set(update_fields) & {'project_id', *TEXT_FIELDS}:
+        return
+    index_submission(instance)
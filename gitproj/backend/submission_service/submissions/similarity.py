@@ -0,0 +1,196 @@
+import hashlib
+import random
+import re
+from collections import defaultdict
+
+from django.contrib.postgres.aggregates import ArrayAgg
+from django.db import transaction
+from django.db.models import Count
+
+from .models import SimilarityBucket, Submission, SubmissionSignature
+
+# Длина подписи и разбиение на полосы: NUM_PERM = BANDS * ROWS.
+# Пара попадает в кандидаты с вероятностью 1 - (1 - s^ROWS)^BANDS, порог
+# около (1 / BANDS) ^ (1 / ROWS) ~ 0.42, поэтому пары с похожестью от 0.5
+# почти никогда не теряются, а точная оценка делается уже по подписям.
+BANDS = 32
+ROWS = 4
+NUM_PERM = BANDS * ROWS
+SHINGLE_SIZE = 3
+DEFAULT_THRESHOLD = 0.5
+
+# Поля сдачи, из которых строится текст
+TEXT_FIELDS = ('title', 'description')
+
+# Универсальное хэширование (a * x + b) mod P с простым числом Мерсенна 2^61 - 1.
+# Коэффициенты фиксированы: подписи из разных процессов должны совпадать.
+MERSENNE_PRIME = (1 << 61) - 1
+_rng = random.Random(20240901)
+PERMUTATIONS = [
+    (_rng.randrange(1, MERSENNE_PRIME), _rng.randrange(0, MERSENNE_PRIME))
+    for _ in range(NUM_PERM)
+]
+
+WORD_RE = re.compile(r'\w+')
+
+
+def submission_text(submission):
+    return '\n'.join(getattr(submission, field) or '' for field in TEXT_FIELDS)
+
+
+def shingles(text, size=SHINGLE_SIZE):
+    """Множество хэшей словесных n-грамм нормализованного текста"""
+    words = WORD_RE.findall(text.lower())
+    if len(words) < size:
+        grams = [' '.join(words)] if words else []
+    else:
+        grams = (' '.join(words[i:i + size]) for i in range(len(words) - size + 1))
+    return {
+        int.from_bytes(hashlib.blake2b(gram.encode(), digest_size=8).digest(), 'big')
+        for gram in grams
+    }
+
+
+def minhash(hashed_shingles):
+    """MinHash-подпись из NUM_PERM минимумов; None для пустого текста"""
+    if not hashed_shingles:
+        return None
+    values = list(hashed_shingles)
+    return [min((a * x + b) % MERSENNE_PRIME for x in values) for a, b in PERMUTATIONS]
+
+
+def band_keys(signature):
+    """Ключи корзин LSH: по одному на полосу из ROWS значений подписи"""
+    keys = []
+    for band in range(BANDS):
+        chunk = signature[band * ROWS:(band + 1) * ROWS]
+        digest = hashlib.blake2b(repr((band, chunk)).encode(), digest_size=8).digest()
+        keys.append(int.from_bytes(digest, 'big', signed=True))
+    return keys
+
+
+def estimate_similarity(left, right):
+    """Оценка коэффициента Жаккара по доле совпавших позиций подписей"""
+    return sum(1 for x, y in zip(left, right) if x == y) / NUM_PERM
+
+
+def index_submission(submission):
+    """Обновить подпись и корзины сдачи, если изменился её текст или проект.
+
+    Сдачи без слов в тексте из индекса удаляются: у пустых описаний все
+    подписи одинаковы, и они собрались бы в одну огромную корзину.
+    """
+    text = submission_text(submission)
+    text_hash = hashlib.sha256(text.lower().encode()).hexdigest()
+    current = SubmissionSignature.objects.filter(submission_id=submission.pk).values_list(
+        'text_hash', 'project_id'
+    ).first()
+    if current == (text_hash, submission.project_id):
+        return False
+
+    signature = minhash(shingles(text))
+    with transaction.atomic():
+        SimilarityBucket.objects.filter(submission_id=submission.pk).delete()
+        if signature is None:
+            SubmissionSignature.objects.filter(submission_id=submission.pk).delete()
+            return True
+        SubmissionSignature.objects.update_or_create(
+            submission_id=submission.pk,
+            defaults={'project_id': submission.project_id, 'text_hash': text_hash, 'minhash': signature},
+        )
+        SimilarityBucket.objects.bulk_create([
+            SimilarityBucket(submission_id=submission.pk, project_id=submission.project_id, key=key)
+            for key in band_keys(signature)
+        ])
+    return True
+
+
+def rebuild_index(queryset=None, batch_size=500):
+    """Проиндексировать сдачи из queryset (по умолчанию все). Возвращает число обновлённых"""
+    queryset = (queryset if queryset is not None else Submission.objects.all()).only(
+        'id', 'project_id', *TEXT_FIELDS
+    ).order_by('id')
+    return sum(index_submission(submission) for submission in queryset.iterator(chunk_size=batch_size))
+
+
+def find_similar(submission_id, threshold=DEFAULT_THRESHOLD, project_id=None, limit=20):
+    """Почти дубликаты сдачи: [(id, похожесть)] по убыванию похожести.
+
+    Кандидаты берутся из корзин с теми же ключами (BANDS поисков по индексу),
+    поэтому стоимость зависит от числа похожих сдач, а не от размера таблицы.
+    None, если сдачи нет в индексе.
+    """
+    signature = SubmissionSignature.objects.filter(submission_id=submission_id).values_list(
+        'minhash', flat=True
+    ).first()
+    if signature is None:
+        return None
+
+    candidates = SimilarityBucket.objects.filter(key__in=band_keys(signature)).exclude(
+        submission_id=submission_id
+    )
+    if project_id is not None:
+        candidates = candidates.filter(project_id=project_id)
+    candidate_ids = candidates.values('submission_id')
+
+    results = []
+    for pk, other in SubmissionSignature.objects.filter(submission_id__in=candidate_ids).values_list(
+        'submission_id', 'minhash'
+    ):
+        similarity = estimate_similarity(signature, other)
+        if similarity >= threshold:
+            results.append((pk, similarity))
+    results.sort(key=lambda item: (-item[1], item[0]))
+    return results[:limit]
+
+
+def find_clusters(project_id, threshold=DEFAULT_THRESHOLD):
+    """Группы почти одинаковых сдач проекта.
+
+    Пары-кандидаты берутся из корзин проекта, где больше одной сдачи, и
+    проверяются по подписям; связанные пары объединяются (union-find).
+    Возвращает список кластеров [{'submission_ids', 'max_similarity'}],
+    крупные первыми.
+    """
+    buckets = SimilarityBucket.objects.filter(project_id=project_id).order_by().values('key').annotate(
+        size=Count('submission_id'), ids=ArrayAgg('submission_id')
+    ).filter(size__gt=1).values_list('ids', flat=True)
+
+    pairs = set()
+    for ids in buckets:
+        ids = sorted(ids)
+        pairs.update((left, right) for i, left in enumerate(ids) for right in ids[i + 1:])
+    if not pairs:
+        return []
+
+    involved = {pk for pair in pairs for pk in pair}
+    signatures = dict(SubmissionSignature.objects.filter(submission_id__in=involved).values_list(
+        'submission_id', 'minhash'
+    ))
+
+    parent = {}
+
+    def find(pk):
+        parent.setdefault(pk, pk)
+        while parent[pk] != pk:
+            parent[pk] = parent[parent[pk]]
+            pk = parent[pk]
+        return pk
+
+    best = defaultdict(float)
+    for left, right in pairs:
+        similarity = estimate_similarity(signatures[left], signatures[right])
+        if similarity >= threshold:
+            parent[find(left)] = find(right)
+            best[left] = max(best[left], similarity)
+            best[right] = max(best[right], similarity)
+
+    clusters = defaultdict(list)
+    for pk in best:
+        clusters[find(pk)].append(pk)
+    result = [
+        {'submission_ids': sorted(ids), 'max_similarity': round(max(best[pk] for pk in ids), 3)}
+        for ids in clusters.values()
+    ]
+    result.sort(key=lambda cluster: (-len(cluster['submission_ids']), cluster['submission_ids'][0]))
+    return result
@@ -0,0 +1,77 @@
+import os
+from pathlib import Path
+
+from django.conf import settings
+
+# Размер блока при чтении и записи файлов: память на загрузку не зависит от размера файла
+BLOCK_SIZE = 64 * 1024
+
+
+class ContentAddressedStorage:
+    """Локальное хранилище файлов, адресуемых по SHA-256 содержимого.
+
+    Файл лежит в blobs/ab/cd/<sha256>, части незавершённых загрузок - в
+    tmp/<upload id>.part. Оба каталога на одном разделе, поэтому готовая
+    часть переносится в хранилище атомарным os.replace без копирования.
+    """
+
+    def __init__(self, root=None):
+        self.root = Path(root or settings.UPLOAD_ROOT)
+
+    def blob_path(self, sha256):
+        return self.root / 'blobs' / sha256[:2] / sha256[2:4] / sha256
+
+    def relative_blob_path(self, sha256):
+        return self.blob_path(sha256).relative_to(self.root).as_posix()
+
+    def part_path(self, upload_id):
+        return self.root / 'tmp' / f'{upload_id}.part'
+
+    def open_part(self, upload_id, offset):
+        """Открыть часть для дозаписи с позиции offset.
+
+        Всё, что лежит дальше offset (хвост оборванного запроса, не учтённый в
+        загрузке), отрезается.
+        """
+        path = self.part_path(upload_id)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        f = open(path, 'r+b' if path.exists() else 'w+b')
+        f.seek(offset)
+        f.truncate()
+        return f
+
+    def store(self, upload_id, sha256):
+        """Перенести готовую часть в хранилище.
+
+        Если такое содержимое уже есть, часть просто удаляется. Возвращает
+        True, если файл добавлен, и False, если он оказался дубликатом или
+        часть уже перенёс другой процесс.
+        """
+        part = self.part_path(upload_id)
+        target = self.blob_path(sha256)
+        if target.is_file():
+            part.unlink(missing_ok=True)
+            return False
+        target.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            os.replace(part, target)
+        except FileNotFoundError:
+            return False
+        return True
+
+    def delete_part(self, upload_id):
+        self.part_path(upload_id).unlink(missing_ok=True)
+
+    def delete(self, sha256):
+        self.blob_path(sha256).unlink(missing_ok=True)
+
+    def parts(self):
+        """Пары (upload id, путь) для всех частей во временном каталоге"""
+        tmp = self.root / 'tmp'
+        if not tmp.is_dir():
+            return []
+        return [(path.stem, path) for path in tmp.glob('*.part')]
+
+
+def get_storage():
+    return ContentAddressedStorage()
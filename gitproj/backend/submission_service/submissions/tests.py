@@ -1,3 +1,1094 @@
-from django.test import TestCase
+import base64
+import csv
+import hashlib
+import io
+import json
+import random
+import shutil
+import tempfile
+import threading
+from datetime import timedelta
+from unittest import mock
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
 
-# Create your tests here.
+from django.core.cache import cache
+from django.db import connection, connections, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from openpyxl import load_workbook
+from rest_framework.test import APIClient
+
+from .clients import CircuitBreaker, ProjectServiceClient, ServiceUnavailable
+from .models import (
+    Attachment, Blob, Review, SimilarityBucket, Submission, SubmissionSignature, SubmissionVersion, Upload
+)
+from .queue import claim_submissions
+from .similarity import BANDS, index_submission
+from .storage import get_storage
+from .uploads import hashers, purge_stale
+from .versions import load_versions, payload_size, record_version
+
+
+class TokenUser:
+    """Пользователь из JWT, как его создаёт CustomJWTAuthentication"""
+
+    is_authenticated = True
+
+    def __init__(self, user_id):
+        self.id = user_id
+
+
+class QueryPlanTestCase(TestCase):
+    """Базовый класс для проверки планов запросов через EXPLAIN.
+
+    Запросы снимаются с реального вызова эндпоинта и прогоняются через EXPLAIN
+    с enable_seqscan = off: если подходящего индекса нет, PostgreSQL всё равно
+    выберет Seq Scan, а если есть - покажет его в плане.
+    """
+
+    user_id = 1
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(user=TokenUser(self.user_id))
+
+    def explain_endpoint(self, url, method='get', data=None):
+        with CaptureQueriesContext(connection) as context:
+            response = getattr(self.client, method)(url, data, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+
+        plans = []
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+            for query in context.captured_queries:
+                if not query['sql'].startswith('SELECT'):
+                    continue
+                cursor.execute('EXPLAIN ' + query['sql'])
+                plans.append('\n'.join(row[0] for row in cursor.fetchall()))
+        self.assertTrue(plans, f'{url} не выполнил ни одного SELECT')
+        return '\n\n'.join(plans)
+
+    def assertUsesIndex(self, url, index_name=None, method='get', data=None):
+        plan = self.explain_endpoint(url, method, data)
+        self.assertNotIn('Seq Scan', plan, f'{url}:\n{plan}')
+        if index_name:
+            self.assertIn(index_name, plan, f'{url}:\n{plan}')
+
+
+class SubmissionQueryPlanTests(QueryPlanTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        statuses = [choice for choice, _ in Submission.STATUS_CHOICES]
+        Submission.objects.bulk_create([
+            Submission(
+                project_id=i % 40 + 1, student_id=i % 120 + 1, teacher_id=i % 6 + 1,
+                title=f'Submission {i}', description='Описание',
+                status=statuses[i % len(statuses)],
+            )
+            for i in range(1200)
+        ])
+        with connection.cursor() as cursor:
+            cursor.execute(f'ANALYZE {Submission._meta.db_table}')
+
+    def test_list_by_project_and_status(self):
+        self.assertUsesIndex(
+            '/api/submissions/?project_id=3&status=pending', 'submission_project_status_idx'
+        )
+
+    def test_list_by_student(self):
+        self.assertUsesIndex('/api/submissions/?student_id=5', 'submission_student_status_idx')
+
+    def test_list_by_teacher_and_status(self):
+        self.assertUsesIndex(
+            '/api/submissions/?teacher_id=2&status=reviewing', 'submission_teacher_status_idx'
+        )
+
+    def test_my_submissions_as_student(self):
+        self.assertUsesIndex('/api/submissions/my_submissions/', 'submission_student_status_idx')
+
+    def test_my_submissions_as_teacher(self):
+        self.assertUsesIndex(
+            '/api/submissions/my_submissions/?role=teacher', 'submission_teacher_status_idx'
+        )
+
+    def test_cursor_pagination(self):
+        self.assertUsesIndex('/api/submissions/?pagination=cursor', 'submission_submitted_id_idx')
+
+
+class SubmissionExportTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        Submission.objects.bulk_create([
+            Submission(project_id=i % 2 + 1, student_id=i, title=f'Работа {i}',
+                       description='Текст, "с кавычками"')
+            for i in range(30)
+        ])
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(user=TokenUser(1))
+
+    def export(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+
+    def test_ndjson_uses_list_filters(self):
+        body = self.export('/api/submissions/export/?project_id=2')
+        rows = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual(len(rows), 15)
+        self.assertEqual({row['project_id'] for row in rows}, {2})
+        self.assertEqual([row['id'] for row in rows], sorted(row['id'] for row in rows))
+
+    def test_csv(self):
+        body = self.export('/api/submissions/export/?output=csv&project_id=1')
+        rows = list(csv.DictReader(io.StringIO(body.lstrip('\ufeff'))))
+        self.assertEqual(len(rows), 15)
+        self.assertEqual(rows[0]['description'], 'Текст, "с кавычками"')
+        self.assertEqual(rows[0]['teacher_id'], '')
+
+    def test_unknown_format(self):
+        self.assertEqual(self.client.get('/api/submissions/export/?output=xml').status_code, 400)
+
+
+class SubmissionListTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.submissions = Submission.objects.bulk_create([
+            Submission(project_id=1, student_id=1, teacher_id=2, title=f'Работа {i}', description='Текст')
+            for i in range(10)
+        ])
+        Review.objects.bulk_create([
+            Review(submission=submission, reviewer_id=2, comment='Комментарий')
+            for submission in cls.submissions
+            for _ in range(3)
+        ])
+        Attachment.objects.bulk_create([
+            Attachment(submission=submission, name='report.pdf', file_url='https://example.com/report.pdf')
+            for submission in cls.submissions
+        ])
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(user=TokenUser(1))
+
+    def test_list_is_compact(self):
+        with self.assertNumQueries(2):
+            results = self.client.get('/api/submissions/?project_id=1').data['results']
+        self.assertEqual(len(results), 10)
+        self.assertNotIn('reviews', results[0])
+        self.assertEqual((results[0]['reviews_count'], results[0]['attachments_count']), (3, 1))
+
+    def test_include_prefetches(self):
+        with self.assertNumQueries(4):
+            results = self.client.get('/api/submissions/?include=reviews,attachments').data['results']
+        self.assertEqual(len(results[0]['reviews']), 3)
+        self.assertEqual(len(results[0]['attachments']), 1)
+
+    def test_detail_keeps_nested_data(self):
+        data = self.client.get(f'/api/submissions/{self.submissions[0].id}/').data
+        self.assertEqual(len(data['reviews']), 3)
+        self.assertNotIn('reviews_count', data)
+
+
+class GradeBatchTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(user=TokenUser(2))
+        self.submissions = Submission.objects.bulk_create([
+            Submission(project_id=1, student_id=i, title=f'Работа {i}', description='Текст', max_grade=50)
+            for i in range(40)
+        ])
+
+    def grade(self, grades):
+        return self.client.post('/api/submissions/grade_batch/', {'grades': grades}, format='json')
+
+    def test_grades_in_fixed_number_of_queries(self):
+        grades = [
+            {'submission_id': submission.id, 'grade': 45, 'status': 'approved', 'comment': 'Хорошо'}
+            for submission in self.submissions
+        ]
+        with CaptureQueriesContext(connection) as context:
+            response = self.grade(grades)
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertLessEqual(len(context.captured_queries), 5)
+
+        self.assertEqual(response.data['graded'], 40)
+        self.assertEqual(Submission.objects.filter(grade=45, status='approved').count(), 40)
+        self.assertEqual(Review.objects.filter(reviewer_id=2, rating=45).count(), 40)
+        self.assertIsNotNone(response.data['results'][0]['review_id'])
+
+    def test_invalid_items_abort_whole_batch(self):
+        response = self.grade([
+            {'submission_id': self.submissions[0].id, 'grade': 40, 'status': 'approved'},
+            {'submission_id': self.submissions[1].id, 'grade': 60, 'status': 'approved'},
+            {'submission_id': 0, 'grade': 10, 'status': 'approved'},
+        ])
+        self.assertEqual(response.status_code, 400)
+        errors = response.data['grades']
+        self.assertEqual(errors[0], {})
+        self.assertIn('grade', errors[1])
+        self.assertIn('submission_id', errors[2])
+        self.assertFalse(Submission.objects.filter(grade__isnull=False).exists())
+
+    def test_string_ids_are_coerced(self):
+        response = self.grade([
+            {'submission_id': str(self.submissions[0].id), 'grade': 40, 'status': 'approved'},
+            {'submission_id': self.submissions[0].id, 'grade': 30, 'status': 'approved'},
+            {'submission_id': 'abc', 'grade': 10, 'status': 'approved'},
+        ])
+        self.assertEqual(response.status_code, 400)
+        errors = response.data['grades']
+        self.assertEqual(errors[0], {})
+        # "12" и 12 - одна сдача, поэтому второй элемент - повтор, а не "не найдена"
+        self.assertEqual(errors[1], {'submission_id': ['Duplicate submission in batch']})
+        self.assertIn('submission_id', errors[2])
+
+        response = self.grade([{'submission_id': str(self.submissions[1].id), 'grade': 40, 'status': 'approved'}])
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(Submission.objects.get(pk=self.submissions[1].pk).grade, 40)
+
+
+class ClaimQueueTests(QueryPlanTestCase):
+    user_id = 7
+
+    @classmethod
+    def setUpTestData(cls):
+        statuses = ['approved'] * 9 + ['pending']
+        Submission.objects.bulk_create([
+            Submission(project_id=i % 4 + 1, student_id=i, title=f'Работа {i}', description='Текст',
+                       status=statuses[i % len(statuses)])
+            for i in range(2000)
+        ])
+        with connection.cursor() as cursor:
+            cursor.execute(f'ANALYZE {Submission._meta.db_table}')
+
+    def claim(self, **data):
+        response = self.client.post('/api/submissions/claim/', data, format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        return [row['id'] for row in response.data['results']]
+
+    def test_claim_marks_oldest_pending(self):
+        pending = Submission.objects.filter(project_id=2, status='pending').order_by('submitted_at', 'id')
+        oldest = list(pending.values_list('id', flat=True)[:3])
+        ids = self.claim(count=3, project_id=2)
+        self.assertEqual(ids, oldest)
+        claimed = Submission.objects.filter(id__in=ids)
+        self.assertEqual(set(claimed.values_list('status', 'claimed_by', 'project_id')), {('reviewing', 7, 2)})
+        self.assertNotEqual(ids, self.claim(count=3, project_id=2))
+
+    def test_expired_claim_returns_to_queue(self):
+        ids = self.claim(count=1)
+        Submission.objects.filter(id__in=ids).update(claim_expires_at=timezone.now() - timedelta(seconds=1))
+        self.client.force_authenticate(user=TokenUser(8))
+        self.assertEqual(self.claim(count=1), ids)
+        self.assertEqual(Submission.objects.get(id=ids[0]).claimed_by, 8)
+
+    def test_release_and_grade_respect_claim(self):
+        submission_id = self.claim(count=1)[0]
+        self.client.force_authenticate(user=TokenUser(8))
+        response = self.client.post(f'/api/submissions/{submission_id}/grade/',
+                                    {'grade': 90, 'status': 'approved'}, format='json')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(self.client.post(f'/api/submissions/{submission_id}/release/').status_code, 409)
+
+        self.client.force_authenticate(user=TokenUser(7))
+        self.assertEqual(self.client.post(f'/api/submissions/{submission_id}/release/').status_code, 204)
+        self.assertEqual(Submission.objects.get(id=submission_id).status, 'pending')
+
+    def test_claim_uses_partial_indexes(self):
+        self.assertUsesIndex('/api/submissions/claim/', 'submission_pending_queue_idx',
+                             method='post', data={'count': 5})
+        self.assertUsesIndex('/api/submissions/claim/', 'submission_claim_expiry_idx',
+                             method='post', data={'count': 5})
+
+
+class ClaimConcurrencyTests(TransactionTestCase):
+
+    def test_concurrent_claims_skip_locked_rows(self):
+        Submission.objects.bulk_create([
+            Submission(project_id=1, student_id=i, title=f'Работа {i}', description='Текст')
+            for i in range(10)
+        ])
+        held, finish = threading.Event(), threading.Event()
+        first = []
+
+        def hold_claim():
+            try:
+                with transaction.atomic():
+                    first.extend(claim_submissions(1, 3)[0])
+                    held.set()
+                    finish.wait(5)
+            finally:
+                connections.close_all()
+
+        thread = threading.Thread(target=hold_claim)
+        thread.start()
+        held.wait(5)
+        try:
+            second, _ = claim_submissions(2, 5)
+        finally:
+            finish.set()
+            thread.join()
+
+        self.assertEqual(len(first), 3)
+        self.assertEqual(len(second), 5)
+        self.assertFalse(set(first) & set(second))
+
+
+class GradeBatchConcurrencyTests(TransactionTestCase):
+
+    def test_claim_taken_during_batch_rejects_it(self):
+        submission = Submission.objects.create(project_id=1, student_id=1, title='Работа', description='Текст')
+        held = threading.Event()
+
+        def claim_meanwhile():
+            # Другой проверяющий берёт работу, пока пакет ждёт блокировку строки
+            try:
+                with transaction.atomic():
+                    Submission.objects.select_for_update().filter(pk=submission.pk).update(
+                        claimed_by=9, claim_expires_at=timezone.now() + timedelta(minutes=30)
+                    )
+                    held.set()
+                    threading.Event().wait(0.5)
+            finally:
+                connections.close_all()
+
+        thread = threading.Thread(target=claim_meanwhile)
+        thread.start()
+        held.wait(5)
+        client = APIClient()
+        client.force_authenticate(user=TokenUser(2))
+        try:
+            response = client.post('/api/submissions/grade_batch/', {'grades': [
+                {'submission_id': submission.pk, 'grade': 40, 'status': 'approved', 'comment': 'Хорошо'}
+            ]}, format='json')
+        finally:
+            thread.join()
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['grades'][0], {'submission_id': ['Submission is claimed by another reviewer']})
+        submission.refresh_from_db()
+        self.assertEqual((submission.claimed_by, submission.grade), (9, None))
+        self.assertFalse(Review.objects.exists())
+
+
+class GradebookTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        grades = [None, 10, 20, 30, 40, 50, 60, 70, 80, 90, 100]
+        cls.submissions = Submission.objects.bulk_create([
+            Submission(project_id=5, student_id=i, teacher_id=3, title=f'Работа {i}', description='Текст',
+                       grade=grade, max_grade=200 if i == 10 else 100,
+                       status='pending' if grade is None else 'approved')
+            for i, grade in enumerate(grades)
+        ])
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(user=TokenUser(3))
+
+    def gradebook(self, url='/api/submissions/gradebook/projects/5/'):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_aggregates(self):
+        data = self.gradebook()
+        self.assertEqual(data['by_status']['pending'], 1)
+        self.assertEqual(data['by_status']['approved'], 10)
+        self.assertEqual(data['graded'], 10)
+        # 100 из 200 - это 50%
+        self.assertEqual((data['min'], data['max']), (10.0, 90.0))
+        self.assertEqual(data['mean'], 50.0)
+        self.assertEqual(data['median'], 50.0)
+        self.assertEqual(sum(row['count'] for row in data['histogram']), 10)
+        self.assertEqual(data['histogram'][5]['count'], 2)
+        self.assertEqual(self.gradebook('/api/submissions/gradebook/teachers/3/')['graded'], 10)
+
+    def test_cached_until_grade_changes(self):
+        self.gradebook()
+        with self.assertNumQueries(0):
+            self.gradebook()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(f'/api/submissions/{self.submissions[1].id}/', {'title': 'Новое'}, format='json')
+        with self.assertNumQueries(0):
+            self.gradebook()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f'/api/submissions/{self.submissions[0].id}/grade/',
+                             {'grade': 100, 'status': 'approved'}, format='json')
+        data = self.gradebook()
+        self.assertEqual((data['graded'], data['by_status']['pending']), (11, 0))
+
+    def test_update_invalidates_old_and_new_project(self):
+        self.gradebook()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(f'/api/submissions/{self.submissions[1].id}/', {'project_id': 6}, format='json')
+        self.assertEqual(self.gradebook()['graded'], 9)
+        self.assertEqual(self.gradebook('/api/submissions/gradebook/projects/6/')['graded'], 1)
+
+
+class UploadTests(TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root, ignore_errors=True)
+        settings_override = override_settings(UPLOAD_ROOT=self.root, UPLOAD_CHUNK_MAX_SIZE=1024 * 1024)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.client = APIClient()
+        self.client.force_authenticate(user=TokenUser(7))
+        self.submission = Submission.objects.create(project_id=1, student_id=7, title='Отчёт', description='Текст')
+        self.content = b'%PDF-1.7\n' + bytes(range(256)) * 1000
+
+    def start(self, content, name='report.pdf', **extra):
+        response = self.client.post('/api/uploads/', {
+            'submission': self.submission.id, 'name': name, 'size': len(content), **extra
+        }, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        return response.data['id']
+
+    def send(self, upload_id, offset, chunk, execute=True):
+        # Часть переносится в хранилище и хэш запоминается после фиксации
+        with self.captureOnCommitCallbacks(execute=execute):
+            return self.client.patch(
+                f'/api/uploads/{upload_id}/', chunk,
+                content_type='application/offset+octet-stream', HTTP_UPLOAD_OFFSET=str(offset)
+            )
+
+    def stored_files(self):
+        return [path for path in (get_storage().root / 'blobs').rglob('*') if path.is_file()]
+
+    def upload(self, content, chunk_size=100000, **extra):
+        upload_id = self.start(content, **extra)
+        for offset in range(0, len(content), chunk_size):
+            response = self.send(upload_id, offset, content[offset:offset + chunk_size])
+            self.assertEqual(response.status_code, 200, response.data)
+        return response
+
+    def test_resumable_upload_fills_attachment(self):
+        upload_id = self.start(self.content, sha256=hashlib.sha256(self.content).hexdigest())
+        self.assertEqual(self.send(upload_id, 0, self.content[:100000])['Upload-Offset'], '100000')
+
+        # Повтор части с устаревшим offset отклоняется
+        response = self.send(upload_id, 0, self.content[:100000])
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response['Upload-Offset'], '100000')
+
+        # Продолжение в другом процессе: хэша в памяти нет, он пересчитывается по части
+        hashers.discard(Upload.objects.get().pk)
+        response = self.client.get(f'/api/uploads/{upload_id}/')
+        self.assertEqual(response.data['offset'], 100000)
+        response = self.send(upload_id, 100000, self.content[100000:])
+        self.assertEqual(response.status_code, 200, response.data)
+
+        attachment = Attachment.objects.get(submission=self.submission)
+        self.assertEqual(response.data['attachment']['id'], attachment.id)
+        self.assertEqual(attachment.file_size, len(self.content))
+        self.assertEqual(attachment.file_type, 'application/pdf')
+        self.assertEqual(attachment.blob_id, hashlib.sha256(self.content).hexdigest())
+        self.assertTrue(attachment.file_url.endswith(f'/api/attachments/{attachment.id}/download/'))
+        with open(get_storage().blob_path(attachment.blob_id), 'rb') as f:
+            self.assertEqual(f.read(), self.content)
+        self.assertEqual(self.send(upload_id, len(self.content), b'x').status_code, 409)
+
+    def test_identical_files_stored_once(self):
+        self.upload(self.content)
+        self.client.force_authenticate(user=TokenUser(8))
+        self.upload(self.content, chunk_size=30000)
+
+        self.assertEqual(Attachment.objects.filter(submission=self.submission).count(), 2)
+        self.assertEqual(Blob.objects.count(), 1)
+        stored = [path for path in get_storage().root.rglob('*') if path.is_file()]
+        self.assertEqual(len(stored), 1)
+
+    def test_checksum_mismatch_restarts_upload(self):
+        upload_id = self.start(self.content, sha256='0' * 64)
+        response = self.send(upload_id, 0, self.content)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Upload.objects.get().offset, 0)
+        self.assertFalse(Attachment.objects.exists())
+
+    def test_rollback_keeps_part_for_retry(self):
+        upload_id = self.start(self.content)
+        self.send(upload_id, 0, self.content[:100000])
+        with mock.patch('submissions.views.record_version', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                self.send(upload_id, 100000, self.content[100000:])
+
+        # Транзакция откатилась: файл не попал в хранилище, часть цела
+        self.assertEqual(Upload.objects.get().offset, 100000)
+        self.assertFalse(Blob.objects.exists())
+        self.assertEqual(self.stored_files(), [])
+        with open(get_storage().part_path(upload_id), 'rb') as f:
+            self.assertEqual(f.read(), self.content)
+
+        response = self.send(upload_id, 100000, self.content[100000:])
+        self.assertEqual(response.status_code, 200, response.data)
+        with open(get_storage().blob_path(hashlib.sha256(self.content).hexdigest()), 'rb') as f:
+            self.assertEqual(f.read(), self.content)
+        self.assertFalse(get_storage().part_path(upload_id).exists())
+
+    def test_reset_invalidates_hashers_of_previous_attempt(self):
+        wrong = self.content[::-1]
+        upload_id = self.start(self.content, sha256=hashlib.sha256(self.content).hexdigest())
+        self.send(upload_id, 0, wrong[:100000])
+        upload = Upload.objects.get()
+        stale = hashers.take(upload.pk, upload.generation, 100000)
+        self.assertIsNotNone(stale)
+        self.assertEqual(self.send(upload_id, 100000, wrong[100000:]).status_code, 400)
+
+        self.send(upload_id, 0, self.content[:100000])
+        # Другой процесс держит хэш первой попытки до того же offset
+        hashers.put(upload.pk, upload.generation, 100000, stale)
+        response = self.send(upload_id, 100000, self.content[100000:])
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(Attachment.objects.get().blob_id, hashlib.sha256(self.content).hexdigest())
+
+    def test_purge_stores_part_left_after_commit(self):
+        upload_id = self.start(self.content)
+        # Процесс упал после фиксации, не успев перенести часть
+        response = self.send(upload_id, 0, self.content, execute=False)
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(self.stored_files(), [])
+
+        uploads, parts, blobs = purge_stale(timezone.now() + timedelta(seconds=1), get_storage())
+        self.assertEqual((uploads, parts, blobs), (0, 0, 0))
+        self.assertFalse(get_storage().part_path(upload_id).exists())
+        with open(get_storage().blob_path(Attachment.objects.get().blob_id), 'rb') as f:
+            self.assertEqual(f.read(), self.content)
+
+    def test_chunk_limits(self):
+        upload_id = self.start(b'abc', name='notes.txt')
+        self.assertEqual(self.send(upload_id, 0, b'abcd').status_code, 400)
+        response = self.client.patch(f'/api/uploads/{upload_id}/', b'abc', content_type='application/offset+octet-stream')
+        self.assertEqual(response.status_code, 400)
+        with override_settings(UPLOAD_CHUNK_MAX_SIZE=2):
+            self.assertEqual(self.send(upload_id, 0, b'abc').status_code, 413)
+
+        # Чужие загрузки не видны
+        self.client.force_authenticate(user=TokenUser(8))
+        self.assertEqual(self.send(upload_id, 0, b'abc').status_code, 404)
+
+    def test_range_download(self):
+        self.upload(self.content)
+        attachment = Attachment.objects.get()
+        url = f'/api/attachments/{attachment.id}/download/'
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Length'], str(len(self.content)))
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertEqual(b''.join(response.streaming_content), self.content)
+
+        response = self.client.get(url, HTTP_RANGE='bytes=100-199')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], f'bytes 100-199/{len(self.content)}')
+        self.assertEqual(b''.join(response.streaming_content), self.content[100:200])
+
+        response = self.client.get(url, HTTP_RANGE='bytes=-10')
+        self.assertEqual(b''.join(response.streaming_content), self.content[-10:])
+
+        self.assertEqual(self.client.get(url, HTTP_RANGE=f'bytes={len(self.content)}-').status_code, 416)
+
+        # Если файл сменился, If-Range не совпадает и отдаётся весь файл
+        response = self.client.get(url, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"stale"')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), self.content)
+
+    def test_purge_removes_abandoned_uploads_and_unused_blobs(self):
+        self.upload(self.content)
+        abandoned = self.start(b'abcdef', name='notes.txt')
+        self.send(abandoned, 0, b'abc')
+        Attachment.objects.all().delete()
+
+        uploads, parts, blobs = purge_stale(timezone.now() + timedelta(seconds=1), get_storage())
+        # Завершённая загрузка теряет ссылку на удалённый файл и тоже удаляется
+        self.assertEqual((uploads, parts, blobs), (2, 0, 1))
+        self.assertFalse(Blob.objects.exists())
+        self.assertEqual([path for path in get_storage().root.rglob('*') if path.is_file()], [])
+
+
+class StubProjectService(ThreadingHTTPServer):
+    """Локальная заглушка project_service: GET /api/projects/?ids=... по словарю projects"""
+
+    daemon_threads = True
+
+    def __init__(self, projects):
+        self.projects = projects
+        self.requests = []
+        self.fail = False
+
+        class Handler(BaseHTTPRequestHandler):
+            # HTTP/1.1, чтобы клиент мог держать соединение открытым
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(handler):
+                query = parse_qs(urlparse(handler.path).query)
+                self.requests.append((handler.client_address, query))
+                if self.fail:
+                    status, body = 500, b'{}'
+                else:
+                    ids = [int(pk) for pk in query['ids'][0].split(',')]
+                    results = [self.projects[pk] for pk in ids if pk in self.projects]
+                    status, body = 200, json.dumps({'next': None, 'previous': None, 'results': results}).encode()
+                handler.send_response(status)
+                handler.send_header('Content-Type', 'application/json')
+                handler.send_header('Content-Length', str(len(body)))
+                handler.end_headers()
+                handler.wfile.write(body)
+
+            def log_message(handler, *args):
+                pass
+
+        super().__init__(('127.0.0.1', 0), Handler)
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.server_address[1]}'
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+class ProjectServiceClientTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.stub = StubProjectService({
+            pk: {'id': pk, 'title': f'Проект {pk}', 'status': 'in_progress', 'owner_id': 1, 'teacher_id': 2}
+            for pk in (1, 2)
+        })
+        self.addCleanup(self.stub.stop)
+        settings_override = override_settings(PROJECT_SERVICE_URL=self.stub.url)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def test_batches_and_caches_lookups(self):
+        client = ProjectServiceClient()
+        projects = client.get_projects([1, 2, 3, 2])
+        self.assertEqual(sorted(projects), [1, 2])
+        self.assertEqual(len(self.stub.requests), 1)
+        self.assertEqual(self.stub.requests[0][1]['ids'], ['1,2,3'])
+
+        # Найденные и отсутствующие id берутся из кэша
+        self.assertEqual(client.get_project(1)['title'], 'Проект 1')
+        self.assertIsNone(client.get_project(3))
+        self.assertEqual(len(self.stub.requests), 1)
+
+        with self.settings(PROJECT_CACHE_NEGATIVE_TIMEOUT=0):
+            cache.clear()
+            client.get_projects(range(1, 251))
+        self.assertEqual(len(self.stub.requests), 4)
+        # Все запросы прошли по одному keep-alive соединению из пула
+        self.assertEqual(len({address for address, _ in self.stub.requests}), 1)
+
+    def test_circuit_breaker_opens_and_recovers(self):
+        now = [0.0]
+        client = ProjectServiceClient()
+        client.breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30, clock=lambda: now[0])
+        self.stub.fail = True
+        for _ in range(2):
+            with self.assertRaises(ServiceUnavailable):
+                client.get_projects([1])
+        # Цепь разомкнута: запрос не доходит до сервиса
+        with self.assertRaises(ServiceUnavailable):
+            client.get_projects([1])
+        self.assertEqual(len(self.stub.requests), 2)
+
+        now[0] = 31
+        self.stub.fail = False
+        self.assertEqual(client.get_projects([1])[1]['id'], 1)
+        self.assertEqual(client.breaker.state, CircuitBreaker.CLOSED)
+
+    def test_submission_create_validates_project(self):
+        api = APIClient()
+        api.force_authenticate(user=TokenUser(5))
+        data = {'student_id': 5, 'title': 'Работа', 'description': 'Текст'}
+        response = api.post('/api/submissions/', {**data, 'project_id': 3}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('project_id', response.data)
+        self.assertEqual(api.post('/api/submissions/', {**data, 'project_id': 1}, format='json').status_code, 201)
+
+        # Недоступный project_service не блокирует сдачу
+        self.stub.fail = True
+        cache.clear()
+        self.assertEqual(api.post('/api/submissions/', {**data, 'project_id': 2}, format='json').status_code, 201)
+
+    def test_list_includes_projects_with_one_request(self):
+        Submission.objects.bulk_create([
+            Submission(project_id=i % 3 + 1, student_id=5, title=f'Работа {i}', description='Текст')
+            for i in range(12)
+        ])
+        api = APIClient()
+        api.force_authenticate(user=TokenUser(5))
+        response = api.get('/api/submissions/?include=project')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(self.stub.requests), 1)
+        titles = {row['project_id']: row['project'] and row['project']['title'] for row in response.data['results']}
+        self.assertEqual(titles, {1: 'Проект 1', 2: 'Проект 2', 3: None})
+        self.assertNotIn('project', api.get('/api/submissions/').data['results'][0])
+
+
+class SimilarityTests(QueryPlanTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        rng = random.Random(7)
+        vocabulary = [f'слово{i}' for i in range(400)]
+
+        def essay(length=120):
+            return ' '.join(rng.choice(vocabulary) for _ in range(length))
+
+        def edit(text, changes):
+            words = text.split()
+            for _ in range(changes):
+                words[rng.randrange(len(words))] = rng.choice(vocabulary)
+            return ' '.join(words)
+
+        cls.essay = essay()
+        create = Submission.objects.create
+        cls.original = create(project_id=1, student_id=1, title='Отчёт', description=cls.essay)
+        cls.copy = create(project_id=1, student_id=2, title='Отчёт', description=edit(cls.essay, 4))
+        cls.other_project = create(project_id=2, student_id=3, title='Отчёт', description=cls.essay)
+        cls.second = create(project_id=1, student_id=4, title='Реферат', description=essay())
+        cls.second_copy = create(project_id=1, student_id=5, title='Реферат', description=cls.second.description)
+        cls.unrelated = [
+            create(project_id=1, student_id=10 + i, title=f'Работа {i}', description=essay())
+            for i in range(150)
+        ]
+        with connection.cursor() as cursor:
+            # Без статистики подписей план зависит от того, успел ли пройти autovacuum
+            for model in (SimilarityBucket, SubmissionSignature):
+                cursor.execute(f'ANALYZE {model._meta.db_table}')
+
+    def test_finds_near_duplicates_in_project(self):
+        response = self.client.get(f'/api/submissions/{self.original.id}/similar/')
+        self.assertEqual(response.status_code, 200)
+        results = response.data['results']
+        self.assertEqual([row['submission_id'] for row in results], [self.copy.id])
+        self.assertGreater(results[0]['similarity'], 0.6)
+
+        response = self.client.get(f'/api/submissions/{self.original.id}/similar/?scope=all')
+        self.assertEqual(
+            [row['submission_id'] for row in response.data['results']], [self.other_project.id, self.copy.id]
+        )
+        self.assertEqual(response.data['results'][0]['similarity'], 1.0)
+        self.assertEqual(self.client.get(f'/api/submissions/{self.original.id}/similar/?threshold=2').status_code, 400)
+
+    def test_candidates_come_from_lsh_index(self):
+        # Корзины ищутся по ключам через индекс (similarity_key_idx или similarity_project_key_idx)
+        plan = self.explain_endpoint(f'/api/submissions/{self.original.id}/similar/')
+        self.assertRegex(plan, r'Index Cond: .*key = ANY')
+
+    def test_index_is_updated_incrementally(self):
+        self.assertEqual(SimilarityBucket.objects.filter(submission=self.original).count(), BANDS)
+
+        # Оценка не меняет текст: подпись не пересчитывается
+        self.original.grade = 90
+        self.original.save()
+        self.assertFalse(index_submission(self.original))
+
+        self.copy.description = self.unrelated[0].description + ' дополнение'
+        self.copy.save()
+        results = self.client.get(f'/api/submissions/{self.original.id}/similar/').data['results']
+        self.assertEqual(results, [])
+
+        self.copy.description = ''
+        self.copy.title = ''
+        self.copy.save()
+        self.assertFalse(SubmissionSignature.objects.filter(submission=self.copy).exists())
+        self.assertFalse(SimilarityBucket.objects.filter(submission=self.copy).exists())
+
+    def test_project_clusters(self):
+        response = self.client.get('/api/submissions/similarity/projects/1/')
+        self.assertEqual(response.status_code, 200)
+        clusters = response.data['clusters']
+        self.assertEqual(
+            [cluster['submission_ids'] for cluster in clusters],
+            sorted([
+                sorted([self.original.id, self.copy.id]),
+                sorted([self.second.id, self.second_copy.id]),
+            ])
+        )
+        self.assertEqual(clusters[0]['student_ids'], [1, 2])
+
+
+class GradebookPivotExportTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        create = Submission.objects.create
+        now = timezone.now()
+        rows = [
+            # student, project, teacher, grade, status, дней назад
+            (1, 10, 7, 40, 'revision', 5),
+            (1, 10, 7, 90, 'approved', 1),
+            (1, 11, 8, None, 'pending', 2),
+            (2, 11, 8, 30, 'rejected', 3),
+            (3, 10, 7, 100, 'approved', 4),
+        ]
+        for student, project, teacher, grade, status, days in rows:
+            submission = create(project_id=project, student_id=student, teacher_id=teacher,
+                                title='Работа', description='Текст', grade=grade, status=status)
+            Submission.objects.filter(pk=submission.pk).update(submitted_at=now - timedelta(days=days))
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(user=TokenUser(1))
+        # project_service в тестах недоступен: колонки подписываются id проектов
+        settings_override = override_settings(PROJECT_SERVICE_URL='http://127.0.0.1:9')
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def export(self, query=''):
+        response = self.client.get(f'/api/submissions/gradebook/export/{query}')
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_csv_pivot_keeps_latest_submission(self):
+        response = self.export()
+        body = b''.join(response.streaming_content).decode().lstrip('\ufeff')
+        rows = list(csv.reader(io.StringIO(body)))
+        self.assertEqual(rows[0], [
+            'student_id',
+            '#10: grade', '#10: grade_percentage', '#10: status',
+            '#11: grade', '#11: grade_percentage', '#11: status',
+        ])
+        self.assertEqual(rows[1:], [
+            ['1', '90', '90.0', 'approved', '', '', 'pending'],
+            ['2', '', '', '', '30', '30.0', 'rejected'],
+            ['3', '100', '100.0', 'approved', '', '', ''],
+        ])
+
+    def test_filters(self):
+        body = b''.join(self.export('?teacher_id=8').streaming_content).decode().lstrip('\ufeff')
+        rows = list(csv.reader(io.StringIO(body)))
+        self.assertEqual(len(rows[0]), 4)
+        self.assertEqual([row[0] for row in rows[1:]], ['1', '2'])
+
+        body = b''.join(self.export('?project_ids=10,x').streaming_content).decode().lstrip('\ufeff')
+        self.assertEqual([row[0] for row in csv.reader(io.StringIO(body))][1:], ['1', '3'])
+        self.assertEqual(self.client.get('/api/submissions/gradebook/export/?output=pdf').status_code, 400)
+
+    def test_xlsx(self):
+        response = self.export('?output=xlsx')
+        self.assertIn('gradebook-', response['Content-Disposition'])
+        sheet = load_workbook(io.BytesIO(b''.join(response.streaming_content))).active
+        values = list(sheet.values)
+        self.assertEqual(values[0][:2], ('student_id', '#10: grade'))
+        self.assertEqual(values[1], (1, 90, 90, 'approved', None, None, 'pending'))
+
+
+class SubmissionVersionTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(user=TokenUser(5))
+        self.description = '\n'.join(f'Раздел {i}: описание выполненной работы.' for i in range(200))
+        self.submission = Submission.objects.create(
+            project_id=1, student_id=5, title='Отчёт', description=self.description,
+            repository_url='https://git.example.com/v1'
+        )
+
+    def update(self, **data):
+        response = self.client.patch(f'/api/submissions/{self.submission.id}/', data, format='json')
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_first_update_keeps_original_as_baseline(self):
+        self.update(title='Отчёт, вторая редакция')
+        response = self.client.get(f'/api/submissions/{self.submission.id}/versions/')
+        self.assertEqual([row['number'] for row in response.data], [1, 2])
+        self.assertEqual(response.data[1]['changed_fields'], ['title'])
+        self.assertEqual(response.data[1]['author_id'], 5)
+
+        response = self.client.get(f'/api/submissions/{self.submission.id}/versions/1/')
+        self.assertEqual(response.data['title'], 'Отчёт')
+        self.assertEqual(response.data['description'], self.description)
+        self.assertEqual(self.client.get(f'/api/submissions/{self.submission.id}/versions/9/').status_code, 404)
+
+    def test_small_edit_stores_small_delta(self):
+        edited = self.description.replace('Раздел 100:', 'Раздел 100 (исправлено):')
+        self.update(description=edited)
+        self.update(description=edited + '\nВыводы.', repository_url='https://git.example.com/v2')
+
+        first, second, third = SubmissionVersion.objects.filter(submission=self.submission).order_by('number')
+        self.assertTrue(first.is_snapshot)
+        self.assertFalse(second.is_snapshot)
+        self.assertLess(second.size, first.size / 20)
+        self.assertLess(third.size, first.size / 20)
+        self.assertEqual(third.changed_fields, ['description', 'repository_url'])
+
+        contents = load_versions(self.submission.id, [1, 2, 3])
+        self.assertEqual(contents[1]['description'], self.description)
+        self.assertEqual(contents[2]['description'], edited)
+        self.assertEqual(contents[3]['repository_url'], 'https://git.example.com/v2')
+
+    def test_diff_and_attachments(self):
+        self.client.post(f'/api/submissions/{self.submission.id}/add_attachment/', {
+            'name': 'report.pdf', 'file_url': 'https://files.example.com/report.pdf'
+        }, format='json')
+        self.update(description=self.description.replace('Раздел 5:', 'Раздел пятый:'))
+
+        response = self.client.get(f'/api/submissions/{self.submission.id}/diff/')
+        self.assertEqual((response.data['from'], response.data['to']), (2, 3))
+        self.assertEqual(list(response.data['changes']), ['description'])
+        unified = response.data['changes']['description']['unified']
+        self.assertIn('-Раздел 5: описание выполненной работы.', unified)
+        self.assertIn('+Раздел пятый: описание выполненной работы.', unified)
+
+        response = self.client.get(f'/api/submissions/{self.submission.id}/diff/?from=1&to=2')
+        self.assertEqual(list(response.data['changes']), ['attachments'])
+        self.assertEqual([row['name'] for row in response.data['changes']['attachments']['added']], ['report.pdf'])
+        self.assertEqual(self.client.get(f'/api/submissions/{self.submission.id}/diff/?from=1&to=7').status_code, 404)
+
+    def test_unchanged_save_records_nothing(self):
+        self.update(title='Отчёт')
+        self.assertEqual(SubmissionVersion.objects.filter(submission=self.submission).count(), 1)
+        self.client.post(f'/api/submissions/{self.submission.id}/grade/', {'grade': 80}, format='json')
+        self.assertEqual(SubmissionVersion.objects.filter(submission=self.submission).count(), 1)
+
+    def test_rewrites_start_new_snapshot(self):
+        record_version(self.submission)
+        texts = [f'Версия {n}: ' + 'новый текст ' * 300 for n in range(4)]
+        for text in texts:
+            self.submission.description = text
+            self.submission.save()
+            record_version(self.submission)
+
+        versions = list(SubmissionVersion.objects.filter(submission=self.submission).order_by('number'))
+        self.assertTrue(any(version.is_snapshot for version in versions[1:]))
+        # Цепочка дельт от снимка никогда не больше самого снимка
+        snapshot_size = payload_size(load_versions(self.submission.id, [5])[5])
+        self.assertLess(sum(version.size for version in versions if not version.is_snapshot), 2 * snapshot_size)
+        contents = load_versions(self.submission.id, range(1, 6))
+        self.assertEqual([contents[n]['description'] for n in range(2, 6)], texts)
+
+
+class PaginationTests(TestCase):
+    """Курсорный режим и режимы подсчёта HybridPagination на списке /api/submissions/"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(user=TokenUser(1))
+        objects = [self.create_object(i) for i in range(11)]
+        # Две группы с одинаковым ключом сортировки: порядок внутри решает id
+        moment = timezone.now()
+        ids = [obj.id for obj in objects]
+        Submission.objects.filter(id__in=ids[:6]).update(submitted_at=moment)
+        Submission.objects.filter(id__in=ids[6:]).update(submitted_at=moment - timedelta(hours=1))
+        self.expected = ids[5::-1] + ids[:5:-1]
+
+    def create_object(self, i):
+        return Submission.objects.create(project_id=1, student_id=i, title=f'Работа {i}', description='')
+
+    def walk(self, url):
+        pages = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200, response.data)
+            pages.append(response.data)
+            url = response.data['next']
+        return pages
+
+    def page_ids(self, page):
+        return [row['id'] for row in page['results']]
+
+    def encode(self, data):
+        return base64.urlsafe_b64encode(json.dumps(data).encode()).decode()
+
+    def test_cursor_walk_has_no_duplicates_or_gaps(self):
+        pages = self.walk('/api/submissions/?pagination=cursor&page_size=4')
+        self.assertEqual([len(page['results']) for page in pages], [4, 4, 3])
+        self.assertEqual([pk for page in pages for pk in self.page_ids(page)], self.expected)
+        self.assertIsNone(pages[0]['previous'])
+
+    def test_previous_link_returns_preceding_page(self):
+        pages = self.walk('/api/submissions/?pagination=cursor&page_size=4')
+        for before, page in zip(pages, pages[1:]):
+            previous = self.client.get(page['previous']).data
+            self.assertEqual(self.page_ids(previous), self.page_ids(before))
+            self.assertIsNotNone(previous['next'])
+        self.assertIsNone(self.client.get(pages[1]['previous']).data['previous'])
+
+    def test_invalid_cursor(self):
+        for cursor in ('garbage', self.encode({'v': 'not a date', 'id': 1}),
+                       self.encode({'v': timezone.now().isoformat()}), self.encode([1])):
+            response = self.client.get(f'/api/submissions/?cursor={cursor}')
+            self.assertEqual(response.status_code, 404, cursor)
+
+    def test_cached_count(self):
+        data = self.client.get('/api/submissions/?count=cached&page_size=5').data
+        self.assertEqual((data['count'], data['count_mode']), (11, 'cached'))
+        self.create_object(11)
+        # Тот же запрос - то же количество из кэша, пока не истёк таймаут
+        self.assertEqual(self.client.get('/api/submissions/?count=cached&page_size=5').data['count'], 11)
+        self.assertEqual(self.client.get('/api/submissions/?page_size=5').data['count'], 12)
+        self.assertNotIn('count_mode', self.client.get('/api/submissions/?page_size=5').data)
+
+    def test_estimated_count(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'ANALYZE {Submission._meta.db_table}')
+        pages = self.walk('/api/submissions/?count=estimate&page_size=5')
+        self.assertEqual([len(page['results']) for page in pages], [5, 5, 1])
+        # Маленькая выборка считается точно (ниже PAGINATION_ESTIMATE_EXACT_BELOW)
+        self.assertEqual((pages[0]['count'], pages[0]['count_mode']), (11, 'estimate'))
+        self.assertEqual([pk for page in pages for pk in self.page_ids(page)], self.expected)
+        with override_settings(PAGINATION_ESTIMATE_EXACT_BELOW=0):
+            data = self.client.get(pages[0]['next']).data
+        # Без точного подсчёта count - оценка планировщика по статистике таблицы
+        self.assertGreater(data['count'], 0)
+        self.assertEqual(len(data['results']), 5)
+        # Страница за пределами оценки - пустая, а не 404, как в точном режиме
+        self.assertEqual(self.client.get('/api/submissions/?count=estimate&page_size=5&page=9').data['results'], [])
+        self.assertEqual(self.client.get('/api/submissions/?page_size=5&page=9').status_code, 404)
+
+
+class ConditionalGetTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(user=TokenUser(4))
+        self.submission = Submission.objects.create(project_id=1, student_id=4, title='Работа', description='')
+        self.url = f'/api/submissions/{self.submission.id}/'
+
+    def etag(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response['ETag']
+
+    def test_repeated_get_returns_304(self):
+        etag = self.etag(self.url)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_nested_writes_change_etag(self):
+        etags = [self.etag(self.url)]
+        review = Review.objects.create(submission=self.submission, reviewer_id=2, comment='Хорошо')
+        etags.append(self.etag(self.url))
+        review.comment = 'Отлично'
+        review.save()
+        etags.append(self.etag(self.url))
+        Attachment.objects.create(submission=self.submission, name='a.pdf', file_url='https://example.com/a.pdf')
+        etags.append(self.etag(self.url))
+        self.assertEqual(len(set(etags)), len(etags))
+
+    def test_representation_params_change_etag(self):
+        url = '/api/submissions/my_submissions/'
+        self.assertNotEqual(self.etag(url), self.etag(f'{url}?fields=id,title'))
@@ -0,0 +1,351 @@
+import hashlib
+import mimetypes
+import re
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone as dt_timezone
+from functools import partial
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, OuterRef, ProtectedError
+from django.http import FileResponse, HttpResponse
+from django.http.request import UnreadablePostError
+
+from .models import Attachment, Blob, Upload
+from .storage import BLOCK_SIZE
+
+# Сколько незавершённых SHA-256 держать в памяти процесса
+HASHER_CACHE_SIZE = 256
+
+# Сигнатуры форматов, которые чаще всего прикрепляют к сдачам
+MAGIC_TYPES = [
+    (b'%PDF-', 'application/pdf'),
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'GIF87a', 'image/gif'),
+    (b'GIF89a', 'image/gif'),
+    (b'PK\x03\x04', 'application/zip'),
+    (b'\x1f\x8b', 'application/gzip'),
+    (b'7z\xbc\xaf\x27\x1c', 'application/x-7z-compressed'),
+    (b'Rar!\x1a\x07', 'application/vnd.rar'),
+]
+DEFAULT_CONTENT_TYPE = 'application/octet-stream'
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class ChecksumMismatch(Exception):
+    pass
+
+
+class HasherCache:
+    """SHA-256 незавершённых загрузок, посчитанные до текущего offset.
+
+    Хэш обновляется по мере записи каждой части, поэтому после последней
+    части файл не приходится читать заново. Объект хэша нельзя сохранить в
+    БД, так что он живёт в памяти процесса; если его вытеснили или загрузка
+    продолжается в другом процессе, хэш пересчитывается по уже записанной
+    части (см. resume_hasher). Хэш подходит, только если совпадают и offset,
+    и номер попытки: после сброса загрузки другой процесс может держать хэш
+    прошлой попытки ровно до того же offset.
+    """
+
+    def __init__(self, maxsize=HASHER_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.items = OrderedDict()
+        self.lock = threading.Lock()
+
+    def take(self, upload_id, generation, offset):
+        """Забрать хэш, если он посчитан в этой попытке ровно до offset, иначе None"""
+        with self.lock:
+            item = self.items.pop(upload_id, None)
+        if item is None or item[:2] != (generation, offset):
+            return None
+        return item[2]
+
+    def put(self, upload_id, generation, offset, hasher):
+        with self.lock:
+            self.items[upload_id] = (generation, offset, hasher)
+            self.items.move_to_end(upload_id)
+            while len(self.items) > self.maxsize:
+                self.items.popitem(last=False)
+
+    def discard(self, upload_id):
+        with self.lock:
+            self.items.pop(upload_id, None)
+
+
+hashers = HasherCache()
+
+
+def resume_hasher(f, offset):
+    """Пересчитать SHA-256 первых offset байт части блоками и оставить файл на offset"""
+    hasher = hashlib.sha256()
+    f.seek(0)
+    remaining = offset
+    while remaining > 0:
+        block = f.read(min(BLOCK_SIZE, remaining))
+        if not block:
+            break
+        hasher.update(block)
+        remaining -= len(block)
+    f.seek(offset)
+    return hasher
+
+
+def append_chunk(upload, stream, length, storage):
+    """Дописать в часть загрузки до length байт из потока запроса.
+
+    Тело читается блоками по BLOCK_SIZE, сразу пишется на диск и попадает в
+    хэш, поэтому в памяти не бывает больше одного блока. Если клиент оборвал
+    соединение, offset сдвигается на то, что успело прийти, и загрузку можно
+    продолжить с этого места. Возвращает хэш содержимого до нового offset.
+
+    Хэш запоминается только после фиксации транзакции: если она откатится,
+    offset в БД останется прежним, и хэш до нового offset не понадобится.
+    """
+    with storage.open_part(upload.pk, upload.offset) as f:
+        hasher = hashers.take(upload.pk, upload.generation, upload.offset) or resume_hasher(f, upload.offset)
+        received = 0
+        while received < length:
+            try:
+                block = stream.read(min(BLOCK_SIZE, length - received))
+            except UnreadablePostError:
+                break
+            if not block:
+                break
+            f.write(block)
+            hasher.update(block)
+            received += len(block)
+    upload.offset += received
+    transaction.on_commit(partial(hashers.put, upload.pk, upload.generation, upload.offset, hasher))
+    return hasher
+
+
+def detect_content_type(path, name):
+    """Тип файла по сигнатуре, а если она не известна - по расширению имени"""
+    with open(path, 'rb') as f:
+        head = f.read(16)
+    guessed, _ = mimetypes.guess_type(name)
+    content_type = next((value for magic, value in MAGIC_TYPES if head.startswith(magic)), None)
+    # docx, xlsx, odt и т.п. - это zip-архивы, для них точнее расширение
+    if content_type is None or (content_type == 'application/zip' and guessed):
+        content_type = guessed or DEFAULT_CONTENT_TYPE
+    max_length = Attachment._meta.get_field('file_type').max_length
+    return content_type if len(content_type) <= max_length else DEFAULT_CONTENT_TYPE
+
+
+def lock_blob(sha256, size):
+    """Строка Blob, заблокированная до конца транзакции.
+
+    Блокировка не даёт purge_uploads удалить файл, пока на него создаётся
+    ссылка. Если очистка успела удалить строку между вставкой и блокировкой,
+    она вставляется заново.
+    """
+    while True:
+        Blob.objects.bulk_create([Blob(sha256=sha256, size=size)], ignore_conflicts=True)
+        blob = Blob.objects.select_for_update().filter(pk=sha256).first()
+        if blob is not None:
+            return blob
+
+
+def finalize_upload(upload, hasher, storage, build_url):
+    """Перенести полностью загруженный файл в хранилище и создать Attachment.
+
+    Должна вызываться внутри транзакции. Часть переносится в хранилище только
+    после фиксации: при откате она остаётся на месте, и последнюю часть можно
+    прислать заново, а в blobs/ не появляется файл без строки Blob. Если
+    процесс упадёт между фиксацией и переносом, часть перенесёт purge_stale.
+    build_url(attachment) возвращает ссылку на скачивание для file_url.
+    """
+    sha256 = hasher.hexdigest()
+    if upload.sha256 and upload.sha256 != sha256:
+        raise ChecksumMismatch(sha256)
+
+    file_type = detect_content_type(storage.part_path(upload.pk), upload.name)
+    blob = lock_blob(sha256, upload.size)
+    transaction.on_commit(partial(store_part, upload.pk, sha256, storage))
+
+    attachment = Attachment.objects.create(
+        submission_id=upload.submission_id,
+        name=upload.name,
+        file_url='',
+        file_type=file_type,
+        file_size=upload.size,
+        blob=blob,
+    )
+    attachment.file_url = build_url(attachment)
+    attachment.save(update_fields=['file_url'])
+    upload.attachment = attachment
+    return attachment
+
+
+def store_part(upload_id, sha256, storage):
+    storage.store(upload_id, sha256)
+    hashers.discard(upload_id)
+
+
+def reset_upload(upload, storage):
+    """Начать загрузку заново, например после несовпадения контрольной суммы.
+
+    Номер попытки растёт, поэтому хэши прошлой попытки, оставшиеся в памяти
+    других процессов, больше не подойдут. Изменённые offset и generation
+    нужно сохранить.
+    """
+    storage.delete_part(upload.pk)
+    hashers.discard(upload.pk)
+    upload.offset = 0
+    upload.generation += 1
+
+
+def purge_stale(border, storage):
+    """Удалить то, что не трогали с момента border.
+
+    Незавершённые загрузки удаляются вместе с частями, части без строки
+    Upload - как есть, а часть завершённой загрузки, которую не успели
+    перенести после фиксации (процесс упал), переносится в хранилище.
+    Содержимое без ссылок из Attachment удаляется под блокировкой строки
+    Blob (см. lock_blob), поэтому финализация, которая как раз ссылается на
+    это содержимое, не потеряет файл. Возвращает
+    количество удалённых загрузок, частей без загрузок и файлов хранилища.
+    """
+    stale = list(Upload.objects.filter(attachment__isnull=True, updated_at__lt=border).values_list('pk', flat=True))
+    Upload.objects.filter(pk__in=stale).delete()
+    for upload_id in stale:
+        storage.delete_part(upload_id)
+        hashers.discard(upload_id)
+
+    known = {str(pk): sha256 for pk, sha256 in Upload.objects.values_list('pk', 'attachment__blob_id')}
+    orphan_parts = 0
+    for upload_id, path in storage.parts():
+        modified = datetime.fromtimestamp(path.stat().st_mtime, tz=dt_timezone.utc)
+        if modified >= border:
+            continue
+        if upload_id not in known:
+            path.unlink(missing_ok=True)
+            orphan_parts += 1
+        elif known[upload_id]:
+            store_part(upload_id, known[upload_id], storage)
+
+    unused = Blob.objects.filter(created_at__lt=border).exclude(
+        Exists(Attachment.objects.filter(blob=OuterRef('pk')))
+    ).values_list('pk', flat=True)
+    blobs = 0
+    for sha256 in list(unused):
+        with transaction.atomic():
+            blob = Blob.objects.select_for_update(skip_locked=True).filter(pk=sha256).first()
+            if blob is None:
+                continue
+            try:
+                blob.delete()
+            except ProtectedError:
+                # На содержимое успели сослаться
+                continue
+            storage.delete(sha256)
+            blobs += 1
+    return len(stale), orphan_parts, blobs
+
+
+def parse_range(header, size):
+    """Диапазон (start, end) включительно из заголовка Range.
+
+    None - заголовка нет или он не поддерживается (несколько диапазонов),
+    и отдаётся весь файл. ValueError - диапазон не пересекается с файлом (416).
+    """
+    match = RANGE_RE.match(header or '')
+    if not match or match.groups() == ('', ''):
+        return None
+    first, last = match.groups()
+    if first:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+        if start > end:
+            if last and int(last) < start:
+                return None
+            raise ValueError(header)
+    else:
+        suffix = int(last)
+        if suffix == 0 or size == 0:
+            raise ValueError(header)
+        start, end = max(size - suffix, 0), size - 1
+    return start, end
+
+
+class RangeFile:
+    """Окно [start, start + length) открытого файла для FileResponse.
+
+    fileno() позволяет WSGI-серверу с sendfile (gunicorn) отдать файл из
+    page cache без копирования в user space, а длину он берёт из
+    Content-Length. read() не выходит за границу окна для серверов без
+    sendfile. Методов tell/seek нет, чтобы FileResponse не пересчитывал
+    Content-Length по размеру всего файла.
+    """
+
+    def __init__(self, f, start, length):
+        f.seek(start)
+        self.file = f
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        if size <= 0:
+            return b''
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def close(self):
+        self.file.close()
+
+
+def blob_response(request, attachment, storage):
+    """Ответ с содержимым файла с поддержкой Range и If-Range.
+
+    ETag - это SHA-256 содержимого, поэтому докачка безопасна: если файл
+    сменился, If-Range не совпадёт и вернётся весь файл.
+    """
+    blob = attachment.blob
+    etag = f'"{blob.sha256}"'
+
+    if settings.UPLOAD_ACCEL_REDIRECT_PREFIX:
+        # Файл и диапазоны отдаёт nginx из internal-location
+        response = HttpResponse(content_type=attachment.file_type or DEFAULT_CONTENT_TYPE)
+        prefix = settings.UPLOAD_ACCEL_REDIRECT_PREFIX.rstrip('/')
+        response['X-Accel-Redirect'] = f'{prefix}/{storage.relative_blob_path(blob.sha256)}'
+        response['ETag'] = etag
+        return response
+
+    byte_range = None
+    if_range = request.headers.get('If-Range')
+    if if_range is None or if_range == etag:
+        try:
+            byte_range = parse_range(request.headers.get('Range'), blob.size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{blob.size}'
+            response['Accept-Ranges'] = 'bytes'
+            return response
+
+    start, end = byte_range or (0, blob.size - 1)
+    length = end - start + 1
+    f = open(storage.blob_path(blob.sha256), 'rb')
+    response = FileResponse(
+        RangeFile(f, start, length),
+        status=206 if byte_range else 200,
+        content_type=attachment.file_type or DEFAULT_CONTENT_TYPE,
+        as_attachment=True,
+        filename=attachment.name,
+    )
+    response.block_size = BLOCK_SIZE
+    response['Content-Length'] = length
+    if byte_range:
+        response['Content-Range'] = f'bytes {start}-{end}/{blob.size}'
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    response['X-Content-Type-Options'] = 'nosniff'
+    return response
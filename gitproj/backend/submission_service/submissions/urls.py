@@ -1,10 +1,12 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import SubmissionViewSet, ReviewViewSet
+from .views import SubmissionViewSet, ReviewViewSet, UploadViewSet, AttachmentViewSet
 
 router = DefaultRouter()
 router.register(r'submissions', SubmissionViewSet, basename='submission')
 router.register(r'reviews', ReviewViewSet, basename='review')
+router.register(r'uploads', UploadViewSet, basename='upload')
+router.register(r'attachments', AttachmentViewSet, basename='attachment')
 
 urlpatterns = [
     path('', include(router.urls)),
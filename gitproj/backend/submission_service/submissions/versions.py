@@ -0,0 +1,207 @@
+import difflib
+import json
+
+from django.db import transaction
+from django.db.models import Subquery
+
+from .models import Attachment, Submission, SubmissionVersion
+
+# Поля сдачи, история которых хранится, и описание прикреплённого файла в версии
+VERSIONED_FIELDS = ('title', 'description', 'repository_url', 'demo_url', 'documentation_url')
+ATTACHMENT_FIELDS = ('name', 'file_url', 'file_type', 'file_size', 'blob')
+# Для многострочных полей diff показывает ещё и unified diff
+MULTILINE_FIELDS = ('description',)
+
+# Предельная длина цепочки дельт от снимка, даже если все дельты маленькие
+MAX_CHAIN_LENGTH = 50
+
+
+def payload_size(value):
+    """Размер значения в компактном JSON, байты"""
+    return len(json.dumps(value, ensure_ascii=False, separators=(',', ':')).encode())
+
+
+def submission_content(submission):
+    """Текущее содержимое сдачи в виде версии; файлы - словарь {id: описание}"""
+    content = {field: getattr(submission, field) for field in VERSIONED_FIELDS}
+    content['attachments'] = {
+        str(row.pop('id')): row
+        for row in Attachment.objects.filter(submission_id=submission.pk).order_by('id').values(
+            'id', *ATTACHMENT_FIELDS
+        )
+    }
+    return content
+
+
+def text_delta(old, new):
+    """Изменение строки: построчные правки или новое значение целиком, что короче.
+
+    Правка [начало, конец, строки] заменяет строки старого текста с начала
+    до конца на новые, так что исправленная опечатка в длинном описании
+    занимает одну строку, а не копию всего текста.
+    """
+    old_lines = old.splitlines(keepends=True)
+    new_lines = new.splitlines(keepends=True)
+    matcher = difflib.SequenceMatcher(None, old_lines, new_lines, autojunk=False)
+    ops = [
+        [i1, i2, new_lines[j1:j2]]
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes() if tag != 'equal'
+    ]
+    if payload_size(ops) < payload_size(new):
+        return {'ops': ops}
+    return {'set': new}
+
+
+def apply_text_delta(old, delta):
+    if 'set' in delta:
+        return delta['set']
+    lines = old.splitlines(keepends=True)
+    result, position = [], 0
+    for start, end, replacement in delta['ops']:
+        result += lines[position:start]
+        result += replacement
+        position = end
+    result += lines[position:]
+    return ''.join(result)
+
+
+def make_delta(old, new):
+    """Дельта от версии old к new; пустой словарь, если содержимое не изменилось"""
+    delta = {}
+    for field in VERSIONED_FIELDS:
+        if old[field] != new[field]:
+            delta[field] = text_delta(old[field], new[field])
+    added = {pk: row for pk, row in new['attachments'].items() if old['attachments'].get(pk) != row}
+    removed = sorted(pk for pk in old['attachments'] if pk not in new['attachments'])
+    if added or removed:
+        delta['attachments'] = {'add': added, 'remove': removed}
+    return delta
+
+
+def apply_delta(content, delta):
+    content = {**content, 'attachments': dict(content['attachments'])}
+    for field in VERSIONED_FIELDS:
+        if field in delta:
+            content[field] = apply_text_delta(content[field], delta[field])
+    if 'attachments' in delta:
+        for pk in delta['attachments']['remove']:
+            content['attachments'].pop(pk, None)
+        content['attachments'].update(delta['attachments']['add'])
+    return content
+
+
+def version_chain(submission_id, first=None, last=None):
+    """Версии сдачи от ближайшего снимка не позже first (по умолчанию - последнего) до last"""
+    snapshots = SubmissionVersion.objects.filter(submission_id=submission_id, snapshot__isnull=False)
+    if first is not None:
+        snapshots = snapshots.filter(number__lte=first)
+    chain = SubmissionVersion.objects.filter(
+        submission_id=submission_id,
+        number__gte=Subquery(snapshots.order_by('-number').values('number')[:1]),
+    )
+    if last is not None:
+        chain = chain.filter(number__lte=last)
+    return chain.order_by('number').only('number', 'snapshot', 'delta', 'size')
+
+
+def load_versions(submission_id, numbers):
+    """Содержимое версий {номер: содержимое}; несуществующих номеров в словаре нет.
+
+    Все версии восстанавливаются за один проход по одной цепочке: от снимка
+    перед младшей из них до старшей.
+    """
+    numbers = set(numbers)
+    if not numbers:
+        return {}
+    contents, content = {}, None
+    for version in version_chain(submission_id, min(numbers), max(numbers)):
+        content = version.snapshot if version.is_snapshot else apply_delta(content, version.delta)
+        if version.number in numbers:
+            contents[version.number] = content
+    return contents
+
+
+def record_version(submission, author_id=None):
+    """Записать текущее содержимое сдачи новой версией, если оно изменилось.
+
+    Обычно пишется только дельта от предыдущей версии. Полный снимок
+    пишется для первой версии и когда дельты от последнего снимка вместе
+    заняли бы больше самого снимка (как в revlog Mercurial): так история
+    растёт с размером изменений, а восстановление любой версии читает не
+    больше двух снимков данных. Возвращает новую версию или None.
+    """
+    with transaction.atomic():
+        # Параллельные записи версий одной сдачи выстраиваются в очередь
+        list(Submission.objects.select_for_update().filter(pk=submission.pk).values_list('pk', flat=True))
+        content = submission_content(submission)
+        chain = list(version_chain(submission.pk))
+
+        previous = None
+        for version in chain:
+            previous = version.snapshot if version.is_snapshot else apply_delta(previous, version.delta)
+
+        if previous is None:
+            return SubmissionVersion.objects.create(
+                submission_id=submission.pk, number=1, author_id=author_id,
+                snapshot=content, size=payload_size(content),
+            )
+
+        delta = make_delta(previous, content)
+        if not delta:
+            return None
+        version = SubmissionVersion(
+            submission_id=submission.pk, number=chain[-1].number + 1, author_id=author_id,
+            changed_fields=[field for field in (*VERSIONED_FIELDS, 'attachments') if field in delta],
+        )
+        delta_size = payload_size(delta)
+        snapshot_size = payload_size(content)
+        chain_size = sum(item.size for item in chain[1:]) + delta_size
+        if chain_size >= snapshot_size or len(chain) >= MAX_CHAIN_LENGTH:
+            version.snapshot, version.size = content, snapshot_size
+        else:
+            version.delta, version.size = delta, delta_size
+        version.save()
+        return version
+
+
+def ensure_history(submission):
+    """Первая версия для сдачи, созданной до появления истории.
+
+    Вызывается перед изменением, пока в submission ещё старое содержимое,
+    иначе исходный вариант такой сдачи потерялся бы.
+    """
+    if not SubmissionVersion.objects.filter(submission_id=submission.pk).exists():
+        record_version(submission)
+
+
+def attachment_list(attachments):
+    return [{'id': int(pk), **row} for pk, row in sorted(attachments.items(), key=lambda item: int(item[0]))]
+
+
+def version_data(number, content):
+    """Содержимое версии для ответа API"""
+    return {'number': number, **content, 'attachments': attachment_list(content['attachments'])}
+
+
+def diff_versions(old, new, old_label='old', new_label='new'):
+    """Различия двух версий: старое и новое значение каждого изменённого поля.
+
+    Для многострочных полей добавляется unified diff, для файлов - списки
+    добавленных и удалённых.
+    """
+    changes = {}
+    for field in VERSIONED_FIELDS:
+        if old[field] == new[field]:
+            continue
+        change = {'old': old[field], 'new': new[field]}
+        if field in MULTILINE_FIELDS:
+            change['unified'] = '\n'.join(difflib.unified_diff(
+                old[field].splitlines(), new[field].splitlines(), old_label, new_label, lineterm=''
+            ))
+        changes[field] = change
+
+    added = {pk: row for pk, row in new['attachments'].items() if old['attachments'].get(pk) != row}
+    removed = {pk: row for pk, row in old['attachments'].items() if new['attachments'].get(pk) != row}
+    if added or removed:
+        changes['attachments'] = {'added': attachment_list(added), 'removed': attachment_list(removed)}
+    return changes
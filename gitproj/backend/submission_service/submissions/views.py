@@ -1,31 +1,113 @@
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
+from rest_framework.generics import get_object_or_404
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.urls import reverse
 from django.utils import timezone
 
-from .models import Submission, Review, Attachment
+from .clients import ServiceUnavailable, get_project_client
+from .conditional import ConditionalGetMixin, parse_pk
+from .exports import export_format, export_parameters, export_response
+from .gradebook import get_gradebook, gradebook_state, invalidate_changed, invalidate_gradebooks
+from .models import Submission, Review, Attachment, Upload
+from .queue import claim_submissions, release_submission
 from .serializers import (
-    SubmissionSerializer, SubmissionCreateSerializer,
-    ReviewSerializer, AttachmentSerializer, GradeSubmissionSerializer
+    SubmissionSerializer, SubmissionCreateSerializer, SubmissionListSerializer,
+    ReviewSerializer, AttachmentSerializer, GradeSubmissionSerializer,
+    GradeBatchSerializer, GradeBatchItemSerializer, ClaimSerializer,
+    UploadSerializer, SubmissionVersionSerializer, requested_fields
 )
+from .pivot import PIVOT_CONTENT_TYPES, pivot_response
+from .similarity import DEFAULT_THRESHOLD, find_clusters, find_similar
+from .storage import get_storage
+from .uploads import (
+    ChecksumMismatch, append_chunk, blob_response, finalize_upload, hashers, reset_upload
+)
+from .versions import diff_versions, ensure_history, load_versions, record_version, version_data
+
+
+def related_count(model):
+    """Количество связанных строк коррелированным подзапросом.
+    
+    В отличие от JOIN + GROUP BY не мешает сортировке по индексу и LIMIT:
+    подзапрос выполняется только для строк текущей страницы.
+    """
+    counts = model.objects.filter(submission=OuterRef('pk')).order_by().values(
+        'submission'
+    ).annotate(count=Count('pk')).values('count')
+    return Coalesce(Subquery(counts), 0)
 
-class SubmissionViewSet(viewsets.ModelViewSet):
+
+list_fields_parameters = [
+    openapi.Parameter('include', openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                      description="Вложенные данные через запятую: reviews,attachments,project"),
+    openapi.Parameter('fields', openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                      description="Ограничить набор полей, например id,title,status,grade"),
+]
+
+class SubmissionViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     """ViewSet для управления сдачами работ"""
     
     queryset = Submission.objects.all()
     permission_classes = [IsAuthenticated]
+    keyset_field = 'submitted_at'
+    
+    # Действия, которые отдают краткое представление сдачи
+    summary_actions = ('list', 'my_submissions', 'claim')
+    # Действия, которые отдают сдачу вместе с отзывами и файлами
+    nested_actions = ('retrieve', 'update', 'partial_update')
     
     def get_serializer_class(self):
         if self.action == 'create':
             return SubmissionCreateSerializer
+        if self.action in self.summary_actions:
+            return SubmissionListSerializer
         return SubmissionSerializer
     
+    def get_serializer(self, *args, **kwargs):
+        """Для ?include=project подставляет проекты всей страницы одним запросом"""
+        if (args and kwargs.get('many') and self.action in self.summary_actions
+                and 'project' in requested_fields(self.request, 'include')):
+            kwargs['context'] = {**self.get_serializer_context(), 'projects': self.fetch_projects(args[0])}
+        return super().get_serializer(*args, **kwargs)
+    
+    def fetch_projects(self, submissions):
+        """Проекты сдач из project_service; пустой словарь, если сервис недоступен"""
+        submissions = list(submissions)
+        try:
+            return get_project_client().get_projects(
+                {submission.project_id for submission in submissions},
+                self.request.headers.get('Authorization')
+            )
+        except ServiceUnavailable:
+            return {}
+    
+    def with_related(self, queryset):
+        """Счётчики для списков или prefetch вложенных данных для детального вида"""
+        if self.action in self.summary_actions:
+            # Счётчики считаются в том же запросе, а не .count() на каждую строку
+            queryset = queryset.annotate(
+                reviews_count=related_count(Review),
+                attachments_count=related_count(Attachment),
+            )
+            include = requested_fields(self.request, 'include')
+            expand = [name for name in SubmissionListSerializer.EXPANDABLE_FIELDS if name in include]
+            if expand:
+                queryset = queryset.prefetch_related(*expand)
+        elif self.action in self.nested_actions:
+            queryset = queryset.prefetch_related('reviews', 'attachments')
+        return queryset
+    
     def get_queryset(self):
         """Фильтрация сдач"""
-        queryset = Submission.objects.all()
+        queryset = self.with_related(Submission.objects.all())
         
         # Фильтр по проекту
         project_id = self.request.query_params.get('project_id')
@@ -49,26 +131,85 @@ class SubmissionViewSet(viewsets.ModelViewSet):
         
         return queryset
     
+    def get_conditional_querysets(self):
+        """Валидатор сдачи учитывает вложенные отзывы и файлы"""
+        if self.action == 'retrieve':
+            pk = parse_pk(self.kwargs.get('pk'))
+            if pk is None:
+                return None
+            submissions = Submission.objects.filter(pk=pk)
+        elif self.action == 'my_submissions':
+            submissions = self.get_my_submissions()
+        else:
+            return None
+        return [
+            (submissions, 'updated_at'),
+            (Review.objects.filter(submission__in=submissions.values('pk')), 'updated_at'),
+            (Attachment.objects.filter(submission__in=submissions.values('pk')), 'uploaded_at'),
+        ]
+    
+    def perform_create(self, serializer):
+        with transaction.atomic():
+            super().perform_create(serializer)
+            record_version(serializer.instance, self.request.user.id)
+        invalidate_changed(None, gradebook_state(serializer.instance))
+    
+    def perform_update(self, serializer):
+        before = gradebook_state(serializer.instance)
+        with transaction.atomic():
+            ensure_history(serializer.instance)
+            super().perform_update(serializer)
+            record_version(serializer.instance, self.request.user.id)
+        invalidate_changed(before, gradebook_state(serializer.instance))
+    
+    def perform_destroy(self, instance):
+        before = gradebook_state(instance)
+        super().perform_destroy(instance)
+        invalidate_changed(before, None)
+    
+    def get_my_submissions(self):
+        """Сдачи текущего пользователя как студента или как преподавателя (?role=)"""
+        user_id = self.request.user.id if hasattr(self.request.user, 'id') else None
+        role = self.request.query_params.get('role', 'student')
+        
+        if role == 'teacher':
+            return Submission.objects.filter(teacher_id=user_id)
+        return Submission.objects.filter(student_id=user_id)
+    
+    @swagger_auto_schema(manual_parameters=list_fields_parameters)
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+    
     @swagger_auto_schema(
         operation_description="Получить мои сдачи",
         manual_parameters=[
             openapi.Parameter('role', openapi.IN_QUERY, type=openapi.TYPE_STRING, 
                             description="student или teacher")
-        ]
+        ] + list_fields_parameters
     )
     @action(detail=False, methods=['get'])
     def my_submissions(self, request):
         """Получить сдачи текущего пользователя"""
-        user_id = request.user.id if hasattr(request.user, 'id') else None
-        role = request.query_params.get('role', 'student')
-        
-        if role == 'teacher':
-            submissions = Submission.objects.filter(teacher_id=user_id)
-        else:
-            submissions = Submission.objects.filter(student_id=user_id)
+        submissions = self.with_related(self.get_my_submissions())
+        return self.conditional_response(
+            request, lambda: Response(self.get_serializer(submissions, many=True).data)
+        )
+    
+    @swagger_auto_schema(
+        operation_description="Потоковая выгрузка сдач в NDJSON или CSV с фильтрами списка",
+        manual_parameters=export_parameters
+    )
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """Выгрузка всех сдач без пагинации, например для ведомости за семестр"""
+        output = export_format(request)
+        if output is None:
+            return Response({"detail": "output must be ndjson or csv"}, status=status.HTTP_400_BAD_REQUEST)
         
-        serializer = self.get_serializer(submissions, many=True)
-        return Response(serializer.data)
+        fields = ['id', 'project_id', 'student_id', 'teacher_id', 'title', 'description',
+                  'status', 'grade', 'max_grade', 'repository_url', 'demo_url',
+                  'documentation_url', 'submitted_at', 'reviewed_at', 'updated_at']
+        return export_response(self.get_queryset().order_by('id'), fields, output, 'submissions')
     
     @swagger_auto_schema(
         operation_description="Оценить работу",
@@ -80,11 +221,22 @@ class SubmissionViewSet(viewsets.ModelViewSet):
         submission = self.get_object()
         serializer = GradeSubmissionSerializer(data=request.data)
         
+        if submission.is_claimed_by_other(request.user.id, timezone.now()):
+            return Response(
+                {"detail": "Submission is claimed by another reviewer"},
+                status=status.HTTP_409_CONFLICT
+            )
+        
         if serializer.is_valid():
+            before = gradebook_state(submission)
             submission.grade = serializer.validated_data['grade']
             submission.status = serializer.validated_data['status']
             submission.reviewed_at = timezone.now()
+            # Оценённая работа выходит из очереди проверки
+            submission.claimed_by = None
+            submission.claim_expires_at = None
             submission.save()
+            invalidate_changed(before, gradebook_state(submission))
             
             # Создаем отзыв если есть комментарий
             comment = serializer.validated_data.get('comment')
@@ -99,6 +251,277 @@ class SubmissionViewSet(viewsets.ModelViewSet):
             return Response(SubmissionSerializer(submission).data)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
+    @swagger_auto_schema(
+        operation_description="Оценить несколько работ одним запросом",
+        request_body=GradeBatchSerializer
+    )
+    @action(detail=False, methods=['post'])
+    def grade_batch(self, request):
+        """Пакетное оценивание.
+        
+        Пакет проверяется целиком (в том числе grade <= max_grade): при любой
+        ошибке ничего не пишется, а ошибки стоят на позициях элементов. Сдачи
+        проверяются и записываются в одной транзакции под блокировкой строк.
+        Оценки записываются одним bulk_update, отзывы - одним bulk_create.
+        """
+        batch = GradeBatchSerializer(data=request.data)
+        batch.is_valid(raise_exception=True)
+        items = batch.validated_data['grades']
+        
+        # Сначала каждый элемент проходит свой сериализатор: submission_id
+        # приводится IntegerField, так что "12" и 12 - одна и та же сдача
+        checked = []
+        for item in items:
+            serializer = GradeBatchItemSerializer(data=item)
+            if serializer.is_valid():
+                checked.append((serializer.validated_data, None))
+            else:
+                checked.append((None, serializer.errors))
+        with transaction.atomic():
+            # Строки блокируются до записи (по порядку id, чтобы встречные пакеты
+            # не ждали друг друга): бронь, взятая после проверки, не перезапишется
+            submissions = {
+                submission.pk: submission
+                for submission in Submission.objects.select_for_update().only(
+                    'id', 'project_id', 'teacher_id', 'grade', 'max_grade', 'status',
+                    'claimed_by', 'claim_expires_at'
+                ).filter(pk__in=[data['submission_id'] for data, _ in checked if data is not None]).order_by('pk')
+            }
+            
+            now = timezone.now()
+            errors, graded, seen = [], [], set()
+            for data, item_errors in checked:
+                if item_errors is not None:
+                    errors.append(item_errors)
+                    continue
+                submission = submissions.get(data['submission_id'])
+                if submission is None:
+                    errors.append({'submission_id': [f'Submission {data["submission_id"]} not found']})
+                elif submission.pk in seen:
+                    errors.append({'submission_id': ['Duplicate submission in batch']})
+                elif data['grade'] > submission.max_grade:
+                    errors.append({'grade': [f'Grade must not exceed max_grade ({submission.max_grade})']})
+                elif submission.is_claimed_by_other(request.user.id, now):
+                    errors.append({'submission_id': ['Submission is claimed by another reviewer']})
+                else:
+                    errors.append({})
+                    graded.append((submission, data))
+                seen.add(data['submission_id'])
+            
+            if any(errors):
+                return Response({'grades': errors}, status=status.HTTP_400_BAD_REQUEST)
+            
+            reviews, states = [], []
+            for submission, data in graded:
+                states.append(gradebook_state(submission))
+                submission.grade = data['grade']
+                submission.status = data['status']
+                submission.reviewed_at = now
+                submission.claimed_by = None
+                submission.claim_expires_at = None
+                # bulk_update не трогает auto_now, поэтому выставляем updated_at сами
+                submission.updated_at = now
+                if data.get('comment'):
+                    reviews.append(Review(
+                        submission=submission,
+                        reviewer_id=request.user.id,
+                        comment=data['comment'],
+                        rating=data['grade']
+                    ))
+            
+            Submission.objects.bulk_update(
+                [submission for submission, _ in graded],
+                ['grade', 'status', 'reviewed_at', 'claimed_by', 'claim_expires_at', 'updated_at']
+            )
+            Review.objects.bulk_create(reviews)
+            invalidate_gradebooks(
+                (submission.project_id, submission.teacher_id)
+                for before, (submission, _) in zip(states, graded)
+                if before != gradebook_state(submission)
+            )
+        
+        review_ids = {review.submission_id: review.id for review in reviews}
+        return Response({
+            'graded': len(graded),
+            'reviewed_at': now,
+            'results': [
+                {
+                    'submission_id': submission.pk,
+                    'grade': submission.grade,
+                    'max_grade': submission.max_grade,
+                    'status': submission.status,
+                    'review_id': review_ids.get(submission.pk),
+                }
+                for submission, _ in graded
+            ],
+        })
+    
+    @swagger_auto_schema(
+        operation_description="Взять следующие работы из очереди проверки",
+        request_body=ClaimSerializer
+    )
+    @action(detail=False, methods=['post'])
+    def claim(self, request):
+        """Забрать до count ожидающих работ (старые первыми) и перевести их в reviewing.
+        
+        Бронь действует SUBMISSION_CLAIM_LEASE_SECONDS; не оценённые за это
+        время работы снова попадают в очередь. Пустой список означает, что
+        свободных работ нет.
+        """
+        serializer = ClaimSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids, expires_at = claim_submissions(
+            request.user.id,
+            serializer.validated_data['count'],
+            serializer.validated_data.get('project_id'),
+        )
+        
+        submissions = self.with_related(Submission.objects.filter(id__in=ids)).order_by('submitted_at', 'id')
+        return Response({
+            'claim_expires_at': expires_at,
+            'results': self.get_serializer(submissions, many=True).data,
+        })
+    
+    @swagger_auto_schema(
+        operation_description="Вернуть взятую работу в очередь"
+    )
+    @action(detail=True, methods=['post'])
+    def release(self, request, pk=None):
+        """Снять свою бронь с работы"""
+        submission_id = parse_pk(pk)
+        if submission_id is None or not release_submission(submission_id, request.user.id):
+            return Response(
+                {"detail": "Submission is not claimed by you"},
+                status=status.HTTP_409_CONFLICT
+            )
+        return Response(status=status.HTTP_204_NO_CONTENT)
+    
+    @swagger_auto_schema(
+        operation_description="Статистика оценок по проекту: среднее, медиана, перцентили, гистограмма"
+    )
+    @action(detail=False, methods=['get'], url_path=r'gradebook/projects/(?P<project_id>[0-9]+)')
+    def gradebook_project(self, request, project_id=None):
+        """Статистика оценок сдач проекта (в процентах от max_grade)"""
+        data = get_gradebook('project', int(project_id), Submission.objects.filter(project_id=project_id))
+        return Response({'project_id': int(project_id), **data})
+    
+    @swagger_auto_schema(
+        operation_description="Статистика оценок по преподавателю: среднее, медиана, перцентили, гистограмма"
+    )
+    @action(detail=False, methods=['get'], url_path=r'gradebook/teachers/(?P<teacher_id>[0-9]+)')
+    def gradebook_teacher(self, request, teacher_id=None):
+        """Статистика оценок сдач, закреплённых за преподавателем"""
+        data = get_gradebook('teacher', int(teacher_id), Submission.objects.filter(teacher_id=teacher_id))
+        return Response({'teacher_id': int(teacher_id), **data})
+    
+    @swagger_auto_schema(
+        operation_description="Сводная ведомость студенты x проекты: последняя оценка, процент и статус",
+        manual_parameters=[
+            openapi.Parameter('output', openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                              description="Формат: csv (по умолчанию) или xlsx"),
+            openapi.Parameter('teacher_id', openapi.IN_QUERY, type=openapi.TYPE_INTEGER),
+            openapi.Parameter('project_ids', openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                              description="ID проектов через запятую"),
+        ]
+    )
+    @action(detail=False, methods=['get'], url_path='gradebook/export')
+    def gradebook_export(self, request):
+        """Выгрузка ведомости за семестр.
+        
+        Колонки - проекты из выборки, строки - студенты; для каждой пары
+        берётся последняя сдача. Названия проектов подставляются из
+        project_service, если он доступен.
+        """
+        output = request.query_params.get('output', 'csv')
+        if output not in PIVOT_CONTENT_TYPES:
+            return Response({"detail": "output must be csv or xlsx"}, status=status.HTTP_400_BAD_REQUEST)
+        
+        queryset = Submission.objects.all()
+        teacher_id = request.query_params.get('teacher_id')
+        if teacher_id:
+            queryset = queryset.filter(teacher_id=teacher_id)
+        project_ids = request.query_params.get('project_ids')
+        if project_ids:
+            queryset = queryset.filter(
+                project_id__in=[int(pk) for pk in project_ids.split(',') if pk.strip().isdigit()]
+            )
+        
+        columns = list(queryset.order_by('project_id').values_list('project_id', flat=True).distinct())
+        try:
+            projects = get_project_client().get_projects(columns, request.headers.get('Authorization'))
+        except ServiceUnavailable:
+            projects = {}
+        labels = {pk: f"{project['title']} (#{pk})" for pk, project in projects.items()}
+        return pivot_response(queryset, columns, labels, output, 'gradebook')
+    
+    def similarity_threshold(self, request):
+        """Порог похожести из ?threshold= (0..1) или None, если он некорректен"""
+        try:
+            threshold = float(request.query_params.get('threshold', DEFAULT_THRESHOLD))
+        except ValueError:
+            return None
+        return threshold if 0 < threshold <= 1 else None
+    
+    @swagger_auto_schema(
+        operation_description="Почти дубликаты сдачи по MinHash/LSH",
+        manual_parameters=[
+            openapi.Parameter('threshold', openapi.IN_QUERY, type=openapi.TYPE_NUMBER,
+                              description=f"Минимальная похожесть 0..1, по умолчанию {DEFAULT_THRESHOLD}"),
+            openapi.Parameter('scope', openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                              description="project (по умолчанию) - только тот же проект, all - все сдачи"),
+        ]
+    )
+    @action(detail=True, methods=['get'])
+    def similar(self, request, pk=None):
+        """Сдачи с похожим текстом: оценка коэффициента Жаккара по словесным триграммам"""
+        submission = self.get_object()
+        threshold = self.similarity_threshold(request)
+        if threshold is None:
+            return Response({"detail": "threshold must be a number in (0, 1]"}, status=status.HTTP_400_BAD_REQUEST)
+        scope = request.query_params.get('scope', 'project')
+        
+        matches = find_similar(
+            submission.pk, threshold, project_id=submission.project_id if scope != 'all' else None
+        ) or []
+        rows = Submission.objects.only('id', 'project_id', 'student_id', 'title').in_bulk(
+            [pk for pk, _ in matches]
+        )
+        return Response({
+            'submission_id': submission.pk,
+            'threshold': threshold,
+            'results': [
+                {
+                    'submission_id': pk,
+                    'project_id': rows[pk].project_id,
+                    'student_id': rows[pk].student_id,
+                    'title': rows[pk].title,
+                    'similarity': round(similarity, 3),
+                }
+                for pk, similarity in matches if pk in rows
+            ],
+        })
+    
+    @swagger_auto_schema(
+        operation_description="Группы почти одинаковых сдач проекта",
+        manual_parameters=[
+            openapi.Parameter('threshold', openapi.IN_QUERY, type=openapi.TYPE_NUMBER,
+                              description=f"Минимальная похожесть 0..1, по умолчанию {DEFAULT_THRESHOLD}"),
+        ]
+    )
+    @action(detail=False, methods=['get'], url_path=r'similarity/projects/(?P<project_id>[0-9]+)')
+    def similarity_clusters(self, request, project_id=None):
+        """Кластеры похожих сдач по всему проекту"""
+        threshold = self.similarity_threshold(request)
+        if threshold is None:
+            return Response({"detail": "threshold must be a number in (0, 1]"}, status=status.HTTP_400_BAD_REQUEST)
+        clusters = find_clusters(int(project_id), threshold)
+        students = dict(Submission.objects.filter(
+            id__in=[pk for cluster in clusters for pk in cluster['submission_ids']]
+        ).values_list('id', 'student_id'))
+        for cluster in clusters:
+            cluster['student_ids'] = sorted({students[pk] for pk in cluster['submission_ids'] if pk in students})
+        return Response({'project_id': int(project_id), 'threshold': threshold, 'clusters': clusters})
+    
     @swagger_auto_schema(
         operation_description="Добавить прикрепленный файл",
         request_body=AttachmentSerializer
@@ -110,9 +533,62 @@ class SubmissionViewSet(viewsets.ModelViewSet):
         serializer = AttachmentSerializer(data=request.data)
         
         if serializer.is_valid():
-            serializer.save(submission=submission)
+            with transaction.atomic():
+                ensure_history(submission)
+                serializer.save(submission=submission)
+                record_version(submission, request.user.id)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    
+    @swagger_auto_schema(
+        operation_description="История версий сдачи: текст, ссылки и набор файлов",
+        responses={200: SubmissionVersionSerializer(many=True)}
+    )
+    @action(detail=True, methods=['get'])
+    def versions(self, request, pk=None):
+        """Список версий без содержимого; текущая версия - последняя"""
+        submission = self.get_object()
+        versions = submission.versions.defer('snapshot', 'delta').order_by('number')
+        return Response(SubmissionVersionSerializer(versions, many=True).data)
+    
+    @swagger_auto_schema(operation_description="Содержимое версии сдачи")
+    @action(detail=True, methods=['get'], url_path=r'versions/(?P<number>[0-9]+)')
+    def version(self, request, pk=None, number=None):
+        """Содержимое версии, восстановленное по цепочке дельт"""
+        submission = self.get_object()
+        content = load_versions(submission.pk, [int(number)]).get(int(number))
+        if content is None:
+            return Response({"detail": "Version not found"}, status=status.HTTP_404_NOT_FOUND)
+        return Response(version_data(int(number), content))
+    
+    @swagger_auto_schema(
+        operation_description="Различия двух версий сдачи",
+        manual_parameters=[
+            openapi.Parameter('from', openapi.IN_QUERY, type=openapi.TYPE_INTEGER,
+                              description="Номер старой версии, по умолчанию предыдущая перед to"),
+            openapi.Parameter('to', openapi.IN_QUERY, type=openapi.TYPE_INTEGER,
+                              description="Номер новой версии, по умолчанию последняя"),
+        ]
+    )
+    @action(detail=True, methods=['get'])
+    def diff(self, request, pk=None):
+        """Какие поля и файлы изменились между версиями from и to"""
+        submission = self.get_object()
+        try:
+            to_number = int(request.query_params.get('to') or (
+                submission.versions.order_by('-number').values_list('number', flat=True).first() or 0
+            ))
+            from_number = int(request.query_params.get('from') or to_number - 1)
+        except ValueError:
+            return Response({"detail": "from and to must be version numbers"}, status=status.HTTP_400_BAD_REQUEST)
+        
+        contents = load_versions(submission.pk, [from_number, to_number])
+        if from_number not in contents or to_number not in contents:
+            return Response({"detail": "Version not found"}, status=status.HTTP_404_NOT_FOUND)
+        changes = diff_versions(
+            contents[from_number], contents[to_number], f'v{from_number}', f'v{to_number}'
+        )
+        return Response({'from': from_number, 'to': to_number, 'changes': changes})
 
 
 class ReviewViewSet(viewsets.ModelViewSet):
@@ -132,3 +608,133 @@ class ReviewViewSet(viewsets.ModelViewSet):
             queryset = queryset.filter(submission_id=submission_id)
         
         return queryset
+
+
+class UploadViewSet(viewsets.GenericViewSet):
+    """Возобновляемая загрузка файлов к сдаче по частям.
+    
+    POST /uploads/ создаёт сессию с именем и размером файла, PATCH
+    /uploads/{id}/ с заголовком Upload-Offset дописывает тело запроса,
+    GET /uploads/{id}/ возвращает, сколько байт уже принято, - с этого
+    места клиент продолжает после обрыва. После последней части файл
+    попадает в хранилище по SHA-256 и к сдаче прикрепляется Attachment.
+    """
+    
+    serializer_class = UploadSerializer
+    permission_classes = [IsAuthenticated]
+    
+    def get_queryset(self):
+        """Пользователь видит только свои загрузки"""
+        return Upload.objects.filter(user_id=self.request.user.id).select_related('attachment')
+    
+    def offset_response(self, upload, status_code=status.HTTP_200_OK):
+        return Response(
+            UploadSerializer(upload).data, status=status_code,
+            headers={'Upload-Offset': str(upload.offset)}
+        )
+    
+    @swagger_auto_schema(operation_description="Начать загрузку файла")
+    def create(self, request):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        upload = serializer.save(user_id=request.user.id)
+        return self.offset_response(upload, status.HTTP_201_CREATED)
+    
+    @swagger_auto_schema(operation_description="Сколько байт загрузки уже принято")
+    def retrieve(self, request, pk=None):
+        return self.offset_response(self.get_object())
+    
+    @swagger_auto_schema(
+        operation_description="Дописать часть файла. Тело - сырые байты, "
+                              "Upload-Offset - позиция части, равная текущему offset",
+        manual_parameters=[
+            openapi.Parameter('Upload-Offset', openapi.IN_HEADER, type=openapi.TYPE_INTEGER, required=True)
+        ]
+    )
+    def partial_update(self, request, pk=None):
+        """Принять часть файла.
+        
+        Тело не разбирается парсерами DRF и не читается в память целиком:
+        оно потоком пишется в часть на диске. Строка загрузки блокируется на
+        время записи, поэтому параллельные запросы к одной загрузке идут по
+        очереди, а запрос со старым offset получает 409.
+        """
+        try:
+            offset = int(request.headers['Upload-Offset'])
+        except (KeyError, ValueError):
+            return Response({"detail": "Upload-Offset header is required"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            length = int(request.META.get('CONTENT_LENGTH') or 0)
+        except ValueError:
+            length = 0
+        if length > settings.UPLOAD_CHUNK_MAX_SIZE:
+            return Response(
+                {"detail": f"Chunk must not exceed {settings.UPLOAD_CHUNK_MAX_SIZE} bytes"},
+                status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+            )
+        
+        storage = get_storage()
+        with transaction.atomic():
+            upload = get_object_or_404(self.get_queryset().select_for_update(of=('self',)), pk=pk)
+            if upload.is_complete:
+                return Response({"detail": "Upload is already complete"}, status=status.HTTP_409_CONFLICT)
+            if offset != upload.offset:
+                return Response(
+                    {"detail": f"Upload-Offset must be {upload.offset}"},
+                    status=status.HTTP_409_CONFLICT, headers={'Upload-Offset': str(upload.offset)}
+                )
+            if offset + length > upload.size:
+                return Response({"detail": "Chunk exceeds declared upload size"}, status=status.HTTP_400_BAD_REQUEST)
+            if length == 0:
+                return self.offset_response(upload)
+            
+            hasher = append_chunk(upload, request.stream, length, storage)
+            if upload.offset == upload.size:
+                ensure_history(upload.submission)
+                try:
+                    finalize_upload(upload, hasher, storage, lambda attachment: request.build_absolute_uri(
+                        reverse('attachment-download', args=[attachment.pk])
+                    ))
+                except ChecksumMismatch as exc:
+                    reset_upload(upload, storage)
+                    upload.save(update_fields=['offset', 'generation', 'updated_at'])
+                    return Response(
+                        {"detail": f"Checksum mismatch: received {exc.args[0]}, upload restarted"},
+                        status=status.HTTP_400_BAD_REQUEST, headers={'Upload-Offset': '0'}
+                    )
+                record_version(upload.submission, request.user.id)
+            upload.save(update_fields=['offset', 'attachment', 'updated_at'])
+        
+        return self.offset_response(upload)
+    
+    @swagger_auto_schema(operation_description="Отменить незавершённую загрузку")
+    def destroy(self, request, pk=None):
+        upload = self.get_object()
+        if upload.is_complete:
+            return Response({"detail": "Upload is already complete"}, status=status.HTTP_409_CONFLICT)
+        upload_id = upload.pk
+        upload.delete()
+        get_storage().delete_part(upload_id)
+        hashers.discard(upload_id)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class AttachmentViewSet(viewsets.GenericViewSet):
+    """Скачивание файлов, загруженных через /uploads/"""
+    
+    queryset = Attachment.objects.select_related('blob')
+    permission_classes = [IsAuthenticated]
+    
+    @swagger_auto_schema(
+        operation_description="Скачать файл; поддерживаются Range и If-Range для докачки",
+        manual_parameters=[
+            openapi.Parameter('Range', openapi.IN_HEADER, type=openapi.TYPE_STRING,
+                              description="Например bytes=0-1048575")
+        ]
+    )
+    @action(detail=True, methods=['get'])
+    def download(self, request, pk=None):
+        attachment = self.get_object()
+        if attachment.blob is None:
+            return Response({"detail": "Attachment is an external link"}, status=status.HTTP_404_NOT_FOUND)
+        return blob_response(request, attachment, get_storage())
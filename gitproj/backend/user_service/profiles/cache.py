@@ -0,0 +1,233 @@
+import itertools
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+# Значение в кэше для пользователя без профиля: /me/ без профиля тоже не ходит в БД
+MISSING = False
+
+
+class LRUBackend:
+    """Кэш в памяти процесса: не больше maxsize записей, каждая живёт timeout секунд.
+
+    Сброс записи виден только в своём процессе, поэтому при нескольких
+    воркерах чужие изменения появляются не позже чем через timeout; если
+    это много, нужен SharedCacheBackend.
+
+    Поколение - номер чтения из общего счётчика. bump запоминает номер
+    сброса ключа, и запись, чтение которой началось раньше, не сохраняется.
+    Номера сбросов хранятся timeout секунд; запись, которую собирали
+    дольше, тоже не сохраняется.
+    """
+
+    def __init__(self, maxsize, timeout, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.timeout = timeout
+        self.clock = clock
+        self.items = OrderedDict()
+        self.bumps = OrderedDict()
+        # Наибольший номер забытого сброса
+        self.forgotten = 0
+        self.counter = itertools.count(1)
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_settings(cls):
+        return cls(settings.PROFILE_CACHE_SIZE, settings.PROFILE_CACHE_TIMEOUT)
+
+    def generation(self, key):
+        with self.lock:
+            return next(self.counter)
+
+    def get(self, key, generation):
+        # Поколение не проверяется: bump сразу удаляет запись
+        with self.lock:
+            item = self.items.get(key)
+            if item is None:
+                return None
+            value, expires_at = item
+            if expires_at <= self.clock():
+                del self.items[key]
+                return None
+            self.items.move_to_end(key)
+            return value
+
+    def set(self, key, value, generation):
+        """Сохранить запись, если с чтения generation ключ не сбрасывали"""
+        with self.lock:
+            if generation < self.forgotten or self.bumps.get(key, (0, 0))[0] > generation:
+                return
+            self.items[key] = (value, self.clock() + self.timeout)
+            self.items.move_to_end(key)
+            while len(self.items) > self.maxsize:
+                self.items.popitem(last=False)
+
+    def bump(self, key):
+        with self.lock:
+            now = self.clock()
+            self.items.pop(key, None)
+            self.bumps[key] = (next(self.counter), now)
+            self.bumps.move_to_end(key)
+            while self.bumps:
+                number, bumped_at = next(iter(self.bumps.values()))
+                if bumped_at > now - self.timeout:
+                    break
+                self.bumps.popitem(last=False)
+                self.forgotten = number
+
+    def clear(self):
+        with self.lock:
+            self.items.clear()
+
+    def __len__(self):
+        return len(self.items)
+
+
+class SharedCacheBackend:
+    """Кэш Django из CACHES[alias], общий для всех процессов (Redis, Memcached).
+
+    Ключ записи включает поколение, которое bump увеличивает при каждом
+    изменении профиля (как у статистики в submission_service). Запись,
+    собранная параллельно с изменением, попадает под старое поколение и
+    уже никогда не будет прочитана. В тестах вместо общего кэша
+    подставляется локальный LocMemCache под тем же alias. clear() очищает
+    весь alias, поэтому для профилей лучше отдельный.
+    """
+
+    def __init__(self, alias, timeout, prefix='profile'):
+        self.cache = caches[alias]
+        self.timeout = timeout
+        self.prefix = prefix
+
+    @classmethod
+    def from_settings(cls):
+        return cls(settings.PROFILE_CACHE_ALIAS, settings.PROFILE_CACHE_TIMEOUT)
+
+    def generation_key(self, key):
+        return f'{self.prefix}:generation:{key}'
+
+    def make_key(self, key, generation):
+        return f'{self.prefix}:{key}:{generation}'
+
+    def generation(self, key):
+        return self.cache.get_or_set(self.generation_key(key), time.time_ns, None)
+
+    def get(self, key, generation):
+        return self.cache.get(self.make_key(key, generation))
+
+    def set(self, key, value, generation):
+        self.cache.set(self.make_key(key, generation), value, self.timeout)
+
+    def bump(self, key):
+        try:
+            self.cache.incr(self.generation_key(key))
+        except ValueError:
+            # Поколения нет (ещё не читали или вытеснено) - начинаем с уникального значения
+            self.cache.set(self.generation_key(key), time.time_ns(), None)
+
+    def clear(self):
+        self.cache.clear()
+
+
+class ProfileCache:
+    """Read-through кэш сериализованных профилей по user_id со счётчиками.
+
+    Счётчики попаданий, промахов и суммарного времени ответа ведутся в
+    процессе и показываются через stats(): по доле попаданий и по разнице
+    времени попадания и промаха подбирается размер кэша.
+    """
+
+    COUNTERS = ('hits', 'misses', 'invalidations', 'hit_seconds', 'miss_seconds')
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.lock = threading.Lock()
+        self.reset_stats()
+
+    def reset_stats(self):
+        with self.lock:
+            self.counters = dict.fromkeys(self.COUNTERS, 0)
+
+    def count(self, **increments):
+        with self.lock:
+            for name, value in increments.items():
+                self.counters[name] += value
+
+    def get(self, user_id, build):
+        """Запись из кэша или build(), сохранённый в кэш; None, если профиля нет.
+
+        Поколение читается до build(): если профиль изменился, пока build()
+        читал БД, запись не сохранится под новым поколением.
+        """
+        started = time.perf_counter()
+        generation = self.backend.generation(user_id)
+        value = self.backend.get(user_id, generation)
+        if value is not None:
+            self.count(hits=1, hit_seconds=time.perf_counter() - started)
+            return None if value is MISSING else value
+
+        value = build()
+        self.backend.set(user_id, MISSING if value is None else value, generation)
+        self.count(misses=1, miss_seconds=time.perf_counter() - started)
+        return value
+
+    def invalidate(self, user_id):
+        """Сменить поколение записи сейчас и ещё раз после коммита.
+
+        Второй сброс нужен для запроса, который прочитал поколение после
+        первого, а профиль из БД - до коммита изменения: собранная им запись
+        останется под устаревшим поколением.
+        """
+        self.backend.bump(user_id)
+        transaction.on_commit(lambda: self.backend.bump(user_id))
+        self.count(invalidations=1)
+
+    def stats(self):
+        with self.lock:
+            counters = dict(self.counters)
+        lookups = counters['hits'] + counters['misses']
+
+        def average_ms(seconds, count):
+            return round(seconds / count * 1000, 3) if count else None
+
+        stats = {
+            'backend': f'{type(self.backend).__module__}.{type(self.backend).__name__}',
+            'hits': counters['hits'],
+            'misses': counters['misses'],
+            'invalidations': counters['invalidations'],
+            'hit_rate': round(counters['hits'] / lookups, 4) if lookups else None,
+            'avg_hit_ms': average_ms(counters['hit_seconds'], counters['hits']),
+            'avg_miss_ms': average_ms(counters['miss_seconds'], counters['misses']),
+            'timeout': self.backend.timeout,
+        }
+        if isinstance(self.backend, LRUBackend):
+            stats.update(size=len(self.backend), maxsize=self.backend.maxsize)
+        return stats
+
+
+_profile_cache = None
+_profile_cache_config = None
+_profile_cache_lock = threading.Lock()
+
+
+def get_profile_cache():
+    """Общий на процесс кэш; пересоздаётся, если изменились настройки PROFILE_CACHE_*"""
+    global _profile_cache, _profile_cache_config
+    config = (
+        settings.PROFILE_CACHE_BACKEND, settings.PROFILE_CACHE_SIZE,
+        settings.PROFILE_CACHE_TIMEOUT, settings.PROFILE_CACHE_ALIAS,
+    )
+    with _profile_cache_lock:
+        if _profile_cache is None or _profile_cache_config != config:
+            _profile_cache = ProfileCache(import_string(settings.PROFILE_CACHE_BACKEND).from_settings())
+            _profile_cache_config = config
+        return _profile_cache
+
+
+def invalidate_profile(user_id):
+    get_profile_cache().invalidate(user_id)
@@ -0,0 +1,28 @@
+import requests
+from django.conf import settings
+
+
+class ServiceUnavailable(Exception):
+    """Сервис не ответил вовремя, вернул 5xx или не JSON"""
+
+
+def create_team_projects(template_id, teams, authorization=None):
+    """Создать проекты команд по шаблону в project_service.
+
+    Вызывает POST /api/projects/{template_id}/instantiate/, который пишет все
+    проекты, задачи и участников одной транзакцией. teams - список
+    {'title', 'owner_id', 'members'}. Возвращает (HTTP-статус, JSON):
+    4xx (нет шаблона, нет прав) передаются вызывающему как есть.
+    """
+    url = f"{settings.PROJECT_SERVICE_URL.rstrip('/')}/api/projects/{template_id}/instantiate/"
+    headers = {'Authorization': authorization} if authorization else {}
+    try:
+        response = requests.post(
+            url, json={'teams': teams}, headers=headers,
+            timeout=(settings.SERVICE_CONNECT_TIMEOUT, settings.SERVICE_READ_TIMEOUT)
+        )
+        if response.status_code >= 500:
+            raise ServiceUnavailable(f'{url}: HTTP {response.status_code}')
+        return response.status_code, response.json()
+    except (requests.RequestException, ValueError) as exc:
+        raise ServiceUnavailable(f'{url}: {exc}') from exc
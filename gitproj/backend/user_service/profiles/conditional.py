@@ -0,0 +1,77 @@
+import hashlib
+import json
+from datetime import datetime
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+
+def queryset_validator(queryset, field='updated_at'):
+    """Количество строк и max(field) одним агрегатным запросом"""
+    result = queryset.order_by().aggregate(count=Count('pk'), last_modified=Max(field))
+    return result['count'], result['last_modified']
+
+
+def payload_etag(data):
+    """ETag по содержимому ответа: для данных, которые уже есть в памяти или в кэше"""
+    payload = json.dumps(data, sort_keys=True, cls=DjangoJSONEncoder)
+    return quote_etag(hashlib.md5(payload.encode()).hexdigest())
+
+
+def parse_pk(value):
+    """id из URL или None, если это не число"""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class ConditionalGetMixin:
+    """Поддержка ETag/Last-Modified и ответа 304 для GET-эндпоинтов.
+
+    Валидатор строится из количества строк и max(updated_at) по querysets из
+    get_conditional_querysets(), поэтому тело ответа не сериализуется и не
+    хэшируется, пока клиент не получит 304.
+    """
+
+    def get_conditional_querysets(self):
+        """Список (queryset, поле) для текущего действия или None.
+        
+        Обычно поле - дата изменения; Last-Modified берётся из полей-дат.
+        """
+        return None
+
+    def conditional_response(self, request, build_response):
+        querysets = self.get_conditional_querysets()
+        if querysets is None:
+            return build_response()
+
+        parts = [queryset_validator(queryset, field) for queryset, field in querysets]
+        last_modified = max(
+            (value for _, value in parts if isinstance(value, datetime)), default=None
+        )
+        timestamp = int(last_modified.timestamp()) if last_modified else None
+        # Путь с параметрами входит в ETag: ?include=/?fields= меняют представление
+        digest = hashlib.md5(repr((request.get_full_path(), parts)).encode()).hexdigest()
+        return self.validated_response(request, quote_etag(digest), timestamp, build_response)
+
+    def validated_response(self, request, etag, timestamp, build_response):
+        """304, если ETag или Last-Modified клиента совпали, иначе build_response() с валидаторами"""
+        response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+        if response is None:
+            response = build_response()
+
+        if response.status_code in (200, 304):
+            response['ETag'] = etag
+            if timestamp is not None:
+                response['Last-Modified'] = http_date(timestamp)
+            patch_vary_headers(response, ['Authorization'])
+        return response
+
+    def retrieve(self, request, *args, **kwargs):
+        parent = super()
+        return self.conditional_response(
+            request, lambda: parent.retrieve(request, *args, **kwargs)
+        )
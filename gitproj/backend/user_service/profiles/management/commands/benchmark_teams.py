@@ -0,0 +1,74 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from profiles.skills import LEVEL_WEIGHTS
+from profiles.teams import TeamFormation
+
+
+def synthetic_cohort(size, skills, rng, probability=0.4):
+    """Когорта {user_id: {навык: вес}}: навык есть с вероятностью probability, высокие уровни реже"""
+    weights = sorted(LEVEL_WEIGHTS.values())
+    frequencies = list(reversed(weights))
+    return {
+        user_id: {
+            name: rng.choices(weights, frequencies)[0]
+            for name in skills if rng.random() < probability
+        }
+        for user_id in range(1, size + 1)
+    }
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает качество разбиения на команды (покрытие навыков и разброс) и время работы: '
+            'случайное разбиение, жадное и жадное с локальным поиском на синтетических когортах')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[100, 300, 600],
+                            help='Размеры когорт')
+        parser.add_argument('--team-size', type=int, default=5)
+        parser.add_argument('--skills', type=int, default=5, help='Сколько навыков требуется каждой команде')
+        parser.add_argument('--level', choices=list(LEVEL_WEIGHTS), default='intermediate',
+                            help='Минимальный уровень требуемых навыков')
+        parser.add_argument('--time-limits', type=float, nargs='+', default=[0.1, 0.5, 2.0],
+                            help='Лимиты локального поиска, секунды')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def run(self, strategy, students, requirements, options, time_limit=None):
+        started = time.monotonic()
+        formation = TeamFormation(students, requirements, options['team_size'], options['seed'])
+        optimal = ''
+        if strategy == 'random':
+            order = list(range(len(formation.user_ids)))
+            random.Random(options['seed']).shuffle(order)
+            for team, capacity in enumerate(formation.capacity):
+                for student in order[:capacity]:
+                    formation.add(team, student)
+                order = order[capacity:]
+        else:
+            formation.greedy()
+            if time_limit:
+                optimal = 'yes' if formation.improve(started + time_limit) else 'no'
+        elapsed = time.monotonic() - started
+        label = strategy if time_limit is None else f'{strategy} {time_limit:g}s'
+        self.stdout.write(
+            f"{len(students):>6} {label:<18} {formation.coverage():>9.1%} {formation.cost()[0]:>8} "
+            f"{formation.imbalance():>10.3f} {elapsed:>8.3f} {formation.swaps:>7} {optimal:>8}"
+        )
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        skills = [f'skill{number}' for number in range(1, options['skills'] + 1)]
+        requirements = [(name, LEVEL_WEIGHTS[options['level']]) for name in skills]
+
+        self.stdout.write(
+            f"{'cohort':>6} {'strategy':<18} {'coverage':>9} {'missing':>8} "
+            f"{'imbalance':>10} {'seconds':>8} {'swaps':>7} {'optimum':>8}"
+        )
+        for size in options['sizes']:
+            students = synthetic_cohort(size, skills, rng)
+            self.run('random', students, requirements, options)
+            self.run('greedy', students, requirements, options)
+            for time_limit in options['time_limits']:
+                self.run('greedy+swaps', students, requirements, options, time_limit)
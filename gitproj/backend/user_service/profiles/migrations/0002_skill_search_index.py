@@ -0,0 +1,35 @@
+# Generated by Django 5.0.1 on 2026-10-18 19:28
+
+import re
+import unicodedata
+
+from django.db import migrations, models
+
+
+def fill_normalized_names(apps, schema_editor):
+    """Заполнить normalized_name у уже существующих навыков (как Skill.normalize_name)"""
+    Skill = apps.get_model('profiles', 'Skill')
+    skills = list(Skill.objects.only('id', 'name'))
+    for skill in skills:
+        skill.normalized_name = re.sub(r'\s+', ' ', unicodedata.normalize('NFKC', skill.name)).strip().casefold()
+    Skill.objects.bulk_update(skills, ['normalized_name'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('profiles', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='skill',
+            name='normalized_name',
+            field=models.CharField(blank=True, editable=False, max_length=100, verbose_name='Нормализованное название'),
+        ),
+        migrations.RunPython(fill_normalized_names, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='skill',
+            index=models.Index(fields=['normalized_name', 'level', 'profile'], name='skill_normalized_name_idx'),
+        ),
+    ]
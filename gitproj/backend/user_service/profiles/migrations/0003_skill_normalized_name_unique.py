@@ -0,0 +1,43 @@
+# Generated by Django 5.0.1 on 2026-10-18 19:59
+
+from django.db import migrations, models
+
+LEVELS = ['beginner', 'intermediate', 'advanced', 'expert']
+
+
+def merge_duplicate_skills(apps, schema_editor):
+    """Оставить по одному навыку на (profile, normalized_name): с наибольшим уровнем, при равенстве - последний"""
+    Skill = apps.get_model('profiles', 'Skill')
+    kept = {}
+    duplicates = []
+    for skill in Skill.objects.only('id', 'profile_id', 'normalized_name', 'level').order_by('id').iterator():
+        key = (skill.profile_id, skill.normalized_name)
+        current = kept.get(key)
+        if current is None:
+            kept[key] = skill
+        elif LEVELS.index(skill.level) >= LEVELS.index(current.level):
+            duplicates.append(current.pk)
+            kept[key] = skill
+        else:
+            duplicates.append(skill.pk)
+    for start in range(0, len(duplicates), 1000):
+        Skill.objects.filter(pk__in=duplicates[start:start + 1000]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('profiles', '0002_skill_search_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_skills, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='skill',
+            unique_together=set(),
+        ),
+        migrations.AddConstraint(
+            model_name='skill',
+            constraint=models.UniqueConstraint(fields=('profile', 'normalized_name'), name='skill_profile_normalized_name_uniq'),
+        ),
+    ]
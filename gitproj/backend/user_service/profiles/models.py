@@ -1,3 +1,6 @@
+import re
+import unicodedata
+
 from django.db import models
 
 class UserProfile(models.Model):
@@ -48,11 +51,32 @@ class Skill(models.Model):
     profile = models.ForeignKey(UserProfile, on_delete=models.CASCADE, related_name='skills', verbose_name='Профиль')
     name = models.CharField(max_length=100, verbose_name='Название')
     level = models.CharField(max_length=20, choices=SKILL_LEVELS, default='intermediate', verbose_name='Уровень')
+    # Ключ поиска по навыкам: "Python ", "python" и "PYTHON" совпадают (см. normalize_name)
+    normalized_name = models.CharField(max_length=100, blank=True, editable=False, verbose_name='Нормализованное название')
     
     class Meta:
         verbose_name = 'Навык'
         verbose_name_plural = 'Навыки'
-        unique_together = ['profile', 'name']
+        constraints = [
+            # Имена сравниваются как в поиске, иначе "Python" и "python" засчитывались бы дважды
+            models.UniqueConstraint(fields=['profile', 'normalized_name'], name='skill_profile_normalized_name_uniq'),
+        ]
+        indexes = [
+            # Инвертированный индекс: навык -> профили с уровнем, поиск читает только его
+            models.Index(fields=['normalized_name', 'level', 'profile'], name='skill_normalized_name_idx'),
+        ]
     
     def __str__(self):
         return f"{self.name} ({self.get_level_display()})"
+    
+    @staticmethod
+    def normalize_name(name):
+        """Название навыка для поиска: NFKC, без регистра и лишних пробелов"""
+        return re.sub(r'\s+', ' ', unicodedata.normalize('NFKC', name)).strip().casefold()
+    
+    def save(self, *args, **kwargs):
+        self.normalized_name = self.normalize_name(self.name)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'name' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'normalized_name'}
+        super().save(*args, **kwargs)
@@ -1,5 +1,8 @@
+from django.db import transaction
 from rest_framework import serializers
 from .models import UserProfile, Skill
+from .skills import MAX_QUERY_SKILLS, PROFILE_FILTERS, sync_skills
+from .teams import DEFAULT_TIME_LIMIT
 
 class SkillSerializer(serializers.ModelSerializer):
     class Meta:
@@ -20,6 +23,89 @@ class UserProfileSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['id', 'created_at', 'updated_at']
 
+class SkillCompactSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Skill
+        fields = ['name', 'level']
+
+class UserProfileCompactSerializer(serializers.ModelSerializer):
+    """Краткий профиль для подстановки в списки участников и авторов"""
+    
+    skills = SkillCompactSerializer(many=True, read_only=True)
+    
+    class Meta:
+        model = UserProfile
+        fields = [
+            'user_id', 'avatar_url',
+            'university', 'faculty', 'course', 'group',
+            'department', 'position',
+            'skills'
+        ]
+
+class ProfileBatchSerializer(serializers.Serializer):
+    """Список user_id для пакетного запроса профилей"""
+    
+    MAX_IDS = 200
+    
+    user_ids = serializers.ListField(child=serializers.IntegerField(min_value=1), allow_empty=False)
+    
+    def validate_user_ids(self, value):
+        # Повторы не считаются в лимит и не дублируют профили в ответе
+        value = list(dict.fromkeys(value))
+        if len(value) > self.MAX_IDS:
+            raise serializers.ValidationError(f'At most {self.MAX_IDS} user_ids per request')
+        return value
+
+class SkillRequirementSerializer(serializers.Serializer):
+    """Навык, который нужен каждой команде; без level подходит любой уровень"""
+    
+    name = serializers.CharField(max_length=100)
+    level = serializers.ChoiceField(choices=Skill.SKILL_LEVELS, required=False, allow_null=True)
+
+class TeamFormationSerializer(serializers.Serializer):
+    """Параметры автоматического разбиения когорты на команды.
+    
+    Когорта - профили по user_ids и/или фильтрам university, faculty,
+    course, group. С create=true команды создаются проектами по шаблону
+    template_project_id в project_service.
+    """
+    
+    MAX_COHORT = 2000
+    # Сколько проектов project_service создаёт одним запросом (ProjectInstantiateSerializer.MAX_TEAMS)
+    MAX_TEAMS = 200
+    
+    user_ids = serializers.ListField(child=serializers.IntegerField(min_value=1), required=False)
+    university = serializers.CharField(max_length=200, required=False)
+    faculty = serializers.CharField(max_length=200, required=False)
+    course = serializers.IntegerField(min_value=1, required=False)
+    group = serializers.CharField(max_length=50, required=False)
+    
+    team_size = serializers.IntegerField(min_value=2, max_value=20)
+    skills = SkillRequirementSerializer(many=True)
+    time_limit = serializers.FloatField(
+        min_value=0, max_value=30, default=DEFAULT_TIME_LIMIT,
+        help_text='Сколько секунд улучшать жадное решение; 0 - только жадное'
+    )
+    seed = serializers.IntegerField(default=0)
+    
+    create = serializers.BooleanField(default=False)
+    template_project_id = serializers.IntegerField(required=False)
+    title = serializers.CharField(max_length=180, default='Команда', help_text='Проекты называются "<title> N"')
+    
+    def validate_skills(self, value):
+        if not value:
+            raise serializers.ValidationError('At least one skill is required')
+        if len(value) > MAX_QUERY_SKILLS:
+            raise serializers.ValidationError(f'At most {MAX_QUERY_SKILLS} skills')
+        return value
+    
+    def validate(self, data):
+        if not any(data.get(field) for field in ('user_ids', *PROFILE_FILTERS)):
+            raise serializers.ValidationError('Cohort is required: user_ids, university, faculty, course or group')
+        if data['create'] and not data.get('template_project_id'):
+            raise serializers.ValidationError({'template_project_id': 'Required when create is true'})
+        return data
+
 class UserProfileCreateSerializer(serializers.ModelSerializer):
     skills = SkillSerializer(many=True, required=False)
     
@@ -35,23 +121,24 @@ class UserProfileCreateSerializer(serializers.ModelSerializer):
     
     def create(self, validated_data):
         skills_data = validated_data.pop('skills', [])
-        profile = UserProfile.objects.create(**validated_data)
         
-        for skill_data in skills_data:
-            Skill.objects.create(profile=profile, **skill_data)
+        with transaction.atomic():
+            profile = UserProfile.objects.create(**validated_data)
+            if skills_data:
+                sync_skills(profile, skills_data)
         
         return profile
     
     def update(self, instance, validated_data):
         skills_data = validated_data.pop('skills', None)
         
-        for attr, value in validated_data.items():
-            setattr(instance, attr, value)
-        instance.save()
-        
-        if skills_data is not None:
-            instance.skills.all().delete()
-            for skill_data in skills_data:
-                Skill.objects.create(profile=instance, **skill_data)
+        with transaction.atomic():
+            for attr, value in validated_data.items():
+                setattr(instance, attr, value)
+            instance.save()
+            
+            # Только разница с текущими навыками: неизменные строки сохраняют id
+            if skills_data is not None:
+                sync_skills(instance, skills_data)
         
         return instance
@@ -0,0 +1,45 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .cache import invalidate_profile
+from .models import Skill, UserProfile
+
+
+@receiver(pre_save, sender=UserProfile)
+def invalidate_previous_user_id(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Если у профиля меняется user_id, сбросить и запись кэша по старому user_id"""
+    if raw or instance.pk is None:
+        return
+    if update_fields is not None and 'user_id' not in update_fields:
+        return
+    previous = UserProfile.objects.filter(pk=instance.pk).values_list('user_id', flat=True).first()
+    if previous is not None and previous != instance.user_id:
+        invalidate_profile(previous)
+
+
+@receiver(post_save, sender=UserProfile)
+@receiver(post_delete, sender=UserProfile)
+def invalidate_profile_cache(sender, instance, raw=False, **kwargs):
+    """Любое сохранение или удаление профиля, в том числе из админки, сбрасывает кэш"""
+    invalidate_profile(instance.user_id)
+
+
+@receiver(post_save, sender=Skill)
+def invalidate_skill_owner(sender, instance, raw=False, **kwargs):
+    """Навык входит в сериализованный профиль, поэтому сбрасывается профиль владельца.
+
+    На post_delete навыков приёмника нет намеренно: с ним Django перед
+    DELETE загружал бы каждый удаляемый навык, а приёмник искал бы его
+    профиль отдельным запросом. Удаления навыков сбрасывают кэш
+    явно (sync_skills, touch_profile), а в админке - через сохранение
+    самого профиля. bulk_create/bulk_update в sync_skills сигналов тоже не
+    отправляют и сбрасывают кэш сами.
+    """
+    if raw:
+        return
+    if Skill._meta.get_field('profile').is_cached(instance):
+        user_id = instance.profile.user_id
+    else:
+        user_id = UserProfile.objects.filter(pk=instance.profile_id).values_list('user_id', flat=True).first()
+    if user_id is not None:
+        invalidate_profile(user_id)
@@ -0,0 +1,127 @@
+from django.db import transaction
+from django.db.models import Case, Count, Q, Sum, Value, When
+from django.utils import timezone
+
+from .cache import invalidate_profile
+from .models import Skill, UserProfile
+
+# Вес уровня навыка в ранжировании поиска: beginner = 1 ... expert = 4
+LEVEL_WEIGHTS = {level: weight for weight, (level, _) in enumerate(Skill.SKILL_LEVELS, start=1)}
+# Сколько навыков можно искать одним запросом
+MAX_QUERY_SKILLS = 10
+# Фильтры поиска по полям профиля: строки сравниваются без учёта регистра
+PROFILE_FILTERS = {
+    'university': 'university__iexact',
+    'faculty': 'faculty__iexact',
+    'course': 'course',
+    'group': 'group__iexact',
+}
+
+
+def sync_skills(profile, skills_data, remove_missing=True):
+    """Привести навыки профиля к skills_data по ключу (profile, normalized_name).
+
+    Имена сравниваются так же, как в поиске (Skill.normalize_name), поэтому
+    "python" к уже добавленному "Python" меняет существующую строку, а не
+    добавляет вторую. Вместо удаления и пересоздания всех навыков считается
+    разница с тем, что уже есть: новые навыки вставляются одним bulk_create,
+    сменившиеся название или уровень - одним bulk_update, лишние навыки
+    (если remove_missing) удаляются одним DELETE. Неизменные строки не
+    трогаются и сохраняют id. Строка профиля блокируется, чтобы параллельные
+    изменения навыков одного профиля не пересекались. Если навык
+    повторяется, берутся последние название и уровень. Если что-то
+    изменилось, сдвигается updated_at профиля и сбрасывается его кэш.
+
+    Возвращает (навыки {normalized_name: Skill} после синхронизации,
+    созданные, обновлённые, число удалённых).
+    """
+    default_level = Skill._meta.get_field('level').default
+    wanted = {
+        Skill.normalize_name(item['name']): (item['name'], item.get('level', default_level))
+        for item in skills_data
+    }
+
+    with transaction.atomic():
+        list(UserProfile.objects.select_for_update().filter(pk=profile.pk).values_list('pk', flat=True))
+        skills = {skill.normalized_name: skill for skill in Skill.objects.filter(profile=profile)}
+
+        created, updated = [], []
+        for key, (name, level) in wanted.items():
+            skill = skills.get(key)
+            if skill is None:
+                created.append(Skill(profile=profile, name=name, level=level, normalized_name=key))
+            elif (skill.name, skill.level) != (name, level):
+                skill.name, skill.level = name, level
+                updated.append(skill)
+        removed = [skill.pk for key, skill in skills.items() if key not in wanted] if remove_missing else []
+
+        deleted = Skill.objects.filter(pk__in=removed).delete()[0] if removed else 0
+        if updated:
+            Skill.objects.bulk_update(updated, ['name', 'level'])
+        if created:
+            Skill.objects.bulk_create(created)
+        if removed or updated or created:
+            # У Skill нет своей даты изменения, а bulk-операции не отправляют
+            # сигналов: сдвигаем updated_at профиля (его ETag) и сбрасываем кэш сами
+            UserProfile.objects.filter(pk=profile.pk).update(updated_at=timezone.now())
+            invalidate_profile(profile.user_id)
+
+    skills = {key: skill for key, skill in skills.items() if skill.pk not in removed}
+    skills.update((skill.normalized_name, skill) for skill in created)
+    return skills, created, updated, deleted
+
+
+def parse_skill_query(raw):
+    """Разбор ?skills=python:advanced,react:intermediate.
+
+    Возвращает [(нормализованное название, минимальный уровень или None)];
+    ValueError, если навыков нет, их слишком много или уровень неизвестен.
+    """
+    terms = {}
+    for item in raw.split(','):
+        name, _, level = item.partition(':')
+        name = Skill.normalize_name(name)
+        level = level.strip().lower() or None
+        if not name:
+            continue
+        if level is not None and level not in LEVEL_WEIGHTS:
+            raise ValueError(f'Unknown skill level: {level}')
+        terms[name] = level
+    if not terms:
+        raise ValueError('skills is required, e.g. python:advanced,react')
+    if len(terms) > MAX_QUERY_SKILLS:
+        raise ValueError(f'At most {MAX_QUERY_SKILLS} skills per search')
+    return list(terms.items())
+
+
+def search_profiles(terms, filters=None, match_all=False):
+    """Профили с навыками из terms, лучшие первыми.
+
+    Возвращает queryset словарей {profile_id, matched, score}: matched -
+    сколько запрошенных навыков есть у профиля не ниже нужного уровня
+    (покрытие запроса), score - сумма весов уровней этих навыков. Условие
+    по (normalized_name, level) читает из skill_normalized_name_idx только
+    строки запрошенных навыков, поэтому стоимость зависит от того, у
+    скольких профилей они есть, а не от числа профилей. match_all оставляет
+    только профили со всеми навыками.
+    """
+    condition = Q()
+    for name, min_level in terms:
+        if min_level is None:
+            condition |= Q(normalized_name=name)
+        else:
+            levels = [level for level, weight in LEVEL_WEIGHTS.items() if weight >= LEVEL_WEIGHTS[min_level]]
+            condition |= Q(normalized_name=name, level__in=levels)
+
+    skills = Skill.objects.filter(condition)
+    for field, value in (filters or {}).items():
+        skills = skills.filter(**{f'profile__{PROFILE_FILTERS[field]}': value})
+
+    weight = Case(*[When(level=level, then=Value(value)) for level, value in LEVEL_WEIGHTS.items()], default=Value(0))
+    ranked = skills.values('profile_id').annotate(
+        matched=Count('normalized_name', distinct=True),
+        score=Sum(weight),
+    )
+    if match_all:
+        ranked = ranked.filter(matched=len(terms))
+    return ranked.order_by('-matched', '-score', 'profile_id')
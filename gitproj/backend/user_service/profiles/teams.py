@@ -0,0 +1,201 @@
+import math
+import random
+import statistics
+import time
+
+from .skills import LEVEL_WEIGHTS
+
+DEFAULT_TIME_LIMIT = 2.0
+# Как часто локальный поиск сверяется с часами (число оценённых обменов)
+DEADLINE_CHECK_EVERY = 4096
+
+
+class TeamFormation:
+    """Разбиение когорты на команды с покрытием и балансом навыков.
+
+    Студент - вектор весов уровней запрошенных навыков (0 - навыка нет,
+    см. LEVEL_WEIGHTS). Размеры команд отличаются не больше чем на один.
+    Разбиения сравниваются лексикографически по cost(): сначала число пар
+    (команда, навык), где навык не покрыт нужным уровнем, затем сумма
+    квадратов сумм навыков по командам - при фиксированных итогах это та
+    же дисперсия, и чем она меньше, тем ровнее команды.
+
+    greedy() строит начальное разбиение, improve() улучшает его обменами
+    студентов между командами. Для каждой команды хранятся суммы навыков и
+    число покрывающих каждый навык участников, поэтому выгода обмена
+    считается за O(число навыков) без пересчёта всего разбиения.
+    """
+
+    def __init__(self, students, requirements, team_size, seed=0):
+        """students - {user_id: {навык: вес уровня}}, requirements - [(навык, минимальный вес)]"""
+        if team_size < 1:
+            raise ValueError('team_size must be positive')
+        self.user_ids = sorted(students)
+        self.skills = [name for name, _ in requirements]
+        self.required = [weight for _, weight in requirements]
+        self.vectors = [tuple(students[user_id].get(name, 0) for name in self.skills) for user_id in self.user_ids]
+        self.covers = [
+            tuple(int(value >= required) for value, required in zip(vector, self.required))
+            for vector in self.vectors
+        ]
+
+        count = len(self.user_ids)
+        self.team_count = max(1, math.ceil(count / team_size))
+        base, extra = divmod(count, self.team_count)
+        self.capacity = [base + (1 if team < extra else 0) for team in range(self.team_count)]
+
+        self.teams = [[] for _ in range(self.team_count)]
+        self.team_of = [None] * count
+        self.sums = [[0] * len(self.skills) for _ in range(self.team_count)]
+        self.cover_counts = [[0] * len(self.skills) for _ in range(self.team_count)]
+        self.rng = random.Random(seed)
+        self.evaluations = 0
+        self.swaps = 0
+
+    def add(self, team, student):
+        self.teams[team].append(student)
+        self.team_of[student] = team
+        for skill, (value, covered) in enumerate(zip(self.vectors[student], self.covers[student])):
+            self.sums[team][skill] += value
+            self.cover_counts[team][skill] += covered
+
+    def remove(self, team, student):
+        self.teams[team].remove(student)
+        for skill, (value, covered) in enumerate(zip(self.vectors[student], self.covers[student])):
+            self.sums[team][skill] -= value
+            self.cover_counts[team][skill] -= covered
+
+    def cost(self):
+        """(непокрытые пары команда-навык, сумма квадратов сумм навыков команд)"""
+        missing = sum(1 for counts in self.cover_counts for count in counts if count == 0)
+        return missing, sum(value * value for sums in self.sums for value in sums)
+
+    def greedy(self):
+        """Начальное разбиение.
+
+        Студенты, закрывающие больше требований, и более сильные идут первыми;
+        каждый попадает в команду со свободным местом, где он закроет больше
+        ещё не покрытых навыков, а при равенстве - в самую слабую.
+        """
+        order = sorted(
+            range(len(self.user_ids)),
+            key=lambda student: (-sum(self.covers[student]), -sum(self.vectors[student]), self.user_ids[student])
+        )
+        for student in order:
+            covers = self.covers[student]
+            team = min(
+                (team for team in range(self.team_count) if len(self.teams[team]) < self.capacity[team]),
+                key=lambda team: (
+                    -sum(1 for skill, covered in enumerate(covers)
+                         if covered and self.cover_counts[team][skill] == 0),
+                    sum(self.sums[team]),
+                    len(self.teams[team]),
+                    team,
+                )
+            )
+            self.add(team, student)
+
+    def swap_delta(self, first, second):
+        """Изменение cost() от обмена двух студентов из разных команд"""
+        team_a, team_b = self.team_of[first], self.team_of[second]
+        sums_a, sums_b = self.sums[team_a], self.sums[team_b]
+        counts_a, counts_b = self.cover_counts[team_a], self.cover_counts[team_b]
+        vector_a, vector_b = self.vectors[first], self.vectors[second]
+        covers_a, covers_b = self.covers[first], self.covers[second]
+
+        missing = squares = 0
+        for skill in range(len(self.skills)):
+            diff = vector_b[skill] - vector_a[skill]
+            if diff:
+                # (a + d)^2 + (b - d)^2 - a^2 - b^2
+                squares += 2 * diff * (sums_a[skill] - sums_b[skill] + diff)
+            change = covers_b[skill] - covers_a[skill]
+            if change:
+                before = (counts_a[skill] == 0) + (counts_b[skill] == 0)
+                after = (counts_a[skill] + change == 0) + (counts_b[skill] - change == 0)
+                missing += after - before
+        return missing, squares
+
+    def swap(self, first, second):
+        team_a, team_b = self.team_of[first], self.team_of[second]
+        self.remove(team_a, first)
+        self.remove(team_b, second)
+        self.add(team_b, first)
+        self.add(team_a, second)
+        self.swaps += 1
+
+    def improve(self, deadline=None):
+        """Локальный поиск: выполнять выгодные обмены, пока они есть или не наступил deadline.
+
+        Возвращает True, если достигнут локальный оптимум (ни один обмен не
+        улучшает cost), и False, если поиск остановлен по времени.
+        """
+        count = len(self.user_ids)
+        improved = True
+        while improved:
+            improved = False
+            order = list(range(count))
+            self.rng.shuffle(order)
+            for first in order:
+                for second in range(count):
+                    if self.team_of[first] == self.team_of[second]:
+                        continue
+                    self.evaluations += 1
+                    if (deadline is not None and self.evaluations % DEADLINE_CHECK_EVERY == 0
+                            and time.monotonic() > deadline):
+                        return False
+                    missing, squares = self.swap_delta(first, second)
+                    if missing < 0 or (missing == 0 and squares < 0):
+                        self.swap(first, second)
+                        improved = True
+        return True
+
+    def imbalance(self):
+        """Средний по навыкам разброс (стандартное отклонение) сумм навыков команд"""
+        if not self.skills or self.team_count < 2:
+            return 0.0
+        return statistics.fmean(
+            statistics.pstdev(sums[skill] for sums in self.sums) for skill in range(len(self.skills))
+        )
+
+    def coverage(self):
+        """Доля пар команда-навык, где навык покрыт нужным уровнем"""
+        pairs = self.team_count * len(self.skills)
+        return 1.0 if not pairs else 1 - self.cost()[0] / pairs
+
+    def result(self):
+        """Команды (участники от сильного к слабому) и показатели качества разбиения"""
+        teams = []
+        for team, members in enumerate(self.teams):
+            members = sorted(members, key=lambda student: (-sum(self.vectors[student]), self.user_ids[student]))
+            teams.append({
+                'members': [self.user_ids[student] for student in members],
+                'skills': dict(zip(self.skills, self.sums[team])),
+                'missing': [name for name, count in zip(self.skills, self.cover_counts[team]) if count == 0],
+            })
+        return {
+            'teams': teams,
+            'coverage': round(self.coverage(), 4),
+            'missing': self.cost()[0],
+            'imbalance': round(self.imbalance(), 4),
+            'evaluations': self.evaluations,
+            'swaps': self.swaps,
+        }
+
+
+def skill_requirements(skills):
+    """[(навык, минимальный вес)] из [{'name', 'level'}]; без уровня подходит любой"""
+    return [(item['name'], LEVEL_WEIGHTS[item['level']] if item.get('level') else 1) for item in skills]
+
+
+def form_teams(students, requirements, team_size, time_limit=DEFAULT_TIME_LIMIT, seed=0):
+    """Разбить когорту на команды: жадное решение и локальный поиск не дольше time_limit секунд"""
+    started = time.monotonic()
+    formation = TeamFormation(students, requirements, team_size, seed)
+    formation.greedy()
+    optimal = formation.improve(started + time_limit) if time_limit > 0 else False
+    return {
+        **formation.result(),
+        'local_optimum': optimal,
+        'elapsed': round(time.monotonic() - started, 3),
+    }
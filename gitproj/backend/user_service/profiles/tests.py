@@ -1,3 +1,532 @@
-from django.test import TestCase
+import json
+import random
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
 
-# Create your tests here.
+from django.db import IntegrityError, connection, transaction
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from .cache import LRUBackend, get_profile_cache
+from .models import Skill, UserProfile
+from .serializers import ProfileBatchSerializer, TeamFormationSerializer
+from .skills import sync_skills
+from .teams import TeamFormation, form_teams
+
+
+class TokenUser:
+    """Пользователь из JWT, как его создаёт CustomJWTAuthentication"""
+
+    is_authenticated = True
+
+    def __init__(self, user_id):
+        self.id = user_id
+
+
+class ProfileBatchTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        for user_id in range(1, 6):
+            profile = UserProfile.objects.create(user_id=user_id, university='КазНУ', course=user_id)
+            Skill.objects.create(profile=profile, name='Python', level='advanced')
+            Skill.objects.create(profile=profile, name='Django', level='beginner')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(user=TokenUser(1))
+
+    def test_get_returns_profiles_and_misses_in_two_queries(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get('/api/profiles/batch/?user_ids=3,1,42,3')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(context.captured_queries), 2)
+        self.assertEqual(list(response.data['profiles']), [3, 1])
+        self.assertEqual(response.data['missing'], [42])
+        profile = response.data['profiles'][3]
+        self.assertEqual(profile['course'], 3)
+        self.assertEqual(profile['skills'], [
+            {'name': 'Django', 'level': 'beginner'},
+            {'name': 'Python', 'level': 'advanced'},
+        ])
+        self.assertNotIn('bio', profile)
+
+    def test_post_body(self):
+        response = self.client.post('/api/profiles/batch/', {'user_ids': [5, 2]}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(response.data['profiles']), [5, 2])
+        self.assertEqual(response.data['missing'], [])
+
+    def test_validation(self):
+        self.assertEqual(self.client.get('/api/profiles/batch/').status_code, 400)
+        self.assertEqual(self.client.get('/api/profiles/batch/?user_ids=1,abc').status_code, 400)
+        too_many = list(range(1, ProfileBatchSerializer.MAX_IDS + 2))
+        response = self.client.post('/api/profiles/batch/', {'user_ids': too_many}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('user_ids', response.data)
+
+
+class SkillSyncTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(user=TokenUser(7))
+        self.profile = UserProfile.objects.create(user_id=7)
+        for name, level in [('Python', 'advanced'), ('SQL', 'intermediate'), ('Go', 'beginner')]:
+            Skill.objects.create(profile=self.profile, name=name, level=level)
+        self.ids = dict(Skill.objects.filter(profile=self.profile).values_list('name', 'id'))
+
+    def put_skills(self, skills):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.patch(f'/api/profiles/{self.profile.id}/', {'skills': skills}, format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        return [query['sql'] for query in context.captured_queries]
+
+    def skill_table_writes(self, queries):
+        table = Skill._meta.db_table
+        return [sql for sql in queries if table in sql and not sql.startswith('SELECT')]
+
+    def test_unchanged_skills_are_not_rewritten(self):
+        queries = self.put_skills([
+            {'name': 'Python', 'level': 'advanced'},
+            {'name': 'SQL', 'level': 'intermediate'},
+            {'name': 'Go', 'level': 'beginner'},
+        ])
+        self.assertEqual(self.skill_table_writes(queries), [])
+        self.assertEqual(dict(Skill.objects.filter(profile=self.profile).values_list('name', 'id')), self.ids)
+
+    def test_diff_is_applied_in_one_statement_per_kind(self):
+        queries = self.put_skills([
+            {'name': 'Python', 'level': 'expert'},
+            {'name': 'SQL', 'level': 'intermediate'},
+            {'name': 'Rust', 'level': 'beginner'},
+            {'name': 'Docker'},
+        ])
+        writes = self.skill_table_writes(queries)
+        self.assertEqual([sql.split()[0] for sql in writes], ['DELETE', 'UPDATE', 'INSERT'])
+
+        skills = {skill.name: skill for skill in Skill.objects.filter(profile=self.profile)}
+        self.assertEqual(set(skills), {'Python', 'SQL', 'Rust', 'Docker'})
+        self.assertEqual(skills['Python'].level, 'expert')
+        self.assertEqual(skills['Docker'].level, 'intermediate')
+        self.assertEqual(skills['Python'].id, self.ids['Python'])
+        self.assertEqual(skills['SQL'].id, self.ids['SQL'])
+
+    def test_add_skill_upserts(self):
+        response = self.client.post(f'/api/profiles/{self.profile.id}/add_skill/',
+                                    {'name': 'Kotlin', 'level': 'beginner'}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['name'], 'Kotlin')
+        self.assertIsNotNone(response.data['id'])
+
+        response = self.client.post(f'/api/profiles/{self.profile.id}/add_skill/',
+                                    {'name': 'Go', 'level': 'advanced'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, {'id': self.ids['Go'], 'name': 'Go', 'level': 'advanced'})
+        self.assertEqual(Skill.objects.filter(profile=self.profile).count(), 4)
+
+    def test_names_are_matched_like_in_search(self):
+        response = self.client.post(f'/api/profiles/{self.profile.id}/add_skill/',
+                                    {'name': 'python', 'level': 'expert'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, {'id': self.ids['Python'], 'name': 'python', 'level': 'expert'})
+
+        self.put_skills([{'name': 'PYTHON ', 'level': 'expert'}, {'name': 'sql'}, {'name': 'Go', 'level': 'beginner'}])
+        skills = dict(Skill.objects.filter(profile=self.profile).values_list('normalized_name', 'id'))
+        self.assertEqual(skills, {'python': self.ids['Python'], 'sql': self.ids['SQL'], 'go': self.ids['Go']})
+
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Skill.objects.create(profile=self.profile, name='Go ', level='expert')
+
+
+class SkillSearchTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        people = {
+            1: ('КазНУ', 2, [('Python', 'expert'), ('React', 'advanced')]),
+            2: ('КазНУ', 2, [('python ', 'advanced'), ('React', 'beginner')]),
+            3: ('КазНУ', 3, [('PYTHON', 'beginner'), ('react', 'intermediate')]),
+            4: ('КБТУ', 2, [('Python', 'expert'), ('React', 'expert')]),
+            5: ('КазНУ', 2, [('Go', 'expert')]),
+        }
+        for user_id, (university, course, skills) in people.items():
+            profile = UserProfile.objects.create(user_id=user_id, university=university, course=course)
+            for name, level in skills:
+                Skill.objects.create(profile=profile, name=name, level=level)
+        # Фон, чтобы план запроса отличался от таблицы из пяти строк
+        profiles = UserProfile.objects.bulk_create([UserProfile(user_id=100 + i) for i in range(300)])
+        Skill.objects.bulk_create([
+            Skill(profile=profile, name=f'Skill {i % 40}', normalized_name=f'skill {i % 40}', level='beginner')
+            for i, profile in enumerate(profiles)
+        ])
+        with connection.cursor() as cursor:
+            cursor.execute(f'ANALYZE {Skill._meta.db_table}')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(user=TokenUser(1))
+
+    def search(self, query):
+        response = self.client.get(f'/api/profiles/search/{query}')
+        self.assertEqual(response.status_code, 200, response.data)
+        return response.data['results']
+
+    def test_ranks_by_coverage_then_level(self):
+        results = self.search('?skills=Python:advanced,react:intermediate')
+        self.assertEqual([row['user_id'] for row in results], [4, 1, 2, 3])
+        self.assertEqual([row['coverage'] for row in results], [1.0, 1.0, 0.5, 0.5])
+        self.assertEqual([row['score'] for row in results], [8, 7, 3, 2])
+
+        results = self.search('?skills=python:advanced,react:intermediate&match=all')
+        self.assertEqual([row['user_id'] for row in results], [4, 1])
+
+    def test_same_skill_in_other_case_is_counted_once(self):
+        profile = UserProfile.objects.get(user_id=1)
+        response = self.client.post(f'/api/profiles/{profile.id}/add_skill/', {'name': 'python', 'level': 'expert'},
+                                    format='json')
+        self.assertEqual(response.status_code, 200)
+        results = self.search('?skills=python')
+        self.assertEqual([(row['user_id'], row['score']) for row in results][:2], [(1, 4), (4, 4)])
+
+    def test_profile_filters(self):
+        results = self.search('?skills=python&university=казну&course=2')
+        self.assertEqual([row['user_id'] for row in results], [1, 2])
+        self.assertEqual(self.client.get('/api/profiles/search/?skills=python&course=x').status_code, 400)
+
+    def test_validation(self):
+        self.assertEqual(self.client.get('/api/profiles/search/').status_code, 400)
+        self.assertEqual(self.client.get('/api/profiles/search/?skills=python:guru').status_code, 400)
+
+    def test_normalized_name_is_maintained_on_writes(self):
+        profile = UserProfile.objects.get(user_id=5)
+        response = self.client.post(f'/api/profiles/{profile.id}/add_skill/', {'name': '  Machine   Learning'},
+                                    format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Skill.objects.get(pk=response.data['id']).normalized_name, 'machine learning')
+        self.assertEqual([row['user_id'] for row in self.search('?skills=machine learning')], [5])
+
+    def test_uses_inverted_index(self):
+        with CaptureQueriesContext(connection) as context:
+            self.search('?skills=python:advanced,react')
+        ranking = next(query['sql'] for query in context.captured_queries if 'normalized_name' in query['sql'])
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+            cursor.execute('EXPLAIN ' + ranking)
+            plan = '\n'.join(row[0] for row in cursor.fetchall())
+        self.assertIn('skill_normalized_name_idx', plan)
+        self.assertNotIn(f'Seq Scan on {Skill._meta.db_table}', plan)
+
+
+class StubProjectService(ThreadingHTTPServer):
+    """Локальная заглушка project_service: POST /api/projects/{id}/instantiate/"""
+
+    daemon_threads = True
+
+    def __init__(self):
+        self.requests = []
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(handler):
+                body = json.loads(handler.rfile.read(int(handler.headers['Content-Length'])))
+                self.requests.append((handler.path, handler.headers.get('Authorization'), body))
+                projects = [
+                    {'id': number, 'title': team['title'], 'owner_id': team['owner_id']}
+                    for number, team in enumerate(body['teams'], start=100)
+                ]
+                payload = json.dumps({'template': 1, 'tasks_per_project': 0, 'projects': projects}).encode()
+                handler.send_response(201)
+                handler.send_header('Content-Type', 'application/json')
+                handler.send_header('Content-Length', str(len(payload)))
+                handler.end_headers()
+                handler.wfile.write(payload)
+
+            def log_message(handler, *args):
+                pass
+
+        super().__init__(('127.0.0.1', 0), Handler)
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.server_address[1]}'
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+class TeamFormationTests(TestCase):
+
+    def random_cohort(self, size, skills, seed=1):
+        rng = random.Random(seed)
+        return {user_id: {name: rng.choice([0, 0, 1, 2, 3, 4]) for name in skills} for user_id in range(size)}
+
+    def test_teams_cover_skills_and_sizes_are_balanced(self):
+        skills = ['python', 'react', 'sql']
+        students = self.random_cohort(103, skills)
+        result = form_teams(students, [(name, 3) for name in skills], team_size=5, time_limit=5)
+        sizes = sorted(len(team['members']) for team in result['teams'])
+        self.assertEqual(len(sizes), 21)
+        self.assertLessEqual(sizes[-1] - sizes[0], 1)
+        self.assertEqual(sorted(user_id for team in result['teams'] for user_id in team['members']), list(range(103)))
+        self.assertEqual(result['coverage'], 1.0)
+        self.assertTrue(result['local_optimum'])
+
+    def test_local_search_improves_greedy_and_tracks_sums(self):
+        skills = ['python', 'react', 'sql', 'design']
+        formation = TeamFormation(self.random_cohort(200, skills, seed=3), [(name, 2) for name in skills], 4)
+        formation.greedy()
+        greedy_cost = formation.cost()
+        formation.improve()
+        self.assertLess(formation.cost(), greedy_cost)
+        # Инкрементальные суммы совпадают с пересчитанными с нуля
+        for team, members in enumerate(formation.teams):
+            self.assertEqual(formation.sums[team], [sum(formation.vectors[i][s] for i in members) for s in range(4)])
+
+    def test_time_limit_is_respected(self):
+        skills = [f'skill{i}' for i in range(6)]
+        result = form_teams(self.random_cohort(600, skills), [(name, 2) for name in skills], 5, time_limit=0.2)
+        self.assertLess(result['elapsed'], 1.0)
+
+
+class TeamFormationEndpointTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        rng = random.Random(5)
+        for user_id in range(1, 41):
+            profile = UserProfile.objects.create(user_id=user_id, group='ИС-21' if user_id <= 30 else 'ИС-22')
+            for name in ('Python', 'React', 'Figma'):
+                if rng.random() < 0.6:
+                    Skill.objects.create(profile=profile, name=name, level=rng.choice(['beginner', 'advanced']))
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(user=TokenUser(1))
+
+    def request(self, **data):
+        payload = {
+            'group': 'ИС-21', 'team_size': 4, 'time_limit': 1,
+            'skills': [{'name': 'python', 'level': 'advanced'}, {'name': 'react'}], **data
+        }
+        return self.client.post('/api/profiles/teams/', payload, format='json')
+
+    def test_forms_teams_for_cohort(self):
+        response = self.request()
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(response.data['cohort_size'], 30)
+        members = [user_id for team in response.data['teams'] for user_id in team['members']]
+        self.assertEqual(sorted(members), list(range(1, 31)))
+        self.assertEqual(set(response.data['teams'][0]['skills']), {'python', 'react'})
+
+    def test_validation(self):
+        self.assertEqual(self.request(group='', team_size=4).status_code, 400)
+        self.assertEqual(self.request(skills=[]).status_code, 400)
+        self.assertEqual(self.request(create=True).status_code, 400)
+        response = self.request(group='нет такой')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['detail'], 'Cohort is empty')
+
+    def test_team_count_is_checked_before_solving(self):
+        with mock.patch.object(TeamFormationSerializer, 'MAX_TEAMS', 7), \
+                mock.patch('profiles.views.form_teams') as solver:
+            response = self.request(create=True, template_project_id=7)
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.data['detail'], 'At most 7 teams can be created at once')
+            solver.assert_not_called()
+            # Без create проекты не создаются, и ограничения нет
+            solver.return_value = {'teams': []}
+            self.assertEqual(self.request().status_code, 200)
+
+    def test_creates_projects_in_project_service(self):
+        server = StubProjectService()
+        self.addCleanup(server.stop)
+        with override_settings(PROJECT_SERVICE_URL=server.url):
+            response = self.client.post('/api/profiles/teams/', {
+                'group': 'ИС-22', 'team_size': 5, 'skills': [{'name': 'Python'}],
+                'create': True, 'template_project_id': 7, 'title': 'Команда ИС-22',
+            }, format='json', HTTP_AUTHORIZATION='Bearer token')
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual([project['title'] for project in response.data['projects']],
+                         ['Команда ИС-22 1', 'Команда ИС-22 2'])
+
+        path, authorization, body = server.requests[0]
+        self.assertEqual(path, '/api/projects/7/instantiate/')
+        self.assertEqual(authorization, 'Bearer token')
+        self.assertEqual([team['members'] for team in body['teams']],
+                         [team['members'] for team in response.data['teams']])
+        self.assertEqual(body['teams'][0]['owner_id'], response.data['teams'][0]['members'][0])
+
+
+class ProfileCacheTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.profile = UserProfile.objects.create(user_id=11, bio='Студент')
+        Skill.objects.create(profile=cls.profile, name='Python', level='advanced')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(user=TokenUser(11))
+        self.reset_cache()
+
+    def reset_cache(self):
+        cache = get_profile_cache()
+        cache.backend.clear()
+        cache.reset_stats()
+        return cache
+
+    def me(self, expected_queries=None, **headers):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get('/api/profiles/me/', **headers)
+        if expected_queries is not None:
+            self.assertEqual(len(context.captured_queries), expected_queries)
+        return response
+
+    def test_second_read_is_served_from_cache(self):
+        first = self.me()
+        self.assertEqual(first.status_code, 200)
+        second = self.me(expected_queries=0)
+        self.assertEqual(second.data, first.data)
+        self.assertEqual(second['ETag'], first['ETag'])
+        self.assertEqual(self.me(expected_queries=0, HTTP_IF_NONE_MATCH=first['ETag']).status_code, 304)
+
+        stats = self.client.get('/api/profiles/cache_stats/').data
+        self.assertEqual((stats['hits'], stats['misses']), (2, 1))
+        self.assertAlmostEqual(stats['hit_rate'], 2 / 3, places=3)
+        self.assertIsNotNone(stats['avg_hit_ms'])
+        self.assertEqual(stats['size'], 1)
+
+    def test_write_paths_invalidate(self):
+        etag = self.me()['ETag']
+        response = self.client.patch(f'/api/profiles/{self.profile.id}/', {'bio': 'Магистрант'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        response = self.me()
+        self.assertEqual(response.data['bio'], 'Магистрант')
+        self.assertNotEqual(response['ETag'], etag)
+
+        self.client.post(f'/api/profiles/{self.profile.id}/add_skill/', {'name': 'SQL'}, format='json')
+        self.assertEqual([skill['name'] for skill in self.me().data['skills']], ['Python', 'SQL'])
+
+        skill = Skill.objects.get(profile=self.profile, name='Python')
+        self.client.delete(f'/api/profiles/{self.profile.id}/remove_skill/{skill.id}/')
+        self.assertEqual([skill['name'] for skill in self.me().data['skills']], ['SQL'])
+
+        # Изменение в обход API, как в админке
+        profile = UserProfile.objects.get(pk=self.profile.pk)
+        profile.telegram = '@student'
+        profile.save()
+        self.assertEqual(self.me().data['telegram'], '@student')
+        self.assertEqual(get_profile_cache().stats()['misses'], 5)
+
+    def test_missing_profile_is_cached_until_created(self):
+        self.client.force_authenticate(user=TokenUser(12))
+        self.assertEqual(self.me().status_code, 404)
+        self.assertEqual(self.me(expected_queries=0).status_code, 404)
+
+        response = self.client.post('/api/profiles/', {'user_id': 12, 'bio': 'Новый'}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.me().data['bio'], 'Новый')
+
+    def test_shared_backend_with_local_stand_in(self):
+        settings_override = override_settings(
+            PROFILE_CACHE_BACKEND='profiles.cache.SharedCacheBackend',
+            PROFILE_CACHE_ALIAS='profiles',
+            CACHES={
+                'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+                'profiles': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'profiles'},
+            },
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.reset_cache()
+
+        self.assertEqual(self.me().status_code, 200)
+        self.assertEqual(self.me(expected_queries=0).data['bio'], 'Студент')
+        self.client.patch(f'/api/profiles/{self.profile.id}/', {'skills': []}, format='json')
+        self.assertEqual(self.me().data['skills'], [])
+        self.assertEqual(get_profile_cache().stats()['backend'], 'profiles.cache.SharedCacheBackend')
+
+    def test_lru_evicts_oldest_and_expires(self):
+        now = [0.0]
+        backend = LRUBackend(maxsize=2, timeout=10, clock=lambda: now[0])
+
+        def put(key, value):
+            backend.set(key, value, backend.generation(key))
+
+        put(1, 'a')
+        put(2, 'b')
+        self.assertEqual(backend.get(1, None), 'a')
+        put(3, 'c')
+        self.assertIsNone(backend.get(2, None))
+        self.assertEqual((backend.get(1, None), backend.get(3, None)), ('a', 'c'))
+        now[0] = 11
+        self.assertIsNone(backend.get(1, None))
+        self.assertEqual(len(backend), 1)
+
+    def assert_stale_build_is_not_cached(self, cache):
+        def stale_build():
+            # Профиль изменили и закоммитили, пока запрос читал старую версию
+            cache.invalidate(11)
+            return {'bio': 'старое'}
+
+        self.assertEqual(cache.get(11, stale_build), {'bio': 'старое'})
+        self.assertEqual(cache.get(11, lambda: {'bio': 'новое'}), {'bio': 'новое'})
+        self.assertEqual(cache.get(11, lambda: None), {'bio': 'новое'})
+
+    def test_write_during_build_is_not_cached(self):
+        self.assert_stale_build_is_not_cached(self.reset_cache())
+
+        now = [0.0]
+        backend = LRUBackend(maxsize=10, timeout=10, clock=lambda: now[0])
+        generation = backend.generation(1)
+        backend.bump(1)
+        now[0] = 20
+        # Сброс уже забыт, но запись собирали дольше timeout - она тоже не сохраняется
+        backend.bump(2)
+        backend.set(1, 'старое', generation)
+        self.assertIsNone(backend.get(1, None))
+        backend.set(1, 'новое', backend.generation(1))
+        self.assertEqual(backend.get(1, None), 'новое')
+
+    def test_write_during_build_is_not_cached_in_shared_backend(self):
+        settings_override = override_settings(
+            PROFILE_CACHE_BACKEND='profiles.cache.SharedCacheBackend',
+            PROFILE_CACHE_ALIAS='profiles',
+            CACHES={
+                'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+                'profiles': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'profiles'},
+            },
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.assert_stale_build_is_not_cached(self.reset_cache())
+
+
+class ConditionalProfileTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(user=TokenUser(21))
+        self.profile = UserProfile.objects.create(user_id=21)
+        Skill.objects.create(profile=self.profile, name='Python', level='beginner')
+        self.url = f'/api/profiles/{self.profile.id}/'
+
+    def test_repeated_get_returns_304(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+    def test_skill_level_change_changes_validator(self):
+        etag = self.client.get(self.url)['ETag']
+        # Уровень меняется через bulk_update: количество и id навыков те же
+        sync_skills(self.profile, [{'name': 'Python', 'level': 'expert'}])
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.data['skills'][0]['level'], 'expert')
@@ -1,14 +1,28 @@
+import math
+
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
+from django.db.models import Prefetch
+from django.utils import timezone
 
+from .cache import get_profile_cache, invalidate_profile
+from .conditional import ConditionalGetMixin, parse_pk, payload_etag
 from .models import UserProfile, Skill
-from .serializers import UserProfileSerializer, UserProfileCreateSerializer, SkillSerializer
+from .serializers import (
+    UserProfileSerializer, UserProfileCreateSerializer, SkillSerializer,
+    UserProfileCompactSerializer, ProfileBatchSerializer, TeamFormationSerializer
+)
+from .clients import ServiceUnavailable, create_team_projects
+from .skills import (
+    LEVEL_WEIGHTS, MAX_QUERY_SKILLS, PROFILE_FILTERS, parse_skill_query, search_profiles, sync_skills
+)
+from .teams import form_teams, skill_requirements
 
-class UserProfileViewSet(viewsets.ModelViewSet):
+class UserProfileViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     """ViewSet для управления профилями пользователей"""
     
     queryset = UserProfile.objects.all()
@@ -27,6 +41,29 @@ class UserProfileViewSet(viewsets.ModelViewSet):
         else:
             serializer.save()
     
+    def get_conditional_querysets(self):
+        """Валидатор профиля: сам профиль плюс количество навыков.
+        
+        Изменения навыков дополнительно обновляют updated_at профиля (sync_skills,
+        touch_profile), потому что у Skill нет своей даты изменения.
+        """
+        if self.action == 'retrieve':
+            pk = parse_pk(self.kwargs.get('pk'))
+            if pk is None:
+                return None
+            profiles = UserProfile.objects.filter(pk=pk)
+        else:
+            return None
+        return [
+            (profiles, 'updated_at'),
+            (Skill.objects.filter(profile__in=profiles.values('pk')), 'id'),
+        ]
+    
+    def touch_profile(self, profile):
+        """Сдвинуть updated_at профиля после изменения его навыков и сбросить его кэш"""
+        UserProfile.objects.filter(pk=profile.pk).update(updated_at=timezone.now())
+        invalidate_profile(profile.user_id)
+    
     @swagger_auto_schema(
         operation_description="Получить профиль текущего пользователя"
     )
@@ -42,29 +79,214 @@ class UserProfileViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_401_UNAUTHORIZED
             )
         
-        try:
-            profile = UserProfile.objects.get(user_id=user_id)
-            serializer = self.get_serializer(profile)
-            return Response(serializer.data)
-        except UserProfile.DoesNotExist:
+        # Профиль читается из кэша; валидаторы лежат в той же записи, так что 304 тоже без БД
+        entry = get_profile_cache().get(user_id, lambda: self.load_me(user_id))
+        if entry is None:
             return Response(
                 {"detail": "Profile not found"},
                 status=status.HTTP_404_NOT_FOUND
             )
+        return self.validated_response(
+            request, entry['etag'], entry['last_modified'], lambda: Response(entry['data'])
+        )
+    
+    def load_me(self, user_id):
+        """Запись кэша для /me/: сериализованный профиль с ETag и Last-Modified или None"""
+        profile = UserProfile.objects.prefetch_related('skills').filter(user_id=user_id).first()
+        if profile is None:
+            return None
+        data = self.get_serializer(profile).data
+        return {'data': data, 'etag': payload_etag(data), 'last_modified': int(profile.updated_at.timestamp())}
+    
+    @swagger_auto_schema(
+        operation_description="Счётчики кэша профилей /me/ в этом процессе: доля попаданий и время ответа"
+    )
+    @action(detail=False, methods=['get'])
+    def cache_stats(self, request):
+        """Статистика кэша профилей, чтобы подобрать PROFILE_CACHE_SIZE и PROFILE_CACHE_TIMEOUT"""
+        return Response(get_profile_cache().stats())
     
     @swagger_auto_schema(
-        operation_description="Добавить навык к профилю",
+        method='get',
+        operation_description="Краткие профили нескольких пользователей одним запросом",
+        manual_parameters=[
+            openapi.Parameter('user_ids', openapi.IN_QUERY, type=openapi.TYPE_STRING, required=True,
+                              description=f"ID пользователей через запятую, не больше {ProfileBatchSerializer.MAX_IDS}")
+        ]
+    )
+    @swagger_auto_schema(
+        method='post',
+        operation_description="Краткие профили нескольких пользователей; для длинных списков",
+        request_body=ProfileBatchSerializer
+    )
+    @action(detail=False, methods=['get', 'post'])
+    def batch(self, request):
+        """Профили по списку user_id для подстановки в страницу другого сервиса.
+        
+        Вместо запроса на каждого участника - один HTTP-запрос и два SQL:
+        профили по уникальному индексу user_id и их навыки. Ответ -
+        {"profiles": {user_id: профиль}, "missing": [user_id без профиля]}.
+        """
+        if request.method == 'GET':
+            raw = request.query_params.get('user_ids', '')
+            data = {'user_ids': [pk.strip() for pk in raw.split(',') if pk.strip()]}
+        else:
+            data = request.data
+        serializer = ProfileBatchSerializer(data=data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        
+        user_ids = serializer.validated_data['user_ids']
+        fields = [name for name in UserProfileCompactSerializer.Meta.fields if name != 'skills']
+        profiles = UserProfile.objects.filter(user_id__in=user_ids).only('id', *fields).prefetch_related(
+            Prefetch('skills', queryset=Skill.objects.only('profile_id', 'name', 'level').order_by('name'))
+        )
+        found = {profile.user_id: UserProfileCompactSerializer(profile).data for profile in profiles}
+        return Response({
+            'profiles': {user_id: found[user_id] for user_id in user_ids if user_id in found},
+            'missing': [user_id for user_id in user_ids if user_id not in found],
+        })
+    
+    @swagger_auto_schema(
+        operation_description="Поиск людей по навыкам: больше совпавших навыков и выше уровень - выше в списке",
+        manual_parameters=[
+            openapi.Parameter('skills', openapi.IN_QUERY, type=openapi.TYPE_STRING, required=True,
+                              description="Навыки через запятую с необязательным минимальным уровнем, "
+                                          f"например python:advanced,react:intermediate (не больше {MAX_QUERY_SKILLS})"),
+            openapi.Parameter('match', openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                              description="any (по умолчанию) - хотя бы один навык, all - все навыки"),
+        ] + [
+            openapi.Parameter(field, openapi.IN_QUERY,
+                              type=openapi.TYPE_INTEGER if field == 'course' else openapi.TYPE_STRING)
+            for field in PROFILE_FILTERS
+        ]
+    )
+    @action(detail=False, methods=['get'])
+    def search(self, request):
+        """Подбор участников команды по навыкам.
+        
+        coverage - доля запрошенных навыков, которые есть у человека на нужном
+        уровне, score - сумма весов их уровней (beginner = 1 ... expert = 4).
+        """
+        try:
+            terms = parse_skill_query(request.query_params.get('skills', ''))
+        except ValueError as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        filters = {}
+        for field in PROFILE_FILTERS:
+            value = request.query_params.get(field)
+            if value:
+                filters[field] = value
+        if 'course' in filters and not filters['course'].isdigit():
+            return Response({"detail": "course must be a number"}, status=status.HTTP_400_BAD_REQUEST)
+        
+        ranked = search_profiles(terms, filters, match_all=request.query_params.get('match') == 'all')
+        page = self.paginate_queryset(ranked)
+        profiles = UserProfile.objects.filter(pk__in=[row['profile_id'] for row in page]).prefetch_related('skills')
+        profiles = {profile.pk: profile for profile in profiles}
+        results = [
+            {
+                **UserProfileCompactSerializer(profiles[row['profile_id']]).data,
+                'coverage': round(row['matched'] / len(terms), 3),
+                'score': row['score'],
+            }
+            for row in page if row['profile_id'] in profiles
+        ]
+        return self.get_paginated_response(results)
+    
+    @swagger_auto_schema(
+        operation_description="Разбить когорту на сбалансированные по навыкам команды "
+                              "и при create=true создать их проекты по шаблону",
+        request_body=TeamFormationSerializer
+    )
+    @action(detail=False, methods=['post'], url_path='teams')
+    def teams(self, request):
+        """Автоматическое формирование команд.
+        
+        Каждой команде нужен хотя бы один человек с каждым навыком из skills
+        не ниже указанного уровня, а суммы уровней навыков по командам должны
+        быть как можно ровнее (см. teams.TeamFormation). Навыки когорты
+        читаются одним запросом по skill_normalized_name_idx.
+        """
+        serializer = TeamFormationSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        data = serializer.validated_data
+        
+        cohort = UserProfile.objects.all()
+        if data.get('user_ids'):
+            cohort = cohort.filter(user_id__in=data['user_ids'])
+        for field, lookup in PROFILE_FILTERS.items():
+            if data.get(field):
+                cohort = cohort.filter(**{lookup: data[field]})
+        profiles = dict(cohort.values_list('id', 'user_id')[:TeamFormationSerializer.MAX_COHORT + 1])
+        if not profiles:
+            return Response({"detail": "Cohort is empty"}, status=status.HTTP_400_BAD_REQUEST)
+        if len(profiles) > TeamFormationSerializer.MAX_COHORT:
+            return Response(
+                {"detail": f"Cohort must not exceed {TeamFormationSerializer.MAX_COHORT} profiles"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        # Проверяется до подбора: иначе решение считалось бы зря и project_service отклонил бы запрос
+        if data['create'] and math.ceil(len(profiles) / data['team_size']) > TeamFormationSerializer.MAX_TEAMS:
+            return Response(
+                {"detail": f"At most {TeamFormationSerializer.MAX_TEAMS} teams can be created at once"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        requested = [{**item, 'name': Skill.normalize_name(item['name'])} for item in data['skills']]
+        students = {user_id: {} for user_id in profiles.values()}
+        for profile_id, name, level in Skill.objects.filter(
+            profile_id__in=list(profiles), normalized_name__in=[item['name'] for item in requested]
+        ).values_list('profile_id', 'normalized_name', 'level'):
+            skills = students[profiles[profile_id]]
+            skills[name] = max(skills.get(name, 0), LEVEL_WEIGHTS[level])
+        
+        result = form_teams(
+            students, skill_requirements(requested), data['team_size'], data['time_limit'], data['seed']
+        )
+        result = {'cohort_size': len(students), 'team_size': data['team_size'], **result}
+        if not data['create']:
+            return Response(result)
+        
+        teams = [
+            {'title': f"{data['title']} {number}", 'owner_id': team['members'][0], 'members': team['members']}
+            for number, team in enumerate(result['teams'], start=1)
+        ]
+        try:
+            status_code, created = create_team_projects(
+                data['template_project_id'], teams, request.headers.get('Authorization')
+            )
+        except ServiceUnavailable:
+            return Response(
+                {"detail": "project_service is unavailable, teams were not created", **result},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE
+            )
+        if status_code != status.HTTP_201_CREATED:
+            return Response({"project_service": created, **result}, status=status_code)
+        return Response({**result, 'projects': created['projects']}, status=status.HTTP_201_CREATED)
+    
+    @swagger_auto_schema(
+        operation_description="Добавить навык к профилю; если навык с таким именем (без учёта регистра "
+                              "и лишних пробелов) уже есть, меняются его название и уровень",
         request_body=SkillSerializer
     )
     @action(detail=True, methods=['post'])
     def add_skill(self, request, pk=None):
-        """Добавить навык к профилю"""
+        """Добавить навык к профилю или изменить уровень уже добавленного"""
         profile = self.get_object()
         serializer = SkillSerializer(data=request.data)
         
         if serializer.is_valid():
-            serializer.save(profile=profile)
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
+            # Тот же путь, что и при сохранении профиля: навык с таким именем обновляется,
+            # а при изменениях сдвигается updated_at профиля
+            skills, created, _, _ = sync_skills(profile, [serializer.validated_data], remove_missing=False)
+            skill = skills[Skill.normalize_name(serializer.validated_data['name'])]
+            return Response(
+                SkillSerializer(skill).data,
+                status=status.HTTP_201_CREATED if created else status.HTTP_200_OK
+            )
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
     @swagger_auto_schema(
@@ -78,6 +300,7 @@ class UserProfileViewSet(viewsets.ModelViewSet):
         try:
             skill = Skill.objects.get(id=skill_id, profile=profile)
             skill.delete()
+            self.touch_profile(profile)
             return Response(status=status.HTTP_204_NO_CONTENT)
         except Skill.DoesNotExist:
             return Response(
@@ -116,3 +116,17 @@ SIMPLE_JWT = {
 }
 
 AUTH_SERVICE_URL = os.getenv('AUTH_SERVICE_URL', 'http://localhost:8001')
+PROJECT_SERVICE_URL = os.getenv('PROJECT_SERVICE_URL', 'http://localhost:8003')
+
+# Запросы к соседним сервисам: таймауты (секунды)
+SERVICE_CONNECT_TIMEOUT = float(os.getenv('SERVICE_CONNECT_TIMEOUT', '1'))
+SERVICE_READ_TIMEOUT = float(os.getenv('SERVICE_READ_TIMEOUT', '10'))
+
+# Кэш профилей для /profiles/me/ (см. profiles/cache.py): LRUBackend в памяти процесса
+# или SharedCacheBackend поверх CACHES[PROFILE_CACHE_ALIAS]. LRUBackend сбрасывает запись
+# только в том воркере, который изменил профиль: при нескольких воркерах остальные отдают
+# устаревший /me/ до PROFILE_CACHE_TIMEOUT секунд, поэтому там нужен SharedCacheBackend
+PROFILE_CACHE_BACKEND = os.getenv('PROFILE_CACHE_BACKEND', 'profiles.cache.LRUBackend')
+PROFILE_CACHE_SIZE = int(os.getenv('PROFILE_CACHE_SIZE', '10000'))
+PROFILE_CACHE_TIMEOUT = int(os.getenv('PROFILE_CACHE_TIMEOUT', '300'))
+PROFILE_CACHE_ALIAS = os.getenv('PROFILE_CACHE_ALIAS', 'default')
@@ -44,6 +44,18 @@ export const profileAPI = {
   removeSkill: (id, skillId) => axios.delete(`http://localhost:8002/api/profiles/${id}/remove_skill/${skillId}/`, 
     { headers: getAuthHeaders() }
   ),
+  batch: (userIds) => axios.post('http://localhost:8002/api/profiles/batch/', { user_ids: userIds }, 
+    { headers: getAuthHeaders() }
+  ),
+  search: (params) => axios.get('http://localhost:8002/api/profiles/search/', 
+    { params, headers: getAuthHeaders() }
+  ),
+  formTeams: (data) => axios.post('http://localhost:8002/api/profiles/teams/', data, 
+    { headers: getAuthHeaders() }
+  ),
+  cacheStats: () => axios.get('http://localhost:8002/api/profiles/cache_stats/', 
+    { headers: getAuthHeaders() }
+  ),
 };
 
 // Project API - С токенами
@@ -68,6 +80,9 @@ export const projectAPI = {
       { headers }
     );
   },
+  board: (id, params) => axios.get(`http://localhost:8003/api/projects/${id}/board/`, 
+    { params, headers: getAuthHeaders() }
+  ),
   create: (data) => axios.post('http://localhost:8003/api/projects/', data, 
     { headers: getAuthHeaders() }
   ),
@@ -83,6 +98,12 @@ export const projectAPI = {
   removeMember: (id, userId) => axios.delete(`http://localhost:8003/api/projects/${id}/remove_member/${userId}/`, 
     { headers: getAuthHeaders() }
   ),
+  instantiate: (id, data) => axios.post(`http://localhost:8003/api/projects/${id}/instantiate/`, data, 
+    { headers: getAuthHeaders() }
+  ),
+  search: (params) => axios.get('http://localhost:8003/api/search/', 
+    { params, headers: getAuthHeaders() }
+  ),
 };
 
 // Task API - С токенами
@@ -141,6 +162,43 @@ export const submissionAPI = {
   addAttachment: (id, data) => axios.post(`http://localhost:8004/api/submissions/${id}/add_attachment/`, data, 
     { headers: getAuthHeaders() }
   ),
+  gradeBatch: (grades) => axios.post('http://localhost:8004/api/submissions/grade_batch/', { grades }, 
+    { headers: getAuthHeaders() }
+  ),
+  claim: (data) => axios.post('http://localhost:8004/api/submissions/claim/', data, 
+    { headers: getAuthHeaders() }
+  ),
+  release: (id) => axios.post(`http://localhost:8004/api/submissions/${id}/release/`, null, 
+    { headers: getAuthHeaders() }
+  ),
+  versions: (id) => axios.get(`http://localhost:8004/api/submissions/${id}/versions/`, 
+    { headers: getAuthHeaders() }
+  ),
+  version: (id, number) => axios.get(`http://localhost:8004/api/submissions/${id}/versions/${number}/`, 
+    { headers: getAuthHeaders() }
+  ),
+  diff: (id, params) => axios.get(`http://localhost:8004/api/submissions/${id}/diff/`, 
+    { params, headers: getAuthHeaders() }
+  ),
+};
+
+// Upload API - возобновляемая загрузка файлов по частям
+export const uploadAPI = {
+  start: (data) => axios.post('http://localhost:8004/api/uploads/', data, 
+    { headers: getAuthHeaders() }
+  ),
+  status: (id) => axios.get(`http://localhost:8004/api/uploads/${id}/`, 
+    { headers: getAuthHeaders() }
+  ),
+  sendChunk: (id, offset, chunk) => axios.patch(`http://localhost:8004/api/uploads/${id}/`, chunk, 
+    { headers: { ...getAuthHeaders(), 'Content-Type': 'application/offset+octet-stream', 'Upload-Offset': offset } }
+  ),
+  cancel: (id) => axios.delete(`http://localhost:8004/api/uploads/${id}/`, 
+    { headers: getAuthHeaders() }
+  ),
+  download: (attachmentId, range) => axios.get(`http://localhost:8004/api/attachments/${attachmentId}/download/`, 
+    { responseType: 'blob', headers: range ? { ...getAuthHeaders(), Range: range } : getAuthHeaders() }
+  ),
 };
 
 // Review API - С токенами
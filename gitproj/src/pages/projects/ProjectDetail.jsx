@@ -8,6 +8,7 @@ export default function ProjectDetail() {
   const { id } = useParams();
   const [project, setProject] = useState(null);
   const [tasks, setTasks] = useState([]);
+  const [columnCounts, setColumnCounts] = useState({});
   const [loading, setLoading] = useState(true);
   const [showTaskModal, setShowTaskModal] = useState(false);
   const [editingTask, setEditingTask] = useState(null);
@@ -32,25 +33,12 @@ export default function ProjectDetail() {
     try {
       console.log('📋 Loading tasks for project:', id);
       
-      // ИСПРАВЛЕНО: передаём project_id как число
-      const response = await taskAPI.getAll({ project_id: parseInt(id) });
-      const data = response.data;
-      
-      console.log('📋 Full response:', response);
-      console.log('📋 Response data:', data);
-      console.log('📋 Status:', response.status);
-      
-      // Обработка разных форматов ответа
-      let tasksArray = [];
-      if (Array.isArray(data)) {
-        tasksArray = data;
-      } else if (data && Array.isArray(data.results)) {
-        tasksArray = data.results;
-      } else if (data && typeof data === 'object') {
-        console.log('⚠️ Data is object, keys:', Object.keys(data));
-        tasksArray = [];
-      }
+      // Доска приходит одним запросом, уже сгруппированная по статусам
+      const { data } = await projectAPI.board(id);
+      const columns = Array.isArray(data?.columns) ? data.columns : [];
+      const tasksArray = columns.flatMap((column) => column.tasks);
       
+      setColumnCounts(data?.counts?.by_status || {});
       console.log('📋 Final tasks array:', tasksArray);
       console.log('📋 Tasks count:', tasksArray.length);
       
@@ -63,6 +51,7 @@ export default function ProjectDetail() {
       console.error('❌ Error loading tasks:', error);
       console.error('❌ Error response:', error.response);
       setTasks([]);
+      setColumnCounts({});
     }
   };
 
@@ -188,7 +177,7 @@ export default function ProjectDetail() {
       {/* Задачи */}
       <div className="card">
         <div className="flex justify-between items-center mb-3">
-          <h3>Задачи ({tasks.length})</h3>
+          <h3>Задачи ({Object.values(columnCounts).reduce((sum, count) => sum + count, 0) || tasks.length})</h3>
           <button onClick={() => { setEditingTask(null); setShowTaskModal(true); }} className="btn btn-primary btn-small">
             <Plus size={16} style={{ verticalAlign: 'middle', marginRight: '0.5rem' }} />
             Добавить задачу
@@ -207,7 +196,7 @@ export default function ProjectDetail() {
                 <div key={status}>
                   <div className="flex justify-between items-center mb-2">
                     <h5 style={{ marginBottom: 0 }}>{getTaskStatusText(status)}</h5>
-                    <span className="badge badge-secondary text-sm">{statusTasks.length}</span>
+                    <span className="badge badge-secondary text-sm">{columnCounts[status] ?? statusTasks.length}</span>
                   </div>
                   <div style={{ display: 'flex', flexDirection: 'column', gap: '0.75rem', minHeight: '200px' }}>
                     {statusTasks.map((task) => (